@@ -22,6 +22,28 @@ def create_app():
     app.register_blueprint(markets_bp, url_prefix='/markets')
     app.register_blueprint(oracles_bp, url_prefix='/oracles')
     
+    # Resume settlement jobs left unfinished by a previous process
+    from services.settlement_queue import get_settlement_queue
+    get_settlement_queue().start()
+    
+    # Take ownership of the market engine journal (fails if another process has it)
+    if Config.MARKET_ENGINE_ENABLED:
+        from services.market_engine import get_market_engine
+        get_market_engine().start()
+    
+    # Fold the platform stats deltas in the background
+    from services.platform_stats import get_platform_stats
+    get_platform_stats().start()
+    
+    # Load the market vector index off the request path
+    from services.vector_index import get_market_index
+    get_market_index().warm()
+    
+    # Resume AI enrichment of markets left pending by a previous process
+    if Config.AI_ENRICHMENT_ASYNC:
+        from services.enrichment_queue import get_enrichment_queue
+        get_enrichment_queue().start()
+    
     # Error handlers
     @app.errorhandler(400)
     def bad_request(error):
@@ -64,35 +86,47 @@ def create_app():
             'ai': ai_status
         }), 200
     
+    # Metrics endpoint
+    @app.route('/metrics')
+    def metrics():
+        """In-process cache and index metrics for this worker"""
+        from services.embedding_cache import get_embedding_cache
+        from services.embedding_batcher import get_embedding_batcher
+        from services.enrichment_queue import get_enrichment_queue
+        from services.prediction_cache import get_prediction_cache
+        from services.market_engine import get_market_engine
+        from services.settlement_queue import get_settlement_queue
+        from services.platform_stats import get_platform_stats
+        from services.leaderboard import get_leaderboard
+        from services.vector_index import get_market_index
+        from utils.supabase_client import transport_stats
+        
+        index = get_market_index()
+        return jsonify({
+            'embedding_cache': get_embedding_cache().stats(),
+            'embedding_batcher': get_embedding_batcher().stats(),
+            'enrichment_queue': get_enrichment_queue().stats(),
+            'prediction_cache': get_prediction_cache().stats(),
+            'market_engine': get_market_engine().stats(),
+            'settlement_queue': get_settlement_queue().stats(),
+            'platform_stats': get_platform_stats().stats(),
+            'leaderboard': get_leaderboard().stats(),
+            'supabase_transport': transport_stats(),
+            'vector_index': {
+                'backend': index.backend.name,
+                'size': len(index)
+            }
+        }), 200
+    
     # Stats endpoint
     @app.route('/stats')
     def stats():
         """Get application statistics"""
+        from services.platform_stats import get_platform_stats
+        
         try:
-            supabase = get_supabase_client()
-            
-            # Total users
-            users_response = supabase.table('users').select('id', count='exact').execute()
-            total_users = users_response.count if hasattr(users_response, 'count') else len(users_response.data) if users_response.data else 0
-            
-            # Total markets
-            markets_response = supabase.table('markets').select('id', count='exact').execute()
-            total_markets = markets_response.count if hasattr(markets_response, 'count') else len(markets_response.data) if markets_response.data else 0
-            
-            # Active markets
-            active_markets_response = supabase.table('markets').select('id', count='exact').eq('status', 'active').execute()
-            active_markets = active_markets_response.count if hasattr(active_markets_response, 'count') else len(active_markets_response.data) if active_markets_response.data else 0
-            
-            # Total CC locked (sum of locked_balance from all users)
-            users_data = supabase.table('users').select('locked_balance').execute()
-            total_cc_locked = sum(float(u.get('locked_balance', 0)) for u in (users_data.data or []))
-            
-            return jsonify({
-                'total_users': total_users,
-                'total_markets': total_markets,
-                'active_markets': active_markets,
-                'total_cc_locked': round(total_cc_locked, 2)
-            }), 200
+            # Trigger-maintained aggregates behind a short-TTL cache
+            return jsonify(get_platform_stats().get()), 200
             
         except Exception as e:
             logger.error(f"Error in stats endpoint: {str(e)}")
@@ -0,0 +1,103 @@
+"""
+Settlement benchmark: columnar NumPy kernel vs the per-user Python loop
+
+The loop mirrors the original OracleService.settle_market scan (payout per
+Position object, then sum(p.collateral for p in user_positions) per user),
+which is O(users x positions); it is only run up to --loop-max positions.
+
+Usage (from backend/):
+    python benchmarks/settlement_kernel.py --sizes 10000 100000 1000000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from models.position import Position
+from services.settlement_kernel import load_position_columns, settle_positions
+
+def make_positions(size: int, seed: int = 0):
+    """Synthetic open positions, ~3 positions per user"""
+    rng = np.random.default_rng(seed)
+    users = rng.integers(0, max(1, size // 3), size=size)
+    types = rng.random(size) < 0.5
+    shares = rng.uniform(1, 200, size=size)
+    entry = rng.uniform(0.05, 0.95, size=size)
+    return [
+        {
+            'id': f"p{i}",
+            'user_id': f"u{users[i]}",
+            'type': 'true' if types[i] else 'false',
+            'shares': float(shares[i]),
+            'entry_price': float(entry[i]),
+            'collateral': float(shares[i] * (1 - entry[i])),
+            'cost_basis': float(shares[i] * entry[i]),
+        }
+        for i in range(size)
+    ]
+
+def python_loop(positions, outcome: str):
+    """Per-user scan as in the original settle_market"""
+    objects = [Position.from_dict(p) for p in positions]
+    payouts = {}
+    for position in objects:
+        if position.type == 'true':
+            payout = position.calculate_payout_if_true() if outcome == 'true' else 0.0
+        else:
+            payout = position.calculate_payout_if_false() if outcome == 'false' else 0.0
+        payouts[position.user_id] = payouts.get(position.user_id, 0.0) + payout
+
+    unlocks = {}
+    for user_id in payouts:
+        user_positions = [p for p in objects if p.user_id == user_id]
+        unlocks[user_id] = sum(p.collateral for p in user_positions)
+    return payouts, unlocks
+
+def run_benchmark(sizes: list, loop_max: int, outcome: str):
+    print("="*60)
+    print(f"Settlement kernel benchmark (outcome={outcome})")
+    print("="*60)
+    print(f"{'positions':>10}{'load s':>10}{'kernel s':>10}{'ns/pos':>10}{'loop s':>10}{'speedup':>10}")
+
+    for size in sizes:
+        positions = make_positions(size)
+
+        start = time.perf_counter()
+        columns = load_position_columns(positions)
+        load_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        totals = settle_positions(columns, outcome)
+        kernel_s = time.perf_counter() - start
+        ns_per_position = (load_s + kernel_s) * 1e9 / size
+
+        loop_col, speedup_col = '-', '-'
+        if size <= loop_max:
+            start = time.perf_counter()
+            payouts, unlocks = python_loop(positions, outcome)
+            loop_s = time.perf_counter() - start
+            loop_col = f"{loop_s:.3f}"
+            speedup_col = f"{loop_s / (load_s + kernel_s):.1f}"
+
+            # Same answer as the loop
+            kernel_payouts = dict(zip(columns['user_ids'], totals['payout']))
+            assert all(abs(kernel_payouts[u] - v) < 1e-6 for u, v in payouts.items())
+            kernel_unlocks = dict(zip(columns['user_ids'], totals['unlock']))
+            assert all(abs(kernel_unlocks[u] - v) < 1e-6 for u, v in unlocks.items())
+
+        print(f"{size:>10}{load_s:>10.3f}{kernel_s:>10.3f}{ns_per_position:>10.0f}{loop_col:>10}{speedup_col:>10}")
+    print("-"*60)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--loop-max', type=int, default=10000, help='largest size to run the Python loop on')
+    parser.add_argument('--outcome', choices=['true', 'false'], default='true')
+    args = parser.parse_args()
+
+    run_benchmark(args.sizes, args.loop_max, args.outcome)
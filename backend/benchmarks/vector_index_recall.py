@@ -0,0 +1,76 @@
+"""
+Recall / latency benchmark: IVF approximate index vs exact brute force
+
+Usage (from backend/):
+    python benchmarks/vector_index_recall.py --size 100000 --dim 256
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.vector_index import ExactVectorIndex, IVFVectorIndex
+
+def make_dataset(size: int, dim: int, clusters: int, seed: int = 0):
+    """Clustered synthetic embeddings (real text embeddings are far from uniform)"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=size)
+    data = centers[labels] + 0.35 * rng.normal(size=(size, dim)).astype(np.float32)
+    return data
+
+def build(index, data):
+    start = time.perf_counter()
+    for i, vector in enumerate(data):
+        index.add(f"m{i}", vector)
+    return time.perf_counter() - start
+
+def run_benchmark(size: int, dim: int, queries: int, k: int, nprobes: list, nlist: int):
+    print("="*60)
+    print(f"Vector index benchmark: n={size}, d={dim}, queries={queries}, k={k}")
+    print("="*60)
+
+    data = make_dataset(size, dim, clusters=max(8, size // 500))
+    rng = np.random.default_rng(1)
+    query_vectors = data[rng.choice(size, size=queries, replace=False)]
+    query_vectors = query_vectors + 0.1 * rng.normal(size=query_vectors.shape).astype(np.float32)
+
+    exact = ExactVectorIndex()
+    print(f"exact build: {build(exact, data):.2f}s")
+
+    ivf = IVFVectorIndex(nlist=nlist)
+    print(f"ivf build:   {build(ivf, data):.2f}s (trained={ivf.trained})")
+    if not ivf.trained:
+        ivf.train()
+
+    start = time.perf_counter()
+    truth = [{hit['market_id'] for hit in exact.search(q, k=k)} for q in query_vectors]
+    exact_ms = (time.perf_counter() - start) * 1000 / queries
+    print("-"*60)
+    print(f"{'backend':<16}{'nprobe':>8}{'recall@' + str(k):>12}{'ms/query':>12}{'speedup':>10}")
+    print(f"{'exact':<16}{'-':>8}{1.0:>12.3f}{exact_ms:>12.3f}{1.0:>10.1f}")
+
+    for nprobe in nprobes:
+        start = time.perf_counter()
+        results = [{hit['market_id'] for hit in ivf.search(q, k=k, nprobe=nprobe)} for q in query_vectors]
+        ivf_ms = (time.perf_counter() - start) * 1000 / queries
+        recall = np.mean([len(r & t) / len(t) for r, t in zip(results, truth)])
+        print(f"{'ivf':<16}{nprobe:>8}{recall:>12.3f}{ivf_ms:>12.3f}{exact_ms / ivf_ms:>10.1f}")
+    print("-"*60)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=50000)
+    parser.add_argument('--dim', type=int, default=256)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--nlist', type=int, default=0, help='0 = sqrt(size)')
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    run_benchmark(args.size, args.dim, args.queries, args.k, args.nprobe, args.nlist)
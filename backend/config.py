@@ -12,8 +12,75 @@ class Config:
     SUPABASE_URL = os.getenv('SUPABASE_URL')
     SUPABASE_KEY = os.getenv('SUPABASE_KEY')
     
+    # Supabase HTTP transport (pool sizes of 0 are derived from WEB_THREADS)
+    WEB_THREADS = int(os.getenv('WEB_THREADS', '8'))  # request threads per process
+    SUPABASE_HTTP2 = os.getenv('SUPABASE_HTTP2', 'true').lower() in ('1', 'true', 'yes')
+    SUPABASE_READ_POOL_SIZE = int(os.getenv('SUPABASE_READ_POOL_SIZE', '0'))
+    SUPABASE_WRITE_POOL_SIZE = int(os.getenv('SUPABASE_WRITE_POOL_SIZE', '0'))
+    SUPABASE_KEEPALIVE_SECONDS = float(os.getenv('SUPABASE_KEEPALIVE_SECONDS', '60'))
+    SUPABASE_CONNECT_TIMEOUT_SECONDS = float(os.getenv('SUPABASE_CONNECT_TIMEOUT_SECONDS', '5'))
+    SUPABASE_POOL_TIMEOUT_SECONDS = float(os.getenv('SUPABASE_POOL_TIMEOUT_SECONDS', '5'))
+    SUPABASE_READ_TIMEOUT_SECONDS = float(os.getenv('SUPABASE_READ_TIMEOUT_SECONDS', '10'))
+    SUPABASE_WRITE_TIMEOUT_SECONDS = float(os.getenv('SUPABASE_WRITE_TIMEOUT_SECONDS', '60'))
+    
     # OpenAI configuration
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+    EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'text-embedding-3-small')
+    AI_MAX_WORKERS = int(os.getenv('AI_MAX_WORKERS', '16'))
+    AI_CALL_TIMEOUT_SECONDS = float(os.getenv('AI_CALL_TIMEOUT_SECONDS', '8'))
+    OPENAI_TIMEOUT_SECONDS = float(os.getenv('OPENAI_TIMEOUT_SECONDS', '30'))
+    
+    # Background AI enrichment of submitted markets
+    AI_ENRICHMENT_ASYNC = os.getenv('AI_ENRICHMENT_ASYNC', 'true').lower() in ('1', 'true', 'yes')
+    ENRICHMENT_WORKERS = int(os.getenv('ENRICHMENT_WORKERS', '4'))
+    ENRICHMENT_MAX_ATTEMPTS = int(os.getenv('ENRICHMENT_MAX_ATTEMPTS', '3'))
+    ENRICHMENT_BACKOFF_SECONDS = float(os.getenv('ENRICHMENT_BACKOFF_SECONDS', '2'))
+    
+    # Embedding micro-batching
+    EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '64'))
+    EMBEDDING_BATCH_WAIT_MS = float(os.getenv('EMBEDDING_BATCH_WAIT_MS', '10'))
+    
+    # Embedding cache (EMBEDDING_CACHE_PATH enables the SQLite tier)
+    EMBEDDING_CACHE_SIZE = int(os.getenv('EMBEDDING_CACHE_SIZE', '10000'))
+    EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH')
+    
+    # Oracle predictions
+    ORACLE_BATCH_CONCURRENCY = int(os.getenv('ORACLE_BATCH_CONCURRENCY', '5'))
+    PREDICTION_CACHE_TTL_SECONDS = float(os.getenv('PREDICTION_CACHE_TTL_SECONDS', '300'))
+    PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', '5000'))
+    
+    # Duplicate detection / vector index
+    DUPLICATE_SIMILARITY_THRESHOLD = float(os.getenv('DUPLICATE_SIMILARITY_THRESHOLD', '0.85'))
+    VECTOR_INDEX_SYNC_SECONDS = float(os.getenv('VECTOR_INDEX_SYNC_SECONDS', '30'))
+    VECTOR_INDEX_BACKEND = os.getenv('VECTOR_INDEX_BACKEND', 'exact')  # 'exact' or 'ivf'
+    VECTOR_INDEX_NLIST = int(os.getenv('VECTOR_INDEX_NLIST', '0'))  # 0 = sqrt(n)
+    VECTOR_INDEX_NPROBE = int(os.getenv('VECTOR_INDEX_NPROBE', '8'))
+    VECTOR_INDEX_SNAPSHOT_PATH = os.getenv('VECTOR_INDEX_SNAPSHOT_PATH')
+    VECTOR_INDEX_SNAPSHOT_SECONDS = float(os.getenv('VECTOR_INDEX_SNAPSHOT_SECONDS', '600'))
+    
+    # In-process market engine (single node owns pool totals, write-behind to the DB)
+    MARKET_ENGINE_ENABLED = os.getenv('MARKET_ENGINE_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    MARKET_ENGINE_FLUSH_MS = float(os.getenv('MARKET_ENGINE_FLUSH_MS', '200'))
+    MARKET_ENGINE_JOURNAL_PATH = os.getenv('MARKET_ENGINE_JOURNAL_PATH', 'market_engine.journal')
+    MARKET_ENGINE_FSYNC = os.getenv('MARKET_ENGINE_FSYNC', 'false').lower() in ('1', 'true', 'yes')
+    
+    # Set-based settlement
+    SETTLEMENT_BATCH_SIZE = int(os.getenv('SETTLEMENT_BATCH_SIZE', '500'))  # users per rpc
+    SETTLEMENT_PAGE_SIZE = int(os.getenv('SETTLEMENT_PAGE_SIZE', '1000'))  # positions per read
+    SETTLEMENT_PAYOUT_POLICY = os.getenv('SETTLEMENT_PAYOUT_POLICY', 'position')  # position | pool
+    SETTLEMENT_WORKERS = int(os.getenv('SETTLEMENT_WORKERS', '2'))
+    SETTLEMENT_MAX_ATTEMPTS = int(os.getenv('SETTLEMENT_MAX_ATTEMPTS', '5'))
+    SETTLEMENT_BACKOFF_SECONDS = float(os.getenv('SETTLEMENT_BACKOFF_SECONDS', '5'))
+    SETTLEMENT_STALE_MINUTES = int(os.getenv('SETTLEMENT_STALE_MINUTES', '15'))
+    SETTLEMENT_ADMIN_TOKEN = os.getenv('SETTLEMENT_ADMIN_TOKEN')  # enables the X-Admin-Token settlement routes
+    
+    # Platform aggregates cache (GET /stats)
+    PLATFORM_STATS_TTL_SECONDS = float(os.getenv('PLATFORM_STATS_TTL_SECONDS', '5'))
+    PLATFORM_STATS_COMPACT_SECONDS = float(os.getenv('PLATFORM_STATS_COMPACT_SECONDS', '60'))  # 0 = never
+    
+    # Leaderboard top-N snapshot
+    LEADERBOARD_CACHE_TTL_SECONDS = float(os.getenv('LEADERBOARD_CACHE_TTL_SECONDS', '30'))
+    LEADERBOARD_SNAPSHOT_SIZE = int(os.getenv('LEADERBOARD_SNAPSHOT_SIZE', '100'))
     
     # Database configuration (if needed)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
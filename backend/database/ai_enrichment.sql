@@ -0,0 +1,21 @@
+-- Asynchronous AI enrichment
+-- Markets are inserted immediately with enrichment_status = 'pending' and
+-- a background worker fills ai_prediction, ai_confidence and embedding.
+
+ALTER TABLE markets ADD COLUMN IF NOT EXISTS enrichment_status VARCHAR(20) DEFAULT 'done' NOT NULL
+    CHECK (enrichment_status IN ('pending', 'processing', 'done', 'failed'));
+ALTER TABLE markets ADD COLUMN IF NOT EXISTS enrichment_attempts INTEGER DEFAULT 0 NOT NULL;
+ALTER TABLE markets ADD COLUMN IF NOT EXISTS enrichment_error TEXT;
+-- When a worker claimed the market (updated_at moves with every trade, so
+-- it cannot tell a crashed worker from a busy market)
+ALTER TABLE markets ADD COLUMN IF NOT EXISTS enrichment_claimed_at TIMESTAMP WITH TIME ZONE;
+
+-- Duplicate check result computed by the worker
+ALTER TABLE markets ADD COLUMN IF NOT EXISTS duplicate_of UUID REFERENCES markets(id) ON DELETE SET NULL;
+ALTER TABLE markets ADD COLUMN IF NOT EXISTS duplicate_similarity DECIMAL(5, 4);
+
+-- Workers look up unfinished markets on startup
+CREATE INDEX IF NOT EXISTS idx_markets_enrichment_pending ON markets(enrichment_status)
+    WHERE enrichment_status IN ('pending', 'processing');
+
+NOTIFY pgrst, 'reload schema';
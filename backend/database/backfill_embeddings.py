@@ -0,0 +1,74 @@
+"""
+Backfill embeddings for markets whose embedding is null
+
+Embeds markets in large provider batches and writes each batch back with
+one set_market_embeddings call (database/market_embeddings.sql), which
+only updates markets that still exist. Run from the backend directory:
+    python database/backfill_embeddings.py [--batch-size 256] [--status active]
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.ai_service import AIService
+from utils.supabase_client import get_supabase_client
+
+def backfill_embeddings(batch_size: int = 256, status: str = None):
+    """Embed every market with a null embedding, batch by batch"""
+    supabase = get_supabase_client()
+    ai_service = AIService()
+
+    if not ai_service.client:
+        print("Error: OPENAI_API_KEY is not configured")
+        return False
+
+    print("="*60)
+    print("Backfilling market embeddings")
+    print("="*60)
+
+    last_id = None
+    embedded = 0
+    failed = 0
+
+    while True:
+        query = supabase.table('markets').select('id, text').is_('embedding', 'null')
+        if status:
+            query = query.eq('status', status)
+        if last_id:
+            query = query.gt('id', last_id)
+        rows = query.order('id').limit(batch_size).execute().data or []
+
+        if not rows:
+            break
+        last_id = rows[-1]['id']
+
+        embeddings = ai_service.generate_embeddings([row['text'] for row in rows])
+        updates = [
+            {'id': row['id'], 'embedding': embedding}
+            for row, embedding in zip(rows, embeddings)
+            if embedding is not None
+        ]
+        failed += len(rows) - len(updates)
+
+        if updates:
+            # One round-trip per batch; deleted markets are skipped, not re-created
+            written = supabase.rpc('set_market_embeddings', {'p_embeddings': updates}).execute().data
+            embedded += written or 0
+
+        print(f"  embedded {embedded} markets ({failed} failed)")
+
+    print("-"*60)
+    print(f"Done: {embedded} embedded, {failed} failed")
+    return failed == 0
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Backfill market embeddings')
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--status', default=None, help="Only backfill markets with this status (e.g. 'active')")
+    args = parser.parse_args()
+
+    success = backfill_embeddings(batch_size=args.batch_size, status=args.status)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,93 @@
+-- Set-based market settlement
+-- SettlementService (services/settlement_service.py) settles a market in
+-- three steps:
+--   1. claim: markets.status active -> settling (stops new trades, records
+--      the resolution so an interrupted run resumes with the same outcome)
+--   2. apply_settlement_batch() for each chunk of per-user balance deltas;
+--      settlement_batches records applied chunks so a resumed run skips them
+--   3. finish_settlement() closes the open positions and sets the final
+--      market status in one statement pair
+
+ALTER TABLE markets ADD COLUMN IF NOT EXISTS resolution VARCHAR(10)
+    CHECK (resolution IN ('true', 'false'));
+
+CREATE TABLE IF NOT EXISTS settlement_batches (
+    market_id UUID REFERENCES markets(id) ON DELETE CASCADE NOT NULL,
+    batch_no INTEGER NOT NULL,
+    users INTEGER NOT NULL,
+    applied_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (market_id, batch_no)
+);
+
+ALTER TABLE settlement_batches ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow all operations on settlement_batches" ON settlement_batches
+    FOR ALL USING (true) WITH CHECK (true);
+
+-- p_deltas: [{"id", "unlock", "credit", "earned", "lost"}, ...]
+-- Unlocks are capped at the user's locked balance.
+CREATE OR REPLACE FUNCTION apply_settlement_batch(
+    p_market_id UUID,
+    p_batch_no INTEGER,
+    p_deltas JSONB
+)
+RETURNS BOOLEAN AS $$
+DECLARE
+    v_status VARCHAR;
+BEGIN
+    SELECT status INTO v_status FROM markets WHERE id = p_market_id FOR SHARE;
+    IF v_status IS DISTINCT FROM 'settling' THEN
+        RAISE EXCEPTION 'Market % is not settling (status: %)', p_market_id, v_status;
+    END IF;
+
+    INSERT INTO settlement_batches (market_id, batch_no, users)
+    VALUES (p_market_id, p_batch_no, jsonb_array_length(p_deltas))
+    ON CONFLICT (market_id, batch_no) DO NOTHING;
+    IF NOT FOUND THEN
+        -- Already applied by an earlier run
+        RETURN FALSE;
+    END IF;
+
+    UPDATE users u
+    SET locked_balance = u.locked_balance - LEAST(d.unlock, u.locked_balance),
+        available_balance = u.available_balance + LEAST(d.unlock, u.locked_balance) + d.credit,
+        total_earned = u.total_earned + d.earned,
+        total_lost = u.total_lost + d.lost
+    FROM jsonb_to_recordset(p_deltas) AS d(
+        id UUID,
+        unlock NUMERIC,
+        credit NUMERIC,
+        earned NUMERIC,
+        lost NUMERIC
+    )
+    WHERE u.id = d.id;
+
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Returns the number of positions closed, or -1 if the market was not settling
+CREATE OR REPLACE FUNCTION finish_settlement(p_market_id UUID, p_status VARCHAR)
+RETURNS INTEGER AS $$
+DECLARE
+    v_closed INTEGER;
+BEGIN
+    UPDATE markets
+    SET status = p_status,
+        resolved_at = NOW()
+    WHERE id = p_market_id AND status = 'settling';
+    IF NOT FOUND THEN
+        RETURN -1;
+    END IF;
+
+    UPDATE positions
+    SET status = 'closed'
+    WHERE market_id = p_market_id AND status = 'open';
+    GET DIAGNOSTICS v_closed = ROW_COUNT;
+
+    DELETE FROM settlement_batches WHERE market_id = p_market_id;
+    RETURN v_closed;
+END;
+$$ LANGUAGE plpgsql;
+
+NOTIFY pgrst, 'reload schema';
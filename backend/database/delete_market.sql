@@ -0,0 +1,63 @@
+-- Set-based market deletion with refunds
+-- DELETE /markets/<id> calls delete_market_with_refunds() through
+-- supabase.rpc: every open position's cost basis and the submitter's stake
+-- are refunded (grouped per user), positions are marked 'deleted' and the
+-- market is marked 'deleted', all in one transaction.
+
+CREATE OR REPLACE FUNCTION delete_market_with_refunds(p_market_id UUID, p_user_id UUID)
+RETURNS JSONB AS $$
+DECLARE
+    v_market markets%ROWTYPE;
+    v_refunds JSONB;
+BEGIN
+    SELECT * INTO v_market FROM markets WHERE id = p_market_id FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN jsonb_build_object('error', 'Market not found');
+    END IF;
+    IF v_market.submitter_id IS DISTINCT FROM p_user_id THEN
+        RETURN jsonb_build_object('error', 'Only market submitter can delete this market');
+    END IF;
+    IF v_market.status <> 'active' THEN
+        RETURN jsonb_build_object('error', 'Cannot delete market with status: ' || v_market.status);
+    END IF;
+
+    WITH closed AS (
+        UPDATE positions
+        SET status = 'deleted'
+        WHERE market_id = p_market_id
+          AND status = 'open'
+          AND v_market.total_bet_true + v_market.total_bet_false > 0
+        RETURNING user_id, cost_basis
+    ),
+    refunds AS (
+        SELECT user_id, cost_basis AS refund_amount, NULL::TEXT AS type FROM closed
+        UNION ALL
+        SELECT v_market.submitter_id, v_market.stake, 'submitter'
+        WHERE v_market.submitter_id IS NOT NULL
+    ),
+    per_user AS (
+        SELECT user_id, SUM(refund_amount) AS amount FROM refunds GROUP BY user_id
+    ),
+    refunded AS (
+        UPDATE users u
+        SET available_balance = u.available_balance + p.amount,
+            locked_balance = GREATEST(0, u.locked_balance - p.amount)
+        FROM per_user p
+        WHERE u.id = p.user_id
+        RETURNING u.id
+    )
+    SELECT COALESCE(jsonb_agg(jsonb_strip_nulls(jsonb_build_object(
+               'user_id', user_id,
+               'refund_amount', refund_amount,
+               'type', type
+           ))), '[]'::jsonb)
+    INTO v_refunds
+    FROM refunds;
+
+    UPDATE markets SET status = 'deleted' WHERE id = p_market_id;
+
+    RETURN jsonb_build_object('refunds', v_refunds);
+END;
+$$ LANGUAGE plpgsql;
+
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,157 @@
+-- Atomic trade execution
+-- place_bet calls execute_trade() through supabase.rpc so validation, the
+-- balance lock, the pool update, the position upsert and the trade insert
+-- happen in one transaction and one round-trip.
+--
+-- Locking: the market row is locked before the user row (always in that
+-- order) so concurrent bets on a hot market queue on the market lock
+-- instead of losing updates to total_bet_true / total_bet_false.
+--
+-- When the in-process market engine owns the pool (MARKET_ENGINE_ENABLED,
+-- see market_engine.sql) it passes p_price: the market row is then only
+-- share-locked for its status and the pool update is left to the engine.
+--
+-- A market with a settlement job (settlement_jobs.sql) never trades, even
+-- if its status has not left 'active' yet.
+
+-- Speeds up the open-position lookup for (user, market, side)
+CREATE INDEX IF NOT EXISTS idx_positions_open_user_market_type
+    ON positions(user_id, market_id, type) WHERE status = 'open';
+
+-- Replaced by the version below with the optional p_price argument
+DROP FUNCTION IF EXISTS execute_trade(UUID, UUID, VARCHAR, NUMERIC);
+
+CREATE OR REPLACE FUNCTION execute_trade(
+    p_user_id UUID,
+    p_market_id UUID,
+    p_type VARCHAR,
+    p_cc_amount NUMERIC,
+    p_price NUMERIC DEFAULT NULL
+)
+RETURNS JSONB AS $$
+DECLARE
+    v_market markets%ROWTYPE;
+    v_user users%ROWTYPE;
+    v_position positions%ROWTYPE;
+    v_price NUMERIC;
+    v_new_price NUMERIC;
+    v_shares NUMERIC;
+    v_total_shares NUMERIC;
+    v_total_cost NUMERIC;
+    v_entry_price NUMERIC;
+BEGIN
+    IF p_type NOT IN ('true', 'false') THEN
+        RETURN jsonb_build_object('error', 'type must be ''true'' or ''false''');
+    END IF;
+    IF p_cc_amount IS NULL OR p_cc_amount <= 0 THEN
+        RETURN jsonb_build_object('error', 'Collateral cost must be greater than 0');
+    END IF;
+
+    IF p_price IS NULL THEN
+        SELECT * INTO v_market FROM markets WHERE id = p_market_id FOR UPDATE;
+    ELSE
+        -- Shared lock: trades don't block each other, but settlement's
+        -- active -> settling update waits for in-flight trades
+        SELECT * INTO v_market FROM markets WHERE id = p_market_id FOR SHARE;
+    END IF;
+    IF NOT FOUND THEN
+        RETURN jsonb_build_object('error', 'Market not found');
+    END IF;
+    IF v_market.status <> 'active' THEN
+        RETURN jsonb_build_object('error', 'Market is not active. Current status: ' || v_market.status);
+    END IF;
+    IF EXISTS (SELECT 1 FROM settlement_jobs WHERE market_id = p_market_id) THEN
+        RETURN jsonb_build_object('error', 'Market is being settled');
+    END IF;
+
+    SELECT * INTO v_user FROM users WHERE id = p_user_id FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN jsonb_build_object('error', 'User not found');
+    END IF;
+    IF v_user.available_balance < p_cc_amount THEN
+        RETURN jsonb_build_object('error',
+            'Insufficient balance. Available: ' || v_user.available_balance || ', Required: ' || p_cc_amount);
+    END IF;
+
+    -- Shares are priced at the pre-trade price
+    v_price := COALESCE(p_price, v_market.price);
+    IF p_type = 'true' THEN
+        v_shares := p_cc_amount / v_price;
+    ELSE
+        v_shares := p_cc_amount / (1 - v_price);
+    END IF;
+
+    UPDATE users
+    SET available_balance = available_balance - p_cc_amount,
+        locked_balance = locked_balance + p_cc_amount
+    WHERE id = p_user_id;
+
+    IF p_price IS NULL THEN
+        IF p_type = 'true' THEN
+            v_market.total_bet_true := v_market.total_bet_true + p_cc_amount;
+        ELSE
+            v_market.total_bet_false := v_market.total_bet_false + p_cc_amount;
+        END IF;
+        v_new_price := GREATEST(0.01, LEAST(0.99,
+            v_market.total_bet_true / NULLIF(v_market.total_bet_true + v_market.total_bet_false, 0)));
+        v_new_price := COALESCE(v_new_price, 0.5);
+
+        UPDATE markets
+        SET total_bet_true = v_market.total_bet_true,
+            total_bet_false = v_market.total_bet_false,
+            price = v_new_price
+        WHERE id = p_market_id
+        RETURNING * INTO v_market;
+    END IF;
+
+    SELECT * INTO v_position FROM positions
+    WHERE user_id = p_user_id AND market_id = p_market_id AND type = p_type AND status = 'open'
+    LIMIT 1
+    FOR UPDATE;
+
+    IF FOUND THEN
+        -- Aggregate into the existing position at a weighted entry price
+        v_total_shares := v_position.shares + v_shares;
+        v_total_cost := v_position.cost_basis + p_cc_amount;
+        IF p_type = 'true' THEN
+            v_entry_price := v_total_cost / v_total_shares;
+        ELSE
+            v_entry_price := 1 - (v_total_cost / v_total_shares);
+        END IF;
+        v_entry_price := GREATEST(0.01, LEAST(0.99, v_entry_price));
+
+        UPDATE positions
+        SET shares = v_total_shares,
+            cost_basis = v_total_cost,
+            entry_price = v_entry_price,
+            collateral = GREATEST(0, v_total_shares * (1 - v_entry_price))
+        WHERE id = v_position.id
+        RETURNING * INTO v_position;
+    ELSE
+        INSERT INTO positions (user_id, market_id, type, shares, entry_price, cost_basis, collateral, status)
+        VALUES (p_user_id, p_market_id, p_type, v_shares, v_price, p_cc_amount,
+                GREATEST(0, v_shares * (1 - v_price)), 'open')
+        RETURNING * INTO v_position;
+    END IF;
+
+    INSERT INTO trades (user_id, market_id, type, cc_amount, shares, price)
+    VALUES (p_user_id, p_market_id, p_type, p_cc_amount, v_shares, v_price);
+
+    RETURN jsonb_build_object(
+        'market', jsonb_build_object(
+            'id', v_market.id,
+            'submitter_id', v_market.submitter_id,
+            'stake', v_market.stake,
+            'price', v_market.price,
+            'total_bet_true', v_market.total_bet_true,
+            'total_bet_false', v_market.total_bet_false,
+            'status', v_market.status
+        ),
+        'position', to_jsonb(v_position),
+        'shares_received', v_shares,
+        'new_price', v_new_price
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+NOTIFY pgrst, 'reload schema';
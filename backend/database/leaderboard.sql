@@ -0,0 +1,83 @@
+-- Leaderboard by total balance
+-- users.total_balance (available + locked) is a stored generated column, so
+-- it is current after every balance change without application code. The
+-- leaderboard order is (total_balance DESC, total_earned DESC, id DESC) and
+-- idx_users_leaderboard serves it: a top-N page is a bounded index scan,
+-- neighbours around a user are two keyset scans from that user's key, and
+-- a user's rank counts the index entries ahead of it (index-only scan).
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS total_balance DECIMAL(15, 2)
+    GENERATED ALWAYS AS (available_balance + locked_balance) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_users_leaderboard
+    ON users (total_balance, total_earned, id);
+
+-- Rank (1-based) and leaderboard fields of one user
+CREATE OR REPLACE FUNCTION leaderboard_rank(p_user_id UUID)
+RETURNS TABLE (
+    rank BIGINT,
+    id UUID,
+    pseudonym VARCHAR,
+    total_balance DECIMAL,
+    total_earned DECIMAL
+) AS $$
+    SELECT (
+               SELECT COUNT(*) + 1
+               FROM users u
+               WHERE (u.total_balance, u.total_earned, u.id)
+                   > (me.total_balance, me.total_earned, me.id)
+           ),
+           me.id,
+           me.pseudonym,
+           me.total_balance,
+           me.total_earned
+    FROM users me
+    WHERE me.id = p_user_id;
+$$ LANGUAGE sql STABLE;
+
+-- A user and up to p_radius users directly above and below them, by rank
+CREATE OR REPLACE FUNCTION leaderboard_neighbours(p_user_id UUID, p_radius INTEGER DEFAULT 5)
+RETURNS TABLE (
+    rank BIGINT,
+    id UUID,
+    pseudonym VARCHAR,
+    total_balance DECIMAL,
+    total_earned DECIMAL
+) AS $$
+    WITH me AS (
+        SELECT * FROM leaderboard_rank(p_user_id)
+    ),
+    above AS (
+        SELECT u.id, u.pseudonym, u.total_balance, u.total_earned
+        FROM users u, me
+        WHERE (u.total_balance, u.total_earned, u.id)
+            > (me.total_balance, me.total_earned, me.id)
+        ORDER BY u.total_balance, u.total_earned, u.id
+        LIMIT p_radius
+    ),
+    below AS (
+        SELECT u.id, u.pseudonym, u.total_balance, u.total_earned
+        FROM users u, me
+        WHERE (u.total_balance, u.total_earned, u.id)
+            < (me.total_balance, me.total_earned, me.id)
+        ORDER BY u.total_balance DESC, u.total_earned DESC, u.id DESC
+        LIMIT p_radius
+    )
+    SELECT ranked.*
+    FROM (
+        SELECT me.rank - ROW_NUMBER() OVER (ORDER BY a.total_balance, a.total_earned, a.id),
+               a.id, a.pseudonym, a.total_balance, a.total_earned
+        FROM above a, me
+        UNION ALL
+        SELECT * FROM me
+        UNION ALL
+        SELECT me.rank + ROW_NUMBER() OVER (
+                   ORDER BY b.total_balance DESC, b.total_earned DESC, b.id DESC
+               ),
+               b.id, b.pseudonym, b.total_balance, b.total_earned
+        FROM below b, me
+    ) AS ranked (rank, id, pseudonym, total_balance, total_earned)
+    ORDER BY ranked.rank;
+$$ LANGUAGE sql STABLE;
+
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,139 @@
+-- Incremental consensus tally per market
+-- Each oracle report's weight (stake x the oracle's reputation when it voted)
+-- is stored on the report and added to a running per-market tally, so the
+-- consensus decision after a vote reads one row instead of every report.
+-- reconcile_market_consensus() recomputes a market's weights with current
+-- reputations and rewrites its tally from oracle_reports.
+-- Requires oracle_reputation.sql.
+
+ALTER TABLE oracle_reports ADD COLUMN IF NOT EXISTS consensus_weight NUMERIC;
+
+CREATE TABLE IF NOT EXISTS market_consensus (
+    market_id UUID PRIMARY KEY REFERENCES markets(id) ON DELETE CASCADE,
+    reports INTEGER DEFAULT 0 NOT NULL,
+    weighted_true NUMERIC DEFAULT 0 NOT NULL,
+    weighted_false NUMERIC DEFAULT 0 NOT NULL,
+    reconciled_at TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+ALTER TABLE market_consensus ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow all operations on market_consensus" ON market_consensus
+    FOR ALL USING (true) WITH CHECK (true);
+
+CREATE OR REPLACE FUNCTION oracle_reputation_of(p_oracle_id UUID)
+RETURNS NUMERIC AS $$
+    SELECT COALESCE(
+        (SELECT correct::NUMERIC / NULLIF(total, 0) FROM oracle_reputation WHERE oracle_id = p_oracle_id),
+        0.6
+    );
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION set_consensus_weight()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.consensus_weight := NEW.stake * oracle_reputation_of(NEW.oracle_id);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS set_consensus_weight ON oracle_reports;
+CREATE TRIGGER set_consensus_weight
+    BEFORE INSERT ON oracle_reports
+    FOR EACH ROW EXECUTE FUNCTION set_consensus_weight();
+
+CREATE OR REPLACE FUNCTION track_market_consensus()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO market_consensus (market_id, reports, weighted_true, weighted_false)
+        VALUES (
+            NEW.market_id,
+            1,
+            CASE WHEN NEW.verdict = 'true' THEN COALESCE(NEW.consensus_weight, 0) ELSE 0 END,
+            CASE WHEN NEW.verdict = 'false' THEN COALESCE(NEW.consensus_weight, 0) ELSE 0 END
+        )
+        ON CONFLICT (market_id) DO UPDATE
+        SET reports = market_consensus.reports + 1,
+            weighted_true = market_consensus.weighted_true + EXCLUDED.weighted_true,
+            weighted_false = market_consensus.weighted_false + EXCLUDED.weighted_false,
+            updated_at = NOW();
+    ELSE
+        -- Update only: when the market itself is being deleted its tally row
+        -- is already gone and must not be recreated
+        UPDATE market_consensus
+        SET reports = reports - 1,
+            weighted_true = weighted_true - CASE WHEN OLD.verdict = 'true' THEN COALESCE(OLD.consensus_weight, 0) ELSE 0 END,
+            weighted_false = weighted_false - CASE WHEN OLD.verdict = 'false' THEN COALESCE(OLD.consensus_weight, 0) ELSE 0 END,
+            updated_at = NOW()
+        WHERE market_id = OLD.market_id;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS track_market_consensus ON oracle_reports;
+CREATE TRIGGER track_market_consensus
+    AFTER INSERT OR DELETE ON oracle_reports
+    FOR EACH ROW EXECUTE FUNCTION track_market_consensus();
+
+-- Recompute one market's weights and tally from oracle_reports
+CREATE OR REPLACE FUNCTION reconcile_market_consensus(p_market_id UUID)
+RETURNS market_consensus AS $$
+DECLARE
+    v_tally market_consensus%ROWTYPE;
+BEGIN
+    -- Lock the tally row (creating it if missing) before reading the
+    -- reports. Report inserts/deletes update this row from their trigger,
+    -- so they either committed before we read (and are counted) or wait
+    -- and apply their increment on top of the recomputed tally.
+    INSERT INTO market_consensus (market_id)
+    VALUES (p_market_id)
+    ON CONFLICT (market_id) DO NOTHING;
+
+    PERFORM 1
+    FROM market_consensus
+    WHERE market_id = p_market_id
+    FOR UPDATE;
+
+    UPDATE oracle_reports
+    SET consensus_weight = stake * oracle_reputation_of(oracle_id)
+    WHERE market_id = p_market_id;
+
+    UPDATE market_consensus c
+    SET reports = r.reports,
+        weighted_true = r.weighted_true,
+        weighted_false = r.weighted_false,
+        reconciled_at = NOW(),
+        updated_at = NOW()
+    FROM (
+        SELECT COUNT(*) AS reports,
+               COALESCE(SUM(consensus_weight) FILTER (WHERE verdict = 'true'), 0) AS weighted_true,
+               COALESCE(SUM(consensus_weight) FILTER (WHERE verdict = 'false'), 0) AS weighted_false
+        FROM oracle_reports
+        WHERE market_id = p_market_id
+    ) r
+    WHERE c.market_id = p_market_id
+    RETURNING c.* INTO v_tally;
+
+    RETURN v_tally;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Backfill weights and tallies for existing reports
+UPDATE oracle_reports SET consensus_weight = stake * oracle_reputation_of(oracle_id)
+WHERE consensus_weight IS NULL;
+
+INSERT INTO market_consensus (market_id, reports, weighted_true, weighted_false, reconciled_at)
+SELECT market_id,
+       COUNT(*),
+       COALESCE(SUM(consensus_weight) FILTER (WHERE verdict = 'true'), 0),
+       COALESCE(SUM(consensus_weight) FILTER (WHERE verdict = 'false'), 0),
+       NOW()
+FROM oracle_reports
+GROUP BY market_id
+ON CONFLICT (market_id) DO NOTHING;
+
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,22 @@
+-- Bulk embedding writes for database/backfill_embeddings.py
+-- One UPDATE per batch that only touches markets that still exist and still
+-- have no embedding, so a market deleted (or enriched) between the page read
+-- and the write is left alone instead of being re-inserted by an upsert.
+
+-- p_embeddings: [{"id", "embedding": [...]}, ...]; returns the rows written
+CREATE OR REPLACE FUNCTION set_market_embeddings(p_embeddings JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+    v_updated INTEGER;
+BEGIN
+    UPDATE markets m
+    SET embedding = e.embedding::TEXT
+    FROM jsonb_to_recordset(p_embeddings) AS e(id UUID, embedding JSONB)
+    WHERE m.id = e.id AND m.embedding IS NULL;
+
+    GET DIAGNOSTICS v_updated = ROW_COUNT;
+    RETURN v_updated;
+END;
+$$ LANGUAGE plpgsql;
+
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,45 @@
+-- Write-behind persistence for the in-process market engine
+-- (services/market_engine.py, enabled with MARKET_ENGINE_ENABLED).
+-- The engine keeps pool totals in memory and periodically writes the latest
+-- state of each traded market. pool_seq orders those writes so replaying
+-- the local journal after a crash never moves a market backwards.
+-- Only markets still active, or settling with no payout batch applied yet
+-- (the engine's final flush on release), accept a write: a late flush or
+-- journal replay never changes the pools of a market being paid out,
+-- resolved or deleted. Requires bulk_settlement.sql (settlement_batches).
+
+ALTER TABLE markets ADD COLUMN IF NOT EXISTS pool_seq BIGINT DEFAULT 0 NOT NULL;
+
+CREATE OR REPLACE FUNCTION flush_market_pools(p_pools JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+    v_updated INTEGER;
+BEGIN
+    UPDATE markets m
+    SET total_bet_true = p.total_bet_true,
+        total_bet_false = p.total_bet_false,
+        price = p.price,
+        pool_seq = p.pool_seq
+    FROM jsonb_to_recordset(p_pools) AS p(
+        id UUID,
+        pool_seq BIGINT,
+        total_bet_true NUMERIC,
+        total_bet_false NUMERIC,
+        price NUMERIC
+    )
+    WHERE m.id = p.id
+      AND m.pool_seq < p.pool_seq
+      AND (
+          m.status = 'active'
+          OR (
+              m.status = 'settling'
+              AND NOT EXISTS (SELECT 1 FROM settlement_batches b WHERE b.market_id = m.id)
+          )
+      );
+
+    GET DIAGNOSTICS v_updated = ROW_COUNT;
+    RETURN v_updated;
+END;
+$$ LANGUAGE plpgsql;
+
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,85 @@
+-- Incremental oracle reputation
+-- Per-oracle correct / total counters over resolved reports
+-- (status 'correct' or 'incorrect'), kept current by a trigger on
+-- oracle_reports so consensus and payouts read one row per oracle instead of
+-- the oracle's whole report history. rebuild_oracle_reputation() recomputes
+-- the table from oracle_reports (see database/rebuild_oracle_reputation.py).
+
+CREATE TABLE IF NOT EXISTS oracle_reputation (
+    oracle_id UUID PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    correct INTEGER DEFAULT 0 NOT NULL,
+    total INTEGER DEFAULT 0 NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+ALTER TABLE oracle_reputation ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow all operations on oracle_reputation" ON oracle_reputation
+    FOR ALL USING (true) WITH CHECK (true);
+
+CREATE OR REPLACE FUNCTION track_oracle_reputation()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_correct INTEGER := 0;
+    v_total INTEGER := 0;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status IN ('correct', 'incorrect') THEN
+        v_total := v_total - 1;
+        v_correct := v_correct - (OLD.status = 'correct')::INTEGER;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.status IN ('correct', 'incorrect') THEN
+        v_total := v_total + 1;
+        v_correct := v_correct + (NEW.status = 'correct')::INTEGER;
+    END IF;
+
+    IF v_total > 0 THEN
+        INSERT INTO oracle_reputation (oracle_id, correct, total)
+        VALUES (NEW.oracle_id, v_correct, v_total)
+        ON CONFLICT (oracle_id) DO UPDATE
+        SET correct = oracle_reputation.correct + EXCLUDED.correct,
+            total = oracle_reputation.total + EXCLUDED.total,
+            updated_at = NOW();
+    ELSIF v_total <> 0 OR v_correct <> 0 THEN
+        -- Update only: when the oracle's user is being deleted its counters
+        -- row is already gone and must not be recreated
+        UPDATE oracle_reputation
+        SET correct = correct + v_correct,
+            total = total + v_total,
+            updated_at = NOW()
+        WHERE oracle_id = OLD.oracle_id;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS track_oracle_reputation ON oracle_reports;
+CREATE TRIGGER track_oracle_reputation
+    AFTER INSERT OR DELETE OR UPDATE OF status ON oracle_reports
+    FOR EACH ROW EXECUTE FUNCTION track_oracle_reputation();
+
+-- Recompute every counter from oracle_reports; returns the number of oracles
+CREATE OR REPLACE FUNCTION rebuild_oracle_reputation()
+RETURNS INTEGER AS $$
+DECLARE
+    v_oracles INTEGER;
+BEGIN
+    LOCK TABLE oracle_reputation IN EXCLUSIVE MODE;
+    DELETE FROM oracle_reputation;
+
+    INSERT INTO oracle_reputation (oracle_id, correct, total)
+    SELECT oracle_id,
+           COUNT(*) FILTER (WHERE status = 'correct'),
+           COUNT(*)
+    FROM oracle_reports
+    WHERE status IN ('correct', 'incorrect')
+    GROUP BY oracle_id;
+
+    GET DIAGNOSTICS v_oracles = ROW_COUNT;
+    RETURN v_oracles;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT rebuild_oracle_reputation();
+
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,222 @@
+-- Maintained platform aggregates for GET /stats
+-- Counters for users, markets, active markets, CC locked in user balances
+-- and CC in the pools of open (active or settling) markets, kept current by
+-- triggers on users and markets so every trade, submission, settlement and
+-- deletion updates them without any extra application code.
+--
+-- The counters are append-only: each users/markets statement INSERTs one
+-- delta row and never updates an existing one, so writers take no row locks
+-- here and cannot deadlock with each other however their users/markets
+-- updates are ordered. The platform_stats view sums the deltas and
+-- compact_platform_stats() periodically folds them into one row (a
+-- background thread in each app process calls it, see
+-- services/platform_stats.py, which also caches the view).
+
+CREATE TABLE IF NOT EXISTS platform_stats_deltas (
+    id BIGSERIAL PRIMARY KEY,
+    total_users BIGINT DEFAULT 0 NOT NULL,
+    total_markets BIGINT DEFAULT 0 NOT NULL,
+    active_markets BIGINT DEFAULT 0 NOT NULL,
+    total_cc_locked NUMERIC DEFAULT 0 NOT NULL,
+    total_cc_in_pools NUMERIC DEFAULT 0 NOT NULL
+);
+
+ALTER TABLE platform_stats_deltas ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow all operations on platform_stats_deltas" ON platform_stats_deltas
+    FOR ALL USING (true) WITH CHECK (true);
+
+CREATE OR REPLACE VIEW platform_stats AS
+SELECT COALESCE(SUM(total_users), 0) AS total_users,
+       COALESCE(SUM(total_markets), 0) AS total_markets,
+       COALESCE(SUM(active_markets), 0) AS active_markets,
+       COALESCE(SUM(total_cc_locked), 0) AS total_cc_locked,
+       COALESCE(SUM(total_cc_in_pools), 0) AS total_cc_in_pools
+FROM platform_stats_deltas;
+
+-- Superseded by platform_stats_deltas (updating shared slot rows from
+-- triggers could deadlock against multi-row users updates)
+DROP TABLE IF EXISTS platform_stats_slots;
+
+CREATE OR REPLACE FUNCTION bump_platform_stats(
+    p_users BIGINT,
+    p_markets BIGINT,
+    p_active BIGINT,
+    p_locked NUMERIC,
+    p_pools NUMERIC
+)
+RETURNS VOID AS $$
+BEGIN
+    IF p_users = 0 AND p_markets = 0 AND p_active = 0 AND p_locked = 0 AND p_pools = 0 THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO platform_stats_deltas (
+        total_users, total_markets, active_markets, total_cc_locked, total_cc_in_pools
+    )
+    VALUES (p_users, p_markets, p_active, p_locked, p_pools);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Statement-level, so a settlement that updates many users adds one delta
+CREATE OR REPLACE FUNCTION track_user_stats()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_users BIGINT := 0;
+    v_locked NUMERIC := 0;
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        SELECT v_users + COUNT(*), v_locked + COALESCE(SUM(locked_balance), 0)
+        INTO v_users, v_locked
+        FROM new_rows;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        SELECT v_users - COUNT(*), v_locked - COALESCE(SUM(locked_balance), 0)
+        INTO v_users, v_locked
+        FROM old_rows;
+    END IF;
+
+    PERFORM bump_platform_stats(v_users, 0, 0, v_locked, 0);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables need one trigger per event (and no column list)
+DROP TRIGGER IF EXISTS track_user_stats ON users;
+DROP TRIGGER IF EXISTS track_user_stats_insert ON users;
+CREATE TRIGGER track_user_stats_insert
+    AFTER INSERT ON users
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION track_user_stats();
+
+DROP TRIGGER IF EXISTS track_user_stats_update ON users;
+CREATE TRIGGER track_user_stats_update
+    AFTER UPDATE ON users
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION track_user_stats();
+
+DROP TRIGGER IF EXISTS track_user_stats_delete ON users;
+CREATE TRIGGER track_user_stats_delete
+    AFTER DELETE ON users
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION track_user_stats();
+
+CREATE OR REPLACE FUNCTION track_market_stats()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_markets BIGINT := 0;
+    v_active BIGINT := 0;
+    v_pools NUMERIC := 0;
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        SELECT v_markets + COUNT(*),
+               v_active + COUNT(*) FILTER (WHERE status = 'active'),
+               v_pools + COALESCE(SUM(COALESCE(total_bet_true, 0) + COALESCE(total_bet_false, 0))
+                                  FILTER (WHERE status IN ('active', 'settling')), 0)
+        INTO v_markets, v_active, v_pools
+        FROM new_rows;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        SELECT v_markets - COUNT(*),
+               v_active - COUNT(*) FILTER (WHERE status = 'active'),
+               v_pools - COALESCE(SUM(COALESCE(total_bet_true, 0) + COALESCE(total_bet_false, 0))
+                                  FILTER (WHERE status IN ('active', 'settling')), 0)
+        INTO v_markets, v_active, v_pools
+        FROM old_rows;
+    END IF;
+
+    PERFORM bump_platform_stats(0, v_markets, v_active, 0, v_pools);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS track_market_stats ON markets;
+DROP TRIGGER IF EXISTS track_market_stats_insert ON markets;
+CREATE TRIGGER track_market_stats_insert
+    AFTER INSERT ON markets
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION track_market_stats();
+
+DROP TRIGGER IF EXISTS track_market_stats_update ON markets;
+CREATE TRIGGER track_market_stats_update
+    AFTER UPDATE ON markets
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION track_market_stats();
+
+DROP TRIGGER IF EXISTS track_market_stats_delete ON markets;
+CREATE TRIGGER track_market_stats_delete
+    AFTER DELETE ON markets
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION track_market_stats();
+
+-- Fold all committed deltas into one row; returns the number folded.
+-- Rows inserted while this runs are not visible to the DELETE and are
+-- left for the next run, so nothing is lost or counted twice.
+CREATE OR REPLACE FUNCTION compact_platform_stats()
+RETURNS INTEGER AS $$
+DECLARE
+    v_rows INTEGER;
+BEGIN
+    -- One compactor at a time; a concurrent call just skips
+    IF NOT pg_try_advisory_xact_lock(hashtext('compact_platform_stats')) THEN
+        RETURN 0;
+    END IF;
+
+    WITH folded AS (
+        DELETE FROM platform_stats_deltas
+        RETURNING *
+    ),
+    total AS (
+        SELECT COUNT(*) AS n,
+               COALESCE(SUM(total_users), 0) AS total_users,
+               COALESCE(SUM(total_markets), 0) AS total_markets,
+               COALESCE(SUM(active_markets), 0) AS active_markets,
+               COALESCE(SUM(total_cc_locked), 0) AS total_cc_locked,
+               COALESCE(SUM(total_cc_in_pools), 0) AS total_cc_in_pools
+        FROM folded
+    ),
+    kept AS (
+        INSERT INTO platform_stats_deltas (
+            total_users, total_markets, active_markets, total_cc_locked, total_cc_in_pools
+        )
+        SELECT total_users, total_markets, active_markets, total_cc_locked, total_cc_in_pools
+        FROM total
+        WHERE n > 0
+    )
+    SELECT n INTO v_rows FROM total;
+
+    RETURN v_rows;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Recompute the counters from users and markets (also the initial backfill)
+CREATE OR REPLACE FUNCTION rebuild_platform_stats()
+RETURNS SETOF platform_stats AS $$
+BEGIN
+    -- Writers touch users/markets before the deltas (from their triggers),
+    -- so lock in the same order
+    LOCK TABLE users, markets IN SHARE MODE;
+    LOCK TABLE platform_stats_deltas IN EXCLUSIVE MODE;
+
+    DELETE FROM platform_stats_deltas;
+
+    INSERT INTO platform_stats_deltas (
+        total_users, total_markets, active_markets, total_cc_locked, total_cc_in_pools
+    )
+    SELECT (SELECT COUNT(*) FROM users),
+           (SELECT COUNT(*) FROM markets),
+           (SELECT COUNT(*) FROM markets WHERE status = 'active'),
+           (SELECT COALESCE(SUM(locked_balance), 0) FROM users),
+           (
+               SELECT COALESCE(SUM(total_bet_true + total_bet_false), 0)
+               FROM markets
+               WHERE status IN ('active', 'settling')
+           );
+
+    RETURN QUERY SELECT * FROM platform_stats;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT rebuild_platform_stats();
+
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,21 @@
+-- Market-wide share totals for GET /auth/user/<id>/portfolio
+-- Under the 'pool' payout policy a position's payout depends on every
+-- winning position in its market, so the portfolio reads the open shares
+-- per side of the user's markets in one grouped query
+-- (idx_positions_market_id).
+
+CREATE OR REPLACE FUNCTION market_share_totals(p_market_ids UUID[])
+RETURNS TABLE (
+    market_id UUID,
+    true_shares NUMERIC,
+    false_shares NUMERIC
+) AS $$
+    SELECT p.market_id,
+           COALESCE(SUM(p.shares) FILTER (WHERE p.type = 'true'), 0),
+           COALESCE(SUM(p.shares) FILTER (WHERE p.type = 'false'), 0)
+    FROM positions p
+    WHERE p.market_id = ANY(p_market_ids) AND p.status = 'open'
+    GROUP BY p.market_id;
+$$ LANGUAGE sql STABLE;
+
+NOTIFY pgrst, 'reload schema';
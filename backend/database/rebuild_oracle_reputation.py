@@ -0,0 +1,33 @@
+"""
+Rebuild the oracle_reputation counters from oracle_reports
+
+Use after restoring data or if the counters are suspected to have drifted.
+Run from the backend directory:
+    python database/rebuild_oracle_reputation.py
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.reputation_store import ReputationStore
+
+def rebuild_oracle_reputation():
+    """Recompute every oracle's correct/total counters server-side"""
+    print("="*60)
+    print("Rebuilding oracle reputation counters")
+    print("="*60)
+
+    try:
+        oracles = ReputationStore.rebuild()
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return False
+
+    print(f"Done: {oracles} oracles with resolved reports")
+    return True
+
+if __name__ == '__main__':
+    success = rebuild_oracle_reputation()
+    sys.exit(0 if success else 1)
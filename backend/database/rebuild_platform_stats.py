@@ -0,0 +1,34 @@
+"""
+Rebuild the platform_stats counters from users and markets
+
+Use after restoring data or if /stats is suspected to have drifted.
+Run from the backend directory:
+    python database/rebuild_platform_stats.py
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.platform_stats import get_platform_stats
+
+def rebuild_platform_stats():
+    """Recompute the platform aggregates server-side"""
+    print("="*60)
+    print("Rebuilding platform stats counters")
+    print("="*60)
+
+    try:
+        stats = get_platform_stats().rebuild()
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return False
+
+    for field, value in stats.items():
+        print(f"{field}: {value}")
+    return True
+
+if __name__ == '__main__':
+    success = rebuild_platform_stats()
+    sys.exit(0 if success else 1)
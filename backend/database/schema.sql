@@ -82,6 +82,10 @@ CREATE INDEX IF NOT EXISTS idx_markets_status ON markets(status);
 CREATE INDEX IF NOT EXISTS idx_markets_category ON markets(category);
 CREATE INDEX IF NOT EXISTS idx_markets_submitter ON markets(submitter_id);
 CREATE INDEX IF NOT EXISTS idx_markets_created_at ON markets(created_at DESC);
+-- Keyset pagination for GET /markets: (filter, created_at DESC, id DESC)
+CREATE INDEX IF NOT EXISTS idx_markets_created_at_id ON markets(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_markets_status_created_at_id ON markets(status, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_markets_category_created_at_id ON markets(category, created_at DESC, id DESC);
 CREATE INDEX IF NOT EXISTS idx_positions_user_id ON positions(user_id);
 CREATE INDEX IF NOT EXISTS idx_positions_market_id ON positions(market_id);
 CREATE INDEX IF NOT EXISTS idx_positions_status ON positions(status);
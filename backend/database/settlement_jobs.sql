@@ -0,0 +1,81 @@
+-- Durable settlement jobs
+-- The oracle report that reaches consensus enqueues a job instead of settling
+-- inside the HTTP request. One row per market (the primary key makes
+-- enqueueing at-most-once); workers claim a job by flipping queued -> running.
+-- enqueue_settlement() closes the market to trading in the same transaction
+-- that creates the job. Requires bulk_settlement.sql (markets.resolution).
+
+CREATE TABLE IF NOT EXISTS settlement_jobs (
+    market_id UUID PRIMARY KEY REFERENCES markets(id) ON DELETE CASCADE,
+    outcome VARCHAR(10) NOT NULL CHECK (outcome IN ('true', 'false')),
+    status VARCHAR(20) DEFAULT 'queued' NOT NULL
+        CHECK (status IN ('queued', 'running', 'done', 'failed')),
+    attempts INTEGER DEFAULT 0 NOT NULL,
+    progress JSONB DEFAULT '{}'::jsonb,
+    result JSONB,
+    error TEXT,
+    settled_at TIMESTAMP WITH TIME ZONE,
+    finished_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Workers look up unfinished jobs on startup
+CREATE INDEX IF NOT EXISTS idx_settlement_jobs_unfinished ON settlement_jobs(status, updated_at)
+    WHERE status IN ('queued', 'running');
+
+CREATE TRIGGER update_settlement_jobs_updated_at BEFORE UPDATE ON settlement_jobs
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+ALTER TABLE settlement_jobs ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow all operations on settlement_jobs" ON settlement_jobs
+    FOR ALL USING (true) WITH CHECK (true);
+
+-- Move a market that reached consensus from 'active' to 'settling' (no more
+-- trades or reports), record the outcome and create its job, all under the
+-- market row lock, so the decided outcome is never public while the market
+-- still trades. A failed job for the same outcome gets a fresh attempt
+-- budget. Returns TRUE if a job is now queued, FALSE if one already exists
+-- or the market is no longer waiting for this outcome.
+CREATE OR REPLACE FUNCTION enqueue_settlement(p_market_id UUID, p_outcome VARCHAR)
+RETURNS BOOLEAN AS $$
+DECLARE
+    v_status VARCHAR;
+    v_resolution VARCHAR;
+BEGIN
+    SELECT status, resolution INTO v_status, v_resolution
+    FROM markets
+    WHERE id = p_market_id
+    FOR UPDATE;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Market % not found', p_market_id;
+    END IF;
+
+    IF v_status = 'active' THEN
+        UPDATE markets
+        SET status = 'settling',
+            resolution = p_outcome
+        WHERE id = p_market_id;
+    ELSIF v_status <> 'settling' OR v_resolution IS DISTINCT FROM p_outcome THEN
+        RETURN FALSE;
+    END IF;
+
+    INSERT INTO settlement_jobs (market_id, outcome, status)
+    VALUES (p_market_id, p_outcome, 'queued')
+    ON CONFLICT (market_id) DO NOTHING;
+    IF FOUND THEN
+        RETURN TRUE;
+    END IF;
+
+    UPDATE settlement_jobs
+    SET status = 'queued',
+        attempts = 0,
+        error = NULL,
+        finished_at = NULL
+    WHERE market_id = p_market_id AND status = 'failed';
+    RETURN FOUND;
+END;
+$$ LANGUAGE plpgsql;
+
+NOTIFY pgrst, 'reload schema';
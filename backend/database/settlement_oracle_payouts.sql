@@ -0,0 +1,88 @@
+-- Oracle payouts inside the final settlement transaction
+-- Replaces finish_settlement() from bulk_settlement.sql so that closing the
+-- positions, setting the market status and paying / forfeiting every oracle
+-- stake commit together. Requires bulk_settlement.sql, oracle_reputation.sql
+-- and market_consensus.sql (oracle_reputation_of).
+--
+-- Per pending report, with rep = the oracle's reputation before this market:
+--   correct:   stake unlocked, reward = stake * 1.5 * (2.0 if rep > 0.8,
+--              1.5 if rep > 0.6, else 1.2) credited and counted as earned
+--   incorrect: stake forfeited from the locked balance, counted as lost
+
+DROP FUNCTION IF EXISTS finish_settlement(UUID, VARCHAR);
+
+CREATE OR REPLACE FUNCTION finish_settlement(p_market_id UUID, p_status VARCHAR)
+RETURNS JSONB AS $$
+DECLARE
+    v_outcome VARCHAR;
+    v_closed INTEGER;
+    v_reports INTEGER;
+    v_paid NUMERIC;
+BEGIN
+    UPDATE markets
+    SET status = p_status,
+        resolved_at = NOW()
+    WHERE id = p_market_id AND status = 'settling'
+    RETURNING resolution INTO v_outcome;
+    IF NOT FOUND THEN
+        RETURN jsonb_build_object('positions_closed', -1);
+    END IF;
+
+    -- Won / lost feed the per-user rollups (user_rollups.sql)
+    UPDATE positions
+    SET status = CASE WHEN type = v_outcome THEN 'won' ELSE 'lost' END
+    WHERE market_id = p_market_id AND status = 'open';
+    GET DIAGNOSTICS v_closed = ROW_COUNT;
+
+    -- One statement: every sub-statement sees the reputations as they were
+    -- before this market's reports are marked
+    WITH payouts AS (
+        SELECT o.id,
+               o.oracle_id,
+               o.stake,
+               o.verdict = v_outcome AS correct,
+               o.stake * 1.5 * CASE
+                   WHEN oracle_reputation_of(o.oracle_id) > 0.8 THEN 2.0
+                   WHEN oracle_reputation_of(o.oracle_id) > 0.6 THEN 1.5
+                   ELSE 1.2
+               END AS reward
+        FROM oracle_reports o
+        WHERE o.market_id = p_market_id AND o.status = 'pending'
+    ),
+    paid_users AS (
+        UPDATE users u
+        SET available_balance = u.available_balance + CASE
+                WHEN p.correct THEN p.reward + CASE WHEN u.locked_balance >= p.stake THEN p.stake ELSE 0 END
+                ELSE 0
+            END,
+            locked_balance = GREATEST(0, u.locked_balance - p.stake),
+            total_earned = u.total_earned + CASE WHEN p.correct THEN p.reward ELSE 0 END,
+            total_lost = u.total_lost + CASE WHEN p.correct THEN 0 ELSE p.stake END
+        FROM payouts p
+        WHERE u.id = p.oracle_id
+        RETURNING u.id
+    ),
+    marked_reports AS (
+        -- Also updates oracle_reputation through its trigger
+        UPDATE oracle_reports o
+        SET status = CASE WHEN p.correct THEN 'correct' ELSE 'incorrect' END
+        FROM payouts p
+        WHERE o.id = p.id
+        RETURNING o.id
+    )
+    SELECT COUNT(*),
+           COALESCE(SUM(reward) FILTER (WHERE correct), 0)
+    INTO v_reports, v_paid
+    FROM payouts;
+
+    DELETE FROM settlement_batches WHERE market_id = p_market_id;
+
+    RETURN jsonb_build_object(
+        'positions_closed', v_closed,
+        'oracle_reports', v_reports,
+        'oracle_paid', v_paid
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+NOTIFY pgrst, 'reload schema';
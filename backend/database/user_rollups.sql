@@ -0,0 +1,141 @@
+-- Per-user position rollups
+-- users.positions_count / positions_won / positions_lost (and the generated
+-- win_rate) are kept current by statement-level triggers on positions, so
+-- GET /auth/user/<id> returns them with the user row instead of counting and
+-- downloading the user's positions. Each statement applies one grouped
+-- UPDATE to users, so settling a market with many positions costs one
+-- users update per statement, not one per position.
+--
+-- Settlement closes positions as 'won' / 'lost' (see finish_settlement in
+-- settlement_oracle_payouts.sql, re-run it with this file); positions that
+-- earlier settlements closed as 'closed' are reclassified below.
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS positions_count INTEGER DEFAULT 0 NOT NULL;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS positions_won INTEGER DEFAULT 0 NOT NULL;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS positions_lost INTEGER DEFAULT 0 NOT NULL;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS win_rate DECIMAL(5, 4)
+    GENERATED ALWAYS AS (
+        CASE WHEN positions_won + positions_lost > 0
+             THEN positions_won::DECIMAL / (positions_won + positions_lost)
+             ELSE 0
+        END
+    ) STORED;
+
+CREATE OR REPLACE FUNCTION track_user_rollups()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE users u
+        SET positions_count = u.positions_count + d.positions,
+            positions_won = u.positions_won + d.won,
+            positions_lost = u.positions_lost + d.lost
+        FROM (
+            SELECT user_id,
+                   COUNT(*) AS positions,
+                   COUNT(*) FILTER (WHERE status = 'won') AS won,
+                   COUNT(*) FILTER (WHERE status = 'lost') AS lost
+            FROM new_rows
+            GROUP BY user_id
+        ) d
+        WHERE u.id = d.user_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        -- Rows whose user is being deleted simply match nothing
+        UPDATE users u
+        SET positions_count = u.positions_count - d.positions,
+            positions_won = u.positions_won - d.won,
+            positions_lost = u.positions_lost - d.lost
+        FROM (
+            SELECT user_id,
+                   COUNT(*) AS positions,
+                   COUNT(*) FILTER (WHERE status = 'won') AS won,
+                   COUNT(*) FILTER (WHERE status = 'lost') AS lost
+            FROM old_rows
+            GROUP BY user_id
+        ) d
+        WHERE u.id = d.user_id;
+    ELSE
+        UPDATE users u
+        SET positions_won = u.positions_won + d.won,
+            positions_lost = u.positions_lost + d.lost
+        FROM (
+            SELECT n.user_id,
+                   SUM((n.status = 'won')::INTEGER - (o.status = 'won')::INTEGER) AS won,
+                   SUM((n.status = 'lost')::INTEGER - (o.status = 'lost')::INTEGER) AS lost
+            FROM new_rows n
+            JOIN old_rows o ON o.id = n.id
+            WHERE n.status IS DISTINCT FROM o.status
+            GROUP BY n.user_id
+        ) d
+        WHERE u.id = d.user_id AND (d.won <> 0 OR d.lost <> 0);
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables need one trigger per event
+DROP TRIGGER IF EXISTS track_user_rollups_insert ON positions;
+CREATE TRIGGER track_user_rollups_insert
+    AFTER INSERT ON positions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION track_user_rollups();
+
+DROP TRIGGER IF EXISTS track_user_rollups_update ON positions;
+CREATE TRIGGER track_user_rollups_update
+    AFTER UPDATE ON positions
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION track_user_rollups();
+
+DROP TRIGGER IF EXISTS track_user_rollups_delete ON positions;
+CREATE TRIGGER track_user_rollups_delete
+    AFTER DELETE ON positions
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION track_user_rollups();
+
+-- Recompute every user's rollups from positions; returns the number of users
+CREATE OR REPLACE FUNCTION rebuild_user_rollups()
+RETURNS INTEGER AS $$
+DECLARE
+    v_users INTEGER;
+BEGIN
+    LOCK TABLE positions IN SHARE MODE;
+
+    UPDATE users u
+    SET positions_count = COALESCE(d.positions, 0),
+        positions_won = COALESCE(d.won, 0),
+        positions_lost = COALESCE(d.lost, 0)
+    FROM users x
+    LEFT JOIN (
+        SELECT user_id,
+               COUNT(*) AS positions,
+               COUNT(*) FILTER (WHERE status = 'won') AS won,
+               COUNT(*) FILTER (WHERE status = 'lost') AS lost
+        FROM positions
+        GROUP BY user_id
+    ) d ON d.user_id = x.id
+    WHERE u.id = x.id;
+
+    GET DIAGNOSTICS v_users = ROW_COUNT;
+    RETURN v_users;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Reclassify positions closed by earlier settlements, then backfill
+-- (older markets only record the outcome in their status)
+UPDATE positions p
+SET status = CASE WHEN p.type = m.outcome THEN 'won' ELSE 'lost' END
+FROM (
+    SELECT id,
+           COALESCE(resolution, CASE status
+               WHEN 'resolved_true' THEN 'true'
+               WHEN 'resolved_false' THEN 'false'
+           END) AS outcome
+    FROM markets
+) m
+WHERE p.market_id = m.id
+  AND p.status = 'closed'
+  AND m.outcome IS NOT NULL;
+
+SELECT rebuild_user_rollups();
+
+NOTIFY pgrst, 'reload schema';
@@ -3,6 +3,41 @@
 class Market:
     """Market model representation"""
     
+    # All readable market columns
+    COLUMNS = (
+        'id', 'text', 'category', 'submitter_id', 'stake', 'price',
+        'total_bet_true', 'total_bet_false', 'status', 'ai_prediction',
+        'ai_confidence', 'embedding', 'created_at', 'updated_at', 'resolved_at',
+        'enrichment_status', 'enrichment_attempts', 'enrichment_error',
+        'duplicate_of', 'duplicate_similarity', 'pool_seq', 'resolution'
+    )
+    
+    # Named projections so each read path only selects the columns it needs.
+    # Only 'ml' carries the embedding vector.
+    FIELD_SETS = {
+        'card': (
+            'id', 'text', 'category', 'submitter_id', 'stake', 'price',
+            'total_bet_true', 'total_bet_false', 'status', 'ai_prediction',
+            'ai_confidence', 'enrichment_status', 'created_at'
+        ),
+        'detail': (
+            'id', 'text', 'category', 'submitter_id', 'stake', 'price',
+            'total_bet_true', 'total_bet_false', 'status', 'ai_prediction',
+            'ai_confidence', 'enrichment_status', 'duplicate_of',
+            'duplicate_similarity', 'created_at', 'updated_at', 'resolved_at'
+        ),
+        'enrichment': (
+            'id', 'status', 'ai_prediction', 'ai_confidence', 'enrichment_status',
+            'enrichment_attempts', 'enrichment_error', 'duplicate_of',
+            'duplicate_similarity', 'updated_at'
+        ),
+        'trading': (
+            'id', 'submitter_id', 'stake', 'price', 'total_bet_true',
+            'total_bet_false', 'status'
+        ),
+        'ml': ('id', 'text', 'status', 'embedding'),
+    }
+    
     def __init__(self, id=None, text=None, category=None, submitter_id=None,
                  stake=0.0, price=0.5, total_bet_true=0.0, total_bet_false=0.0,
                  status='active', ai_prediction=None, ai_confidence=None,
@@ -53,22 +88,74 @@ class Market:
         """Check if market is active"""
         return self.status == 'active'
     
-    def to_dict(self):
-        """Convert market to dictionary"""
-        return {
-            'id': self.id,
-            'text': self.text,
-            'category': self.category,
-            'submitter_id': self.submitter_id,
-            'stake': self.stake,
-            'price': self.price,
-            'total_bet_true': self.total_bet_true,
-            'total_bet_false': self.total_bet_false,
-            'status': self.status,
-            'ai_prediction': self.ai_prediction,
-            'ai_confidence': self.ai_confidence,
-            'embedding': self.embedding
-        }
+    def to_dict(self, fields=None):
+        """
+        Convert market to dictionary
+        
+        Args:
+            fields: Optional projection (see resolve_fields). The embedding is
+                only included when the projection asks for it explicitly.
+        """
+        if fields is None:
+            return {
+                'id': self.id,
+                'text': self.text,
+                'category': self.category,
+                'submitter_id': self.submitter_id,
+                'stake': self.stake,
+                'price': self.price,
+                'total_bet_true': self.total_bet_true,
+                'total_bet_false': self.total_bet_false,
+                'status': self.status,
+                'ai_prediction': self.ai_prediction,
+                'ai_confidence': self.ai_confidence
+            }
+        
+        return {field: getattr(self, field, None) for field in self.resolve_fields(fields)}
+    
+    @classmethod
+    def resolve_fields(cls, fields=None, default='detail'):
+        """
+        Resolve a projection into a tuple of column names
+        
+        Args:
+            fields: Name of a FIELD_SETS entry, a comma-separated column list,
+                a sequence of column names, or None for the default set
+            default: Field set used when fields is empty
+        
+        Returns:
+            Tuple of column names (always including id)
+        
+        Raises:
+            ValueError: If a named set or column is unknown
+        """
+        if not fields:
+            fields = default
+        
+        if isinstance(fields, str):
+            if fields in cls.FIELD_SETS:
+                return cls.FIELD_SETS[fields]
+            fields = [f.strip() for f in fields.split(',') if f.strip()]
+        
+        columns = []
+        for field in fields:
+            if field in cls.FIELD_SETS:
+                columns.extend(cls.FIELD_SETS[field])
+            elif field in cls.COLUMNS:
+                columns.append(field)
+            else:
+                raise ValueError(f"Unknown market field: {field}")
+        
+        if 'id' not in columns:
+            columns.insert(0, 'id')
+        
+        # De-duplicate while keeping order
+        return tuple(dict.fromkeys(columns))
+    
+    @classmethod
+    def select_columns(cls, fields=None, default='detail'):
+        """Build a Supabase select() column string for a projection"""
+        return ', '.join(cls.resolve_fields(fields, default))
     
     @classmethod
     def from_dict(cls, data):
@@ -53,6 +53,15 @@ class User:
             'total_lost': self.total_lost
         }
     
+    def to_profile_dict(self):
+        """Convert user to dictionary with position rollups (database/user_rollups.sql)"""
+        data = self.to_dict()
+        data['positions_count'] = int(getattr(self, 'positions_count', 0) or 0)
+        data['positions_won'] = int(getattr(self, 'positions_won', 0) or 0)
+        data['positions_lost'] = int(getattr(self, 'positions_lost', 0) or 0)
+        data['win_rate'] = round(float(getattr(self, 'win_rate', 0) or 0), 2)
+        return data
+    
     @classmethod
     def from_dict(cls, data):
         """Create user from dictionary"""
@@ -1,13 +1,18 @@
 """Authentication routes"""
 
 import logging
-from flask import Blueprint, request, jsonify
-from utils.supabase_client import get_supabase_client
+from flask import Blueprint, request, jsonify, make_response
+from services.leaderboard import get_leaderboard
+from services.portfolio import load_portfolio, portfolio_etag, compute_portfolio
+from utils.supabase_client import get_supabase_client, get_supabase_read_client
+from utils.pagination import parse_limit
 from models.user import User
 
 logger = logging.getLogger(__name__)
 auth_bp = Blueprint('auth', __name__)
 
+MAX_PROFILE_BATCH = 100
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     """Register a new user"""
@@ -153,58 +158,88 @@ def initialize():
 def get_user(user_id):
     """Get user with balance, positions count, win rate"""
     try:
-        supabase = get_supabase_client()
+        supabase = get_supabase_read_client()
         
-        # Get user
+        # Position rollups are columns of the user row (database/user_rollups.sql)
         user_response = supabase.table('users').select('*').eq('id', user_id).execute()
         
         if not user_response.data:
             return jsonify({'error': 'User not found'}), 404
         
         user = User.from_dict(user_response.data[0])
+        return jsonify({'user': user.to_profile_dict()}), 200
+        
+    except Exception as e:
+        logger.error(f"Error in get_user: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@auth_bp.route('/user/<user_id>/portfolio', methods=['GET'])
+def get_portfolio(user_id):
+    """Get a user's open positions marked to market
+    
+    Returns per-position and per-market unrealized PnL, payout if the market
+    resolves true / false and exposure, computed with the payout policy
+    oracle settlement applies (SETTLEMENT_PAYOUT_POLICY, reported as
+    payout_policy). Responds 304 when If-None-Match matches the current ETag.
+    """
+    try:
+        positions, markets = load_portfolio(user_id)
         
-        # Get positions count
-        positions_response = supabase.table('positions').select('id', count='exact').eq('user_id', user_id).execute()
-        positions_count = positions_response.count if hasattr(positions_response, 'count') else len(positions_response.data) if positions_response.data else 0
+        etag = portfolio_etag(positions, markets)
+        if request.if_none_match.contains(etag):
+            response = make_response('', 304)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
         
-        # Calculate win rate (positions with status='won' / total closed positions)
-        closed_positions = supabase.table('positions').select('status').eq('user_id', user_id).in_('status', ['won', 'lost']).execute()
-        total_closed = len(closed_positions.data) if closed_positions.data else 0
-        won_positions = [p for p in (closed_positions.data or []) if p.get('status') == 'won']
-        win_rate = len(won_positions) / total_closed if total_closed > 0 else 0.0
+        portfolio = compute_portfolio(positions, markets)
+        portfolio['user_id'] = user_id
+        response = make_response(jsonify(portfolio), 200)
+        response.set_etag(etag)
+        # Clients must revalidate, which is answered with 304 while unchanged
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
         
-        user_dict = user.to_dict()
-        user_dict['positions_count'] = positions_count
-        user_dict['win_rate'] = round(win_rate, 2)
+    except Exception as e:
+        logger.error(f"Error in get_portfolio: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@auth_bp.route('/users/profiles', methods=['GET'])
+def get_user_profiles():
+    """Get several user profiles in one query
+    
+    Query params: ids (comma-separated user ids, at most 100).
+    """
+    try:
+        user_ids = [user_id for user_id in dict.fromkeys(request.args.get('ids', '').split(',')) if user_id]
+        if not user_ids:
+            return jsonify({'error': 'ids is required'}), 400
+        if len(user_ids) > MAX_PROFILE_BATCH:
+            return jsonify({'error': f'At most {MAX_PROFILE_BATCH} ids per request'}), 400
         
-        return jsonify({'user': user_dict}), 200
+        supabase = get_supabase_read_client()
+        response = supabase.table('users').select('*').in_('id', user_ids).execute()
+        found = {row['id']: User.from_dict(row).to_profile_dict() for row in response.data or []}
+        
+        return jsonify({
+            'users': [found[user_id] for user_id in user_ids if user_id in found],
+            'not_found': [user_id for user_id in user_ids if user_id not in found]
+        }), 200
         
     except Exception as e:
-        logger.error(f"Error in get_user: {str(e)}")
+        logger.error(f"Error in get_user_profiles: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/users', methods=['GET'])
 def get_users():
     """Get top 20 users by total balance"""
     try:
-        supabase = get_supabase_client()
-        
-        # Get top 20 users by total balance (available + locked)
-        # Note: We'll calculate total_balance in the query or after fetching
-        response = supabase.table('users').select('id, pseudonym, available_balance, locked_balance, total_earned').order('available_balance', desc=True).limit(20).execute()
-        
-        if not response.data:
-            return jsonify({'users': []}), 200
-        
-        users_list = []
-        for rank, user_data in enumerate(response.data, 1):
-            total_balance = user_data.get('available_balance', 0.0) + user_data.get('locked_balance', 0.0)
-            users_list.append({
-                'rank': rank,
-                'pseudonym': user_data.get('pseudonym', '')[:8] if user_data.get('pseudonym') else '',
-                'balance': round(total_balance, 2),
-                'total_earned': round(user_data.get('total_earned', 0.0), 2)
-            })
+        users_list = [{
+            'rank': entry['rank'],
+            'pseudonym': entry['pseudonym'],
+            'balance': entry['total_balance'],
+            'total_earned': entry['total_earned']
+        } for entry in get_leaderboard().top(20)]
         
         return jsonify({'users': users_list}), 200
         
@@ -212,3 +247,53 @@ def get_users():
         logger.error(f"Error in get_users: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@auth_bp.route('/leaderboard', methods=['GET'])
+def get_leaderboard_page():
+    """Get a leaderboard page ranked by total balance
+    
+    Query params: limit (default 20, max 100) and offset (default 0).
+    """
+    try:
+        try:
+            limit = parse_limit(request.args.get('limit'))
+            offset = int(request.args.get('offset', 0))
+            if offset < 0:
+                raise ValueError("offset must be non-negative")
+        except ValueError as ve:
+            return jsonify({'error': str(ve)}), 400
+        
+        return jsonify({
+            'leaderboard': get_leaderboard().top(limit, offset),
+            'limit': limit,
+            'offset': offset
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error in get_leaderboard_page: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@auth_bp.route('/leaderboard/<user_id>', methods=['GET'])
+def get_leaderboard_rank(user_id):
+    """Get a user's leaderboard rank and the users ranked around them
+    
+    Query params: radius (neighbours on each side, default 5, max 50).
+    """
+    try:
+        try:
+            radius = parse_limit(request.args.get('radius'), default=5, maximum=50)
+        except ValueError as ve:
+            return jsonify({'error': str(ve)}), 400
+        
+        leaderboard = get_leaderboard()
+        entry = leaderboard.rank(user_id)
+        if entry is None:
+            return jsonify({'error': 'User not found'}), 404
+        
+        return jsonify({
+            'rank': entry,
+            'neighbours': leaderboard.neighbours(user_id, radius)
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error in get_leaderboard_rank: {str(e)}")
+        return jsonify({'error': str(e)}), 500
@@ -1,12 +1,15 @@
 """Market routes"""
 
 import logging
-from datetime import datetime
 from flask import Blueprint, request, jsonify
 from services.market_service import MarketService
 from services.ai_service import AIService
-from utils.supabase_client import get_supabase_client
+from services.vector_index import get_market_index
+from services.enrichment_queue import get_enrichment_queue
+from config import Config
+from utils.supabase_client import get_supabase_client, get_supabase_read_client
 from utils.sanitize import sanitize_text, sanitize_category
+from utils.pagination import parse_limit
 from models.market import Market
 from models.user import User
 from models.position import Position
@@ -18,51 +21,45 @@ ai_service = AIService()
 
 @markets_bp.route('', methods=['GET'])
 def get_markets():
-    """Get paginated markets with query params"""
+    """Get paginated markets with query params
+
+    Supports offset paging (offset) and keyset paging (cursor). Pass the
+    next_cursor of a response as cursor to fetch the following page. The
+    total number of matches is only computed when include_count=true.
+    """
     try:
         # Get query parameters
         status = request.args.get('status')
         category = request.args.get('category')
-        limit = int(request.args.get('limit', 20))
+        limit = parse_limit(request.args.get('limit'), default=20, maximum=100)
         offset = int(request.args.get('offset', 0))
-        
-        supabase = get_supabase_client()
-        
-        # Build query step by step
-        query = supabase.table('markets').select('*')
-        
-        # Apply filters
-        if status:
-            query = query.eq('status', status)
-        if category:
-            query = query.eq('category', category)
-        
-        # Execute query and handle pagination/sorting in Python for reliability
-        # This approach is more compatible across different Supabase client versions
-        response = query.execute()
-        
-        if not response.data:
-            markets = []
-        else:
-            # Sort by created_at descending (most recent first)
-            sorted_data = sorted(
-                response.data,
-                key=lambda x: x.get('created_at') or x.get('created_at', ''),
-                reverse=True
-            )
-            
-            # Apply pagination
-            paginated_data = sorted_data[offset:offset + limit]
-            
-            # Convert to Market objects
-            markets = [Market.from_dict(market) for market in paginated_data]
-        
-        return jsonify({
-            'markets': [market.to_dict() for market in markets],
+        cursor = request.args.get('cursor')
+        fields = request.args.get('fields') or 'card'
+        include_count = request.args.get('include_count', '').lower() in ('1', 'true', 'yes')
+        
+        # Filtering, ordering and paging are pushed down to the database
+        page = market_service.list_markets(
+            status=status,
+            category=category,
+            limit=limit,
+            offset=offset,
+            cursor=cursor,
+            include_count=include_count,
+            fields=fields
+        )
+        markets = page['markets']
+        
+        response = {
+            'markets': [market.to_dict(fields) for market in markets],
             'limit': limit,
-            'offset': offset,
-            'count': len(markets)
-        }), 200
+            'offset': offset if not cursor else None,
+            'count': len(markets),
+            'next_cursor': page['next_cursor']
+        }
+        if include_count:
+            response['total'] = page['total']
+        
+        return jsonify(response), 200
         
     except ValueError as e:
         logger.error(f"Validation error in get_markets: {str(e)}")
@@ -79,18 +76,25 @@ def get_markets():
 
 @markets_bp.route('/<market_id>', methods=['GET'])
 def get_market(market_id):
-    """Get market by ID with submitter and positions count"""
+    """Get market by ID with submitter and positions count
+
+    The embedding is omitted unless requested via ?fields=ml or
+    ?fields=detail,embedding.
+    """
     try:
-        supabase = get_supabase_client()
+        supabase = get_supabase_read_client()
+        fields = request.args.get('fields') or 'detail'
         
         # Get market
-        market_response = supabase.table('markets').select('*').eq('id', market_id).execute()
+        market_response = supabase.table('markets').select(
+            Market.select_columns(fields)
+        ).eq('id', market_id).execute()
         
         if not market_response.data:
             return jsonify({'error': 'Market not found'}), 404
         
         market = Market.from_dict(market_response.data[0])
-        market_dict = market.to_dict()
+        market_dict = market.to_dict(fields)
         
         # Get submitter info
         if market.submitter_id:
@@ -108,10 +112,80 @@ def get_market(market_id):
         
         return jsonify({'market': market_dict}), 200
         
+    except ValueError as e:
+        return jsonify({'error': f'Invalid request: {str(e)}'}), 400
     except Exception as e:
         logger.error(f"Error in get_market: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@markets_bp.route('/<market_id>/similar', methods=['GET'])
+def get_similar_markets(market_id):
+    """Get the top-k active markets most similar to a market"""
+    try:
+        k = parse_limit(request.args.get('k'), default=5, maximum=50)
+        fields = request.args.get('fields') or 'card'
+        Market.resolve_fields(fields)
+        
+        similar, error = market_service.get_similar_markets(market_id, k=k, fields=fields)
+        if error:
+            status_code = 404 if error == 'Market not found' else 500
+            return jsonify({'error': error}), status_code
+        
+        markets = []
+        for market, similarity in similar:
+            market_dict = market.to_dict(fields)
+            market_dict['similarity'] = round(similarity, 4)
+            markets.append(market_dict)
+        
+        return jsonify({
+            'market_id': market_id,
+            'similar': markets,
+            'count': len(markets)
+        }), 200
+        
+    except ValueError as e:
+        return jsonify({'error': f'Invalid request: {str(e)}'}), 400
+    except Exception as e:
+        logger.error(f"Error in get_similar_markets: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@markets_bp.route('/<market_id>/enrichment', methods=['GET'])
+def get_market_enrichment(market_id):
+    """Poll the AI enrichment status of a submitted market"""
+    try:
+        market, error = market_service.get_market_by_id(market_id, fields='enrichment')
+        if error:
+            status_code = 404 if error == 'Market not found' else 500
+            return jsonify({'error': error}), status_code
+        
+        enrichment_status = getattr(market, 'enrichment_status', 'done')
+        response = {
+            'market_id': market_id,
+            'status': enrichment_status,
+            'attempts': getattr(market, 'enrichment_attempts', 0),
+            'error': getattr(market, 'enrichment_error', None)
+        }
+        
+        if enrichment_status in ('done', 'failed'):
+            duplicate_of = getattr(market, 'duplicate_of', None)
+            response['ai_analysis'] = {
+                'classification': {
+                    'prediction': market.ai_prediction,
+                    'confidence': market.ai_confidence
+                },
+                'duplicate_check': {
+                    'is_duplicate': duplicate_of is not None,
+                    'similar_to': duplicate_of,
+                    'similarity': float(getattr(market, 'duplicate_similarity', None) or 0.0)
+                }
+            }
+        
+        return jsonify(response), 200
+        
+    except Exception as e:
+        logger.error(f"Error in get_market_enrichment: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @markets_bp.route('/submit', methods=['POST'])
 def submit_market():
     """Submit a new market"""
@@ -150,41 +224,27 @@ def submit_market():
         except ValueError as e:
             return jsonify({'error': str(e)}), 400
         
-        # AI analysis with fallbacks
-        ai_analysis = {}
-        
-        # Classify rumor
-        try:
-            classification = ai_service.classify_rumor(text)
-            ai_analysis['classification'] = classification
-        except Exception as e:
-            logger.warning(f"AI classification failed: {str(e)}")
-            ai_analysis['classification'] = {
-                'prediction': 'UNCERTAIN',
-                'confidence': 50,
-                'reasoning': 'AI unavailable'
+        if Config.AI_ENRICHMENT_ASYNC:
+            # Insert right away; classification, dedup and embedding are
+            # filled in by the enrichment workers (poll /<id>/enrichment)
+            ai_analysis = {'status': 'pending'}
+            embedding = None
+            market_fields = {
+                'ai_prediction': 'PENDING',
+                'ai_confidence': None,
+                'embedding': None,
+                'enrichment_status': 'pending'
             }
-        
-        # Check duplicate
-        try:
-            duplicate_check = ai_service.check_duplicate(text)
-            ai_analysis['duplicate_check'] = duplicate_check
-        except Exception as e:
-            logger.warning(f"Duplicate check failed: {str(e)}")
-            ai_analysis['duplicate_check'] = {
-                'is_duplicate': False,
-                'similar_to': None,
-                'similarity': 0.0,
-                'similar_text': None
+        else:
+            # AI analysis: classification and embedding run in parallel under a
+            # deadline; the duplicate check reuses the embedding
+            ai_analysis, embedding = ai_service.analyze_submission(text)
+            market_fields = {
+                'ai_prediction': ai_analysis['classification'].get('prediction'),
+                'ai_confidence': ai_analysis['classification'].get('confidence'),
+                'embedding': embedding
             }
         
-        # Generate embedding
-        embedding = None
-        try:
-            embedding = ai_service.generate_embedding(text)
-        except Exception as e:
-            logger.warning(f"Embedding generation failed: {str(e)}")
-        
         # Create market
         market_data = {
             'text': text,
@@ -195,9 +255,7 @@ def submit_market():
             'total_bet_true': stake,
             'total_bet_false': stake,
             'status': 'active',
-            'ai_prediction': ai_analysis['classification'].get('prediction'),
-            'ai_confidence': ai_analysis['classification'].get('confidence'),
-            'embedding': embedding
+            **market_fields
         }
         
         market_response = supabase.table('markets').insert(market_data).execute()
@@ -213,8 +271,17 @@ def submit_market():
         
         market = Market.from_dict(market_response.data[0])
         
+        if Config.AI_ENRICHMENT_ASYNC:
+            get_enrichment_queue().enqueue(market.id, text)
+        else:
+            # Make the new market visible to duplicate checks straight away
+            get_market_index().add_market(market.id, embedding, text)
+        
+        market_dict = market.to_dict()
+        market_dict['enrichment_status'] = getattr(market, 'enrichment_status', 'done')
+        
         return jsonify({
-            'market': market.to_dict(),
+            'market': market_dict,
             'ai_analysis': ai_analysis
         }), 201
         
@@ -238,116 +305,21 @@ def place_bet(market_id):
         if bet_type not in ['long', 'short']:
             return jsonify({'error': "type must be 'long' or 'short'"}), 400
         
-        supabase = get_supabase_client()
-        
-        # Validate trade
-        validation = market_service.validate_trade(user_id, market_id, cc_amount)
-        if not validation['valid']:
-            return jsonify({'error': validation['error']}), 400
+        # One atomic round-trip: validate, lock balance, update pool, upsert position, record trade
+        trade_type = 'true' if bet_type == 'long' else 'false'
+        result, error = market_service.execute_trade(user_id, market_id, trade_type, cc_amount)
+        if error:
+            status_code = 404 if error in ('Market not found', 'User not found') else 400
+            return jsonify({'error': error}), status_code
         
-        # Get market
-        market_response = supabase.table('markets').select('*').eq('id', market_id).execute()
-        if not market_response.data:
-            return jsonify({'error': 'Market not found'}), 404
-        
-        market = Market.from_dict(market_response.data[0])
-        current_price = market.price
-        
-        # Calculate shares
-        if bet_type == 'long':
-            shares = market_service.calculate_shares_for_long(cc_amount, current_price)
-            trade_type = 'true'
-        else:  # short
-            shares = market_service.calculate_shares_for_short(cc_amount, current_price)
-            trade_type = 'false'
-        
-        # Get user and lock CC
-        user_response = supabase.table('users').select('*').eq('id', user_id).execute()
-        user = User.from_dict(user_response.data[0])
-        
-        try:
-            user.lock_balance(cc_amount)
-        except ValueError as e:
-            return jsonify({'error': str(e)}), 400
-        
-        # Update market totals and recalculate price
-        market.apply_trade(trade_type, cc_amount)
-        new_price = market.price
-        
-        # Update user balance
-        supabase.table('users').update({
-            'available_balance': user.available_balance,
-            'locked_balance': user.locked_balance
-        }).eq('id', user_id).execute()
-        
-        # Update market
-        supabase.table('markets').update({
-            'total_bet_true': market.total_bet_true,
-            'total_bet_false': market.total_bet_false,
-            'price': new_price
-        }).eq('id', market_id).execute()
-        
-        # Check for existing position
-        existing_position = supabase.table('positions').select('*').eq('user_id', user_id).eq('market_id', market_id).eq('type', trade_type).eq('status', 'open').execute()
-        
-        if existing_position.data:
-            # Aggregate position
-            position_data = existing_position.data[0]
-            position = Position.from_dict(position_data)
-            
-            # Calculate weighted average entry price
-            # For long (true): shares = cost / price, so cost = price * shares
-            # For short (false): shares = cost / (1-price), so cost = shares * (1-price)
-            total_shares = position.shares + shares
-            total_cost = position.cost_basis + cc_amount
-            
-            if trade_type == 'true':
-                # Long position: entry_price = cost / shares
-                new_entry_price = total_cost / total_shares if total_shares > 0 else current_price
-            else:
-                # Short position: cost = shares * (1 - price), so price = 1 - (cost / shares)
-                new_entry_price = 1 - (total_cost / total_shares) if total_shares > 0 else current_price
-                new_entry_price = max(0.01, min(0.99, new_entry_price))  # Clamp to valid range
-            
-            position.shares = total_shares
-            position.cost_basis = total_cost
-            position.entry_price = new_entry_price
-            position.collateral = market_service.calculate_collateral(total_shares, new_entry_price)
-            
-            # Update position
-            supabase.table('positions').update(position.to_dict()).eq('id', position.id).execute()
-        else:
-            # Create new position
-            collateral = market_service.calculate_collateral(shares, current_price)
-            position_data = {
-                'user_id': user_id,
-                'market_id': market_id,
-                'type': trade_type,
-                'shares': shares,
-                'entry_price': current_price,
-                'cost_basis': cc_amount,
-                'collateral': collateral,
-                'status': 'open'
-            }
-            position_response = supabase.table('positions').insert(position_data).execute()
-            position = Position.from_dict(position_response.data[0]) if position_response.data else None
-        
-        # Create trade record
-        trade_data = {
-            'user_id': user_id,
-            'market_id': market_id,
-            'type': trade_type,
-            'cc_amount': cc_amount,
-            'shares': shares,
-            'price': current_price
-        }
-        supabase.table('trades').insert(trade_data).execute()
+        market = Market.from_dict(result['market'])
+        position = Position.from_dict(result['position']) if result.get('position') else None
         
         return jsonify({
-            'market': market.to_dict(),
+            'market': market.to_dict('trading'),
             'position': position.to_dict() if position else None,
-            'shares_received': shares,
-            'new_price': new_price
+            'shares_received': float(result['shares_received']),
+            'new_price': float(result['new_price'])
         }), 200
         
     except Exception as e:
@@ -367,101 +339,22 @@ def delete_market(market_id):
         if not user_id:
             return jsonify({'error': 'user_id is required'}), 400
         
-        supabase = get_supabase_client()
-        
-        # Get market
-        market_response = supabase.table('markets').select('*').eq('id', market_id).execute()
-        if not market_response.data:
-            return jsonify({'error': 'Market not found'}), 404
-        
-        market = Market.from_dict(market_response.data[0])
-        
-        # Check authorization - only submitter can delete
-        if market.submitter_id != user_id:
-            return jsonify({'error': 'Only market submitter can delete this market'}), 403
-        
-        # Check if market is unresolved
-        if market.status != 'active':
-            return jsonify({'error': f'Cannot delete market with status: {market.status}'}), 400
-        
-        total_locked = market.total_bet_true + market.total_bet_false
-        
-        # Get all open positions
-        positions_response = supabase.table('positions').select('*').eq(
-            'market_id', market_id
-        ).eq('status', 'open').execute()
-        
-        positions = positions_response.data if positions_response.data else []
-        
-        refunds = []
-        
-        # Refund each position holder proportionally
-        for position in positions:
-            if total_locked > 0:
-                # Calculate their proportion of the pool
-                proportion = position['cost_basis'] / total_locked
-                # Refund their original stake (not full pool)
-                refund = position['cost_basis']
-                
-                # Update user balance
-                user_response = supabase.table('users').select(
-                    'available_balance', 'locked_balance'
-                ).eq('id', position['user_id']).execute()
-                
-                if user_response.data:
-                    user_data = user_response.data[0]
-                    current_available = user_data.get('available_balance', 0)
-                    current_locked = user_data.get('locked_balance', 0)
-                    
-                    supabase.table('users').update({
-                        'available_balance': current_available + refund,
-                        'locked_balance': max(0, current_locked - refund)
-                    }).eq('id', position['user_id']).execute()
-                
-                # Mark position as closed (deleted market)
-                supabase.table('positions').update({
-                    'status': 'deleted',
-                    'updated_at': datetime.utcnow().isoformat()
-                }).eq('id', position['id']).execute()
-                
-                refunds.append({
-                    'user_id': position['user_id'],
-                    'refund_amount': refund
-                })
-        
-        # Refund submitter's stake
-        if market.submitter_id:
-            user_response = supabase.table('users').select(
-                'available_balance', 'locked_balance'
-            ).eq('id', market.submitter_id).execute()
-            
-            if user_response.data:
-                user_data = user_response.data[0]
-                current_available = user_data.get('available_balance', 0)
-                current_locked = user_data.get('locked_balance', 0)
-                
-                supabase.table('users').update({
-                    'available_balance': current_available + market.stake,
-                    'locked_balance': max(0, current_locked - market.stake)
-                }).eq('id', market.submitter_id).execute()
-            
-            refunds.append({
-                'user_id': market.submitter_id,
-                'refund_amount': market.stake,
-                'type': 'submitter'
-            })
-        
-        # Mark market as deleted (audit trail)
-        supabase.table('markets').update({
-            'status': 'deleted',
-            'updated_at': datetime.utcnow().isoformat()
-        }).eq('id', market_id).execute()
+        # Refunds, position and market status changes run in one transaction
+        result, error = market_service.delete_market(market_id, user_id)
+        if error:
+            if error == 'Market not found':
+                status_code = 404
+            elif error == 'Only market submitter can delete this market':
+                status_code = 403
+            else:
+                status_code = 400
+            return jsonify({'error': error}), status_code
         
         return jsonify({
             'message': 'Market deleted successfully',
             'market_id': market_id,
-            'total_refunded': sum(r['refund_amount'] for r in refunds),
-            'refunds': refunds
+            'total_refunded': result['total_refunded'],
+            'refunds': result['refunds']
         }), 200
         
     except Exception as e:
@@ -1,8 +1,12 @@
 """Oracle routes"""
 
+import json
 import logging
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from config import Config
 from services.oracle_service import OracleService
+from services.settlement_queue import get_settlement_queue
+from services.settlement_service import SettlementService
 import os
 import hmac
 import hashlib
@@ -15,6 +19,13 @@ oracles_bp = Blueprint('oracles', __name__)
 oracle_service = OracleService()
 ai_service = AIService()
 
+def _is_admin() -> bool:
+    """True if the request carries the configured X-Admin-Token"""
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(Config.SETTLEMENT_ADMIN_TOKEN) and hmac.compare_digest(
+        token.encode('utf-8'), Config.SETTLEMENT_ADMIN_TOKEN.encode('utf-8')
+    )
+
 @oracles_bp.route('/predict/<market_id>', methods=['GET', 'POST'])
 def get_prediction(market_id):
     """Get oracle prediction for a market"""
@@ -38,16 +49,41 @@ def get_prediction(market_id):
 
 @oracles_bp.route('/predict/batch', methods=['POST'])
 def get_batch_predictions():
-    """Get predictions for multiple markets"""
+    """Get predictions for multiple markets
+
+    Model calls run concurrently (optional max_concurrency in the body). With
+    "stream": true the response is NDJSON, one line per market as it completes.
+    """
     try:
         data = request.get_json()
         market_ids = data.get('market_ids', [])
         user_query = data.get('query')
+        max_concurrency = data.get('max_concurrency')
         
         if not market_ids:
             return jsonify({'error': 'market_ids array is required'}), 400
         
-        predictions, errors = oracle_service.get_multiple_predictions(market_ids, user_query)
+        if max_concurrency is not None:
+            max_concurrency = int(max_concurrency)
+            if max_concurrency < 1:
+                return jsonify({'error': 'max_concurrency must be at least 1'}), 400
+            max_concurrency = min(max_concurrency, Config.ORACLE_BATCH_CONCURRENCY)
+        
+        if data.get('stream'):
+            def generate():
+                for market_id, prediction, error in oracle_service.iter_multiple_predictions(
+                    market_ids, user_query, max_concurrency
+                ):
+                    line = {'market_id': market_id}
+                    if error:
+                        line['error'] = error
+                    else:
+                        line['prediction'] = prediction
+                    yield json.dumps(line) + '\n'
+            
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        
+        predictions, errors = oracle_service.get_multiple_predictions(market_ids, user_query, max_concurrency)
         
         response = {'predictions': predictions}
         if errors:
@@ -91,6 +127,9 @@ def submit_report():
         report, triggered = oracle_service.submit_oracle_report(oracle_id, market_id, verdict, evidence, stake, ip_hash)
 
         resp = {'report': report, 'consensus_triggered': triggered}
+        if triggered:
+            # Settlement runs in the background; poll this for its status
+            resp['settlement_status_url'] = f"/oracles/settlements/{market_id}"
         return jsonify(resp), 201
 
     except ValueError as ve:
@@ -111,3 +150,87 @@ def get_reports_for_market(market_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+
+@oracles_bp.route('/settlements/<market_id>', methods=['GET'])
+def get_settlement_status(market_id):
+    """Return the background settlement job for a market."""
+    try:
+        job = get_settlement_queue().get_job(market_id)
+        if not job:
+            return jsonify({'error': 'No settlement job for this market'}), 404
+        return jsonify({'settlement': job}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@oracles_bp.route('/settlements/<market_id>/retry', methods=['POST'])
+def retry_settlement(market_id):
+    """Requeue a failed settlement job (requires the X-Admin-Token header)."""
+    try:
+        if not _is_admin():
+            return jsonify({'error': 'Forbidden'}), 403
+
+        queue = get_settlement_queue()
+        if not queue.retry(market_id):
+            job = queue.get_job(market_id)
+            if not job:
+                return jsonify({'error': 'No settlement job for this market'}), 404
+            return jsonify({'error': f"Settlement job is {job['status']}, not failed"}), 409
+        return jsonify({'settlement': queue.get_job(market_id)}), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@oracles_bp.route('/settlements/<market_id>/preview', methods=['GET'])
+def preview_settlement(market_id):
+    """Compute a market's settlement payouts without writing anything.
+
+    Requires the X-Admin-Token header (it reads every open position).
+    Query params: outcome ('true' or 'false', required) and policy
+    ('position' or 'pool', defaults to SETTLEMENT_PAYOUT_POLICY).
+    """
+    try:
+        if not _is_admin():
+            return jsonify({'error': 'Forbidden'}), 403
+        outcome = request.args.get('outcome')
+        if outcome not in ('true', 'false'):
+            return jsonify({'error': "outcome must be 'true' or 'false'"}), 400
+        service = SettlementService(policy=request.args.get('policy'))
+        return jsonify({'settlement': service.settle(market_id, outcome, dry_run=True)}), 200
+    except ValueError as ve:
+        status_code = 404 if str(ve).endswith('not found') else 400
+        return jsonify({'error': str(ve)}), status_code
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@oracles_bp.route('/consensus/<market_id>', methods=['GET'])
+def get_consensus(market_id):
+    """Return the running consensus tally and decision for a market."""
+    try:
+        tally = oracle_service.get_consensus_tally(market_id)
+        return jsonify({
+            'tally': tally,
+            'consensus': oracle_service.consensus_from_tally(tally)
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@oracles_bp.route('/consensus/<market_id>/reconcile', methods=['POST'])
+def reconcile_consensus(market_id):
+    """Rebuild a market's consensus tally from its oracle reports.
+
+    Requires the X-Admin-Token header (it locks the tally and rescans
+    every report of the market).
+    """
+    try:
+        if not _is_admin():
+            return jsonify({'error': 'Forbidden'}), 403
+        tally = oracle_service.reconcile_consensus(market_id)
+        return jsonify({
+            'tally': tally,
+            'consensus': oracle_service.consensus_from_tally(tally)
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
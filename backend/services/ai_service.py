@@ -3,19 +3,58 @@
 import os
 import json
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 import numpy as np
 from openai import OpenAI
 from config import Config
-from utils.supabase_client import get_supabase_client
+from services.vector_index import get_market_index
+from services.embedding_cache import get_embedding_cache
+from services.embedding_batcher import get_embedding_batcher
 
 logger = logging.getLogger(__name__)
 
+_ai_executor = None
+_ai_executor_lock = threading.Lock()
+
+def get_ai_executor() -> ThreadPoolExecutor:
+    """Shared thread pool for blocking model calls"""
+    global _ai_executor
+    
+    if _ai_executor is None:
+        with _ai_executor_lock:
+            if _ai_executor is None:
+                _ai_executor = ThreadPoolExecutor(
+                    max_workers=Config.AI_MAX_WORKERS,
+                    thread_name_prefix='ai'
+                )
+    
+    return _ai_executor
+
+def _fallback_classification() -> dict:
+    """Classification returned when the model is unavailable or too slow"""
+    return {
+        'prediction': 'UNCERTAIN',
+        'confidence': 50,
+        'reasoning': 'AI unavailable'
+    }
+
+def _fallback_duplicate_check() -> dict:
+    """Duplicate check result returned when no embedding is available"""
+    return {
+        'is_duplicate': False,
+        'similar_to': None,
+        'similarity': 0.0,
+        'similar_text': None
+    }
+
 class AIService:
     """Service for AI operations using OpenAI"""
     
     def __init__(self):
         api_key = os.getenv('OPENAI_API_KEY') or Config.OPENAI_API_KEY
-        self.client = OpenAI(api_key=api_key) if api_key else None
+        self.client = OpenAI(api_key=api_key, timeout=Config.OPENAI_TIMEOUT_SECONDS) if api_key else None
     
     def generate_prediction(self, market_data, user_query=None):
         """Generate market prediction using AI"""
@@ -139,19 +178,20 @@ Rumor: {text}"""
                 'reasoning': 'AI unavailable'
             }
     
-    def check_duplicate(self, text: str) -> dict:
+    def check_duplicate(self, text: str, embedding: list = None) -> dict:
         """
         Check if text is a duplicate of existing markets using embedding similarity
         
         Args:
             text: The text to check for duplicates
+            embedding: Precomputed embedding of text (skips generate_embedding)
         
         Returns:
             Dictionary with is_duplicate, similar_to, similarity, similar_text
         """
         try:
             # Generate embedding for new text
-            new_embedding = self.generate_embedding(text)
+            new_embedding = embedding if embedding is not None else self.generate_embedding(text)
             if not new_embedding:
                 return {
                     'is_duplicate': False,
@@ -160,13 +200,10 @@ Rumor: {text}"""
                     'similar_text': None
                 }
             
-            new_embedding = np.array(new_embedding)
-            
-            # Get all active markets with embeddings
-            supabase = get_supabase_client()
-            markets_response = supabase.table('markets').select('id, text, embedding').eq('status', 'active').not_.is_('embedding', 'null').execute()
+            # Nearest active market from the in-process index
+            matches = get_market_index().search(new_embedding, k=1)
             
-            if not markets_response.data:
+            if not matches:
                 return {
                     'is_duplicate': False,
                     'similar_to': None,
@@ -174,29 +211,15 @@ Rumor: {text}"""
                     'similar_text': None
                 }
             
-            max_similarity = 0.0
-            most_similar_market = None
-            most_similar_text = None
-            
-            for market in markets_response.data:
-                if not market.get('embedding'):
-                    continue
-                
-                existing_embedding = np.array(market['embedding'])
-                similarity = self.cosine_similarity(new_embedding, existing_embedding)
-                
-                if similarity > max_similarity:
-                    max_similarity = similarity
-                    most_similar_market = market.get('id')
-                    most_similar_text = market.get('text')
-            
-            is_duplicate = max_similarity > 0.85
+            best = matches[0]
+            max_similarity = max(0.0, best['similarity'])
+            is_duplicate = max_similarity > Config.DUPLICATE_SIMILARITY_THRESHOLD
             
             return {
                 'is_duplicate': is_duplicate,
-                'similar_to': most_similar_market if is_duplicate else None,
+                'similar_to': best['market_id'] if is_duplicate else None,
                 'similarity': round(float(max_similarity), 4),
-                'similar_text': most_similar_text if is_duplicate else None
+                'similar_text': best['text'] if is_duplicate else None
             }
             
         except Exception as e:
@@ -208,9 +231,69 @@ Rumor: {text}"""
                 'similar_text': None
             }
     
+    def analyze_submission(self, text: str, timeout: float = None) -> tuple:
+        """
+        Run the AI stage of a market submission with independent calls in parallel
+        
+        Classification and embedding run concurrently on the shared AI pool;
+        the duplicate check reuses the embedding against the local vector index.
+        Calls that miss the deadline fall back to UNCERTAIN / non-duplicate;
+        so does the duplicate check while the index is still warming up.
+        
+        Args:
+            text: The rumor text
+            timeout: Deadline in seconds for the whole stage (defaults to AI_CALL_TIMEOUT_SECONDS)
+        
+        Returns:
+            Tuple of (ai_analysis dict with classification and duplicate_check, embedding or None)
+        """
+        timeout = Config.AI_CALL_TIMEOUT_SECONDS if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        executor = get_ai_executor()
+        
+        classification_future = executor.submit(self.classify_rumor, text)
+        embedding_future = executor.submit(self.generate_embedding, text)
+        
+        embedding = None
+        try:
+            embedding = embedding_future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FuturesTimeoutError:
+            logger.warning(f"Embedding generation missed the {timeout}s deadline")
+        except Exception as e:
+            logger.warning(f"Embedding generation failed: {str(e)}")
+        
+        index = get_market_index()
+        if embedding and index.ready:
+            duplicate_future = executor.submit(self.check_duplicate, text, embedding)
+            try:
+                duplicate_check = duplicate_future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FuturesTimeoutError:
+                logger.warning(f"Duplicate check missed the {timeout}s deadline")
+                duplicate_check = _fallback_duplicate_check()
+        else:
+            if embedding:
+                # Don't bulk-load on the request thread; the check is skipped meanwhile
+                logger.info("Vector index not loaded yet, skipping duplicate check")
+                index.warm()
+            duplicate_check = _fallback_duplicate_check()
+        
+        try:
+            classification = classification_future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FuturesTimeoutError:
+            logger.warning(f"AI classification missed the {timeout}s deadline")
+            classification = _fallback_classification()
+        except Exception as e:
+            logger.warning(f"AI classification failed: {str(e)}")
+            classification = _fallback_classification()
+        
+        return {
+            'classification': classification,
+            'duplicate_check': duplicate_check
+        }, embedding
+    
     def generate_embedding(self, text: str) -> list:
         """
-        Generate embedding vector for text
+        Generate embedding vector for text (served from the embedding cache when possible)
         
         Args:
             text: Text to generate embedding for
@@ -218,20 +301,50 @@ Rumor: {text}"""
         Returns:
             Embedding vector as list, or None on failure
         """
+        cache = get_embedding_cache()
+        cached = cache.get(text, Config.EMBEDDING_MODEL)
+        if cached is not None:
+            return cached
+        
         if not self.client:
             logger.warning("OpenAI client not available for embedding")
             return None
         
         try:
-            response = self.client.embeddings.create(
-                model="text-embedding-3-small",
-                input=text
-            )
-            return response.data[0].embedding
+            # Concurrent requests are coalesced into one provider call
+            embedding = get_embedding_batcher().embed(text)
+            if embedding is not None:
+                cache.put(text, Config.EMBEDDING_MODEL, embedding)
+            return embedding
         except Exception as e:
             logger.error(f"Error in generate_embedding: {str(e)}")
             return None
     
+    def generate_embeddings(self, texts: list) -> list:
+        """
+        Generate embeddings for many texts with batched provider calls
+        
+        Args:
+            texts: Texts to embed
+        
+        Returns:
+            List of embeddings aligned with texts (None for failures)
+        """
+        cache = get_embedding_cache()
+        results = [cache.get(text, Config.EMBEDDING_MODEL) for text in texts]
+        
+        missing = [i for i, embedding in enumerate(results) if embedding is None]
+        if not missing or not self.client:
+            return results
+        
+        vectors = get_embedding_batcher().embed_many([texts[i] for i in missing])
+        for i, embedding in zip(missing, vectors):
+            if embedding is not None:
+                cache.put(texts[i], Config.EMBEDDING_MODEL, embedding)
+                results[i] = embedding
+        
+        return results
+    
     @staticmethod
     def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
         """
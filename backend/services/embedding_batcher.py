@@ -0,0 +1,151 @@
+"""Micro-batching embedder that coalesces concurrent embedding requests"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FuturesTimeoutError
+from openai import OpenAI
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingBatcher:
+    """Collects embedding requests for up to max_wait seconds (or max_batch
+    items) and sends them as one embeddings.create call
+
+    Callers block on embed() until their batch returns. Identical texts in
+    the same window share one input slot.
+    """
+
+    def __init__(self, client=None, model: str = None, max_batch: int = None, max_wait: float = None):
+        if client is None:
+            api_key = os.getenv('OPENAI_API_KEY') or Config.OPENAI_API_KEY
+            client = OpenAI(api_key=api_key, timeout=Config.OPENAI_TIMEOUT_SECONDS) if api_key else None
+        self.client = client
+        self.model = model or Config.EMBEDDING_MODEL
+        self.max_batch = max_batch or Config.EMBEDDING_BATCH_SIZE
+        self.max_wait = Config.EMBEDDING_BATCH_WAIT_MS / 1000.0 if max_wait is None else max_wait
+        self._cond = threading.Condition()
+        self._pending = []
+        self._thread = None
+        self.requests = 0
+        self.batches = 0
+        self.provider_inputs = 0
+
+    def _ensure_dispatcher(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._dispatch_loop, name='embedding-batcher', daemon=True)
+            self._thread.start()
+
+    def embed(self, text: str, timeout: float = None) -> list:
+        """
+        Embed one text through the shared batch window
+
+        Returns:
+            Embedding vector as list, or None on failure/timeout
+        """
+        if not self.client:
+            return None
+
+        future = Future()
+        with self._cond:
+            self._ensure_dispatcher()
+            self._pending.append((text, future))
+            self.requests += 1
+            self._cond.notify()
+
+        try:
+            return future.result(timeout=timeout if timeout is not None else Config.OPENAI_TIMEOUT_SECONDS)
+        except FuturesTimeoutError:
+            logger.warning("Timed out waiting for batched embedding")
+            return None
+        except Exception as e:
+            logger.error(f"Batched embedding failed: {str(e)}")
+            return None
+
+    def embed_many(self, texts: list, chunk_size: int = 512) -> list:
+        """
+        Embed a list of texts directly in large provider batches (bulk jobs)
+
+        Returns:
+            List of embeddings aligned with texts (None where a chunk failed)
+        """
+        results = [None] * len(texts)
+        if not self.client:
+            return results
+
+        for start in range(0, len(texts), chunk_size):
+            chunk = texts[start:start + chunk_size]
+            try:
+                vectors = self._call_provider(chunk)
+                results[start:start + len(chunk)] = vectors
+            except Exception as e:
+                logger.error(f"Embedding chunk at {start} failed: {str(e)}")
+        return results
+
+    def _call_provider(self, texts: list) -> list:
+        """One embeddings.create call; returns vectors in input order"""
+        response = self.client.embeddings.create(model=self.model, input=texts)
+        self.batches += 1
+        self.provider_inputs += len(texts)
+        vectors = [None] * len(texts)
+        for item in response.data:
+            vectors[item.index] = item.embedding
+        return vectors
+
+    def _take_batch(self) -> list:
+        """Wait for the first request, then for the window to fill or expire"""
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+
+            deadline = time.monotonic() + self.max_wait
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = self._pending[:self.max_batch]
+            self._pending = self._pending[self.max_batch:]
+            return batch
+
+    def _dispatch_loop(self):
+        while True:
+            batch = self._take_batch()
+
+            # Coalesce duplicate texts within the window
+            unique = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                vectors = dict(zip(unique, self._call_provider(unique)))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for text, future in batch:
+                future.set_result(vectors.get(text))
+
+    def stats(self) -> dict:
+        """Request coalescing counters"""
+        return {
+            'requests': self.requests,
+            'provider_batches': self.batches,
+            'provider_inputs': self.provider_inputs,
+            'avg_batch_size': round(self.provider_inputs / self.batches, 2) if self.batches else 0.0
+        }
+
+_embedding_batcher = None
+_embedding_batcher_lock = threading.Lock()
+
+def get_embedding_batcher() -> EmbeddingBatcher:
+    """Get or create the process-wide embedding batcher"""
+    global _embedding_batcher
+
+    if _embedding_batcher is None:
+        with _embedding_batcher_lock:
+            if _embedding_batcher is None:
+                _embedding_batcher = EmbeddingBatcher()
+
+    return _embedding_batcher
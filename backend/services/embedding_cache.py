@@ -0,0 +1,151 @@
+"""Content-addressed embedding cache (in-memory LRU + optional SQLite tier)"""
+
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different submissions share a cache entry"""
+    text = unicodedata.normalize('NFKC', text or '')
+    return _WHITESPACE_RE.sub(' ', text).strip().casefold()
+
+class EmbeddingCache:
+    """LRU cache of embeddings keyed by sha256(model, normalized text)
+
+    Lookups go memory -> SQLite (if a path is configured) -> miss. Disk hits
+    are promoted into memory. Vectors are stored as float32 bytes on disk.
+    """
+
+    def __init__(self, max_entries: int = 10000, path: str = None):
+        self.max_entries = max_entries
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._db = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if path:
+            try:
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute('PRAGMA journal_mode=WAL')
+                self._db.execute(
+                    'CREATE TABLE IF NOT EXISTS embeddings ('
+                    'key TEXT PRIMARY KEY, model TEXT NOT NULL, '
+                    'vector BLOB NOT NULL, created_at REAL NOT NULL)'
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding cache persistence disabled: {str(e)}")
+                self._db = None
+
+    @staticmethod
+    def make_key(text: str, model: str) -> str:
+        """Cache key for a (text, model) pair"""
+        payload = f"{model}\x00{normalize_text(text)}".encode('utf-8')
+        return hashlib.sha256(payload).hexdigest()
+
+    def _remember(self, key: str, embedding: list):
+        self._entries[key] = embedding
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, text: str, model: str):
+        """Return the cached embedding (list of floats) or None"""
+        key = self.make_key(text, model)
+
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return embedding
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        'SELECT vector FROM embeddings WHERE key = ?', (key,)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    logger.warning(f"Embedding cache read failed: {str(e)}")
+                    row = None
+                if row is not None:
+                    embedding = np.frombuffer(row[0], dtype=np.float32).tolist()
+                    self._remember(key, embedding)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return embedding
+
+            self.misses += 1
+            return None
+
+    def put(self, text: str, model: str, embedding: list):
+        """Store an embedding for a (text, model) pair"""
+        if not embedding:
+            return
+        key = self.make_key(text, model)
+
+        with self._lock:
+            self._remember(key, list(embedding))
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        'INSERT OR REPLACE INTO embeddings (key, model, vector, created_at) VALUES (?, ?, ?, ?)',
+                        (key, model, np.asarray(embedding, dtype=np.float32).tobytes(), time.time())
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Embedding cache write failed: {str(e)}")
+
+    def clear(self):
+        """Drop in-memory entries and reset counters (disk tier is kept)"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'persistent': self._db is not None
+            }
+
+_embedding_cache = None
+_embedding_cache_lock = threading.Lock()
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Get or create the process-wide embedding cache"""
+    global _embedding_cache
+
+    if _embedding_cache is None:
+        with _embedding_cache_lock:
+            if _embedding_cache is None:
+                _embedding_cache = EmbeddingCache(
+                    max_entries=Config.EMBEDDING_CACHE_SIZE,
+                    path=Config.EMBEDDING_CACHE_PATH
+                )
+
+    return _embedding_cache
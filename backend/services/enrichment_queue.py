@@ -0,0 +1,190 @@
+"""Background AI enrichment of newly submitted markets"""
+
+import logging
+import queue
+import threading
+from datetime import datetime, timedelta, timezone
+from config import Config
+from utils.supabase_client import get_supabase_client
+from services.vector_index import get_market_index
+
+logger = logging.getLogger(__name__)
+
+class EnrichmentQueue:
+    """Worker pool that fills ai_prediction, ai_confidence and embedding
+
+    Markets are inserted with enrichment_status='pending' and enqueued here.
+    A worker claims a market by flipping pending -> processing (so only one
+    process enriches it), runs the parallel AI stage and writes the results.
+    Failed attempts are retried with exponential backoff; markets left
+    pending/processing by a crashed process are picked up again by
+    recover() when the pool starts.
+    """
+
+    def __init__(self, ai_service=None, workers: int = None, max_attempts: int = None,
+                 backoff_seconds: float = None):
+        self._ai_service = ai_service
+        self.workers = workers or Config.ENRICHMENT_WORKERS
+        self.max_attempts = max_attempts or Config.ENRICHMENT_MAX_ATTEMPTS
+        self.backoff_seconds = Config.ENRICHMENT_BACKOFF_SECONDS if backoff_seconds is None else backoff_seconds
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._started = False
+        self.processed = 0
+        self.failed = 0
+        self.retried = 0
+
+    @property
+    def ai_service(self):
+        if self._ai_service is None:
+            from services.ai_service import AIService
+            self._ai_service = AIService()
+        return self._ai_service
+
+    def start(self):
+        """Start worker threads (idempotent) and requeue unfinished markets"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'enrichment-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+        try:
+            self.recover()
+        except Exception as e:
+            logger.warning(f"Enrichment recovery failed: {str(e)}")
+
+    def enqueue(self, market_id: str, text: str, attempt: int = 0):
+        """Schedule a market for enrichment"""
+        self.start()
+        self._queue.put((market_id, text, attempt))
+
+    def recover(self, stale_after_minutes: int = 10):
+        """Requeue markets still pending, or stuck processing after a crash
+
+        Markets keep the attempts they already used; a stuck claim counts
+        as one, and a market with no attempts left is marked failed.
+        """
+        supabase = get_supabase_client()
+        cutoff = (datetime.now(timezone.utc) - timedelta(minutes=stale_after_minutes)).isoformat()
+
+        pending = supabase.table('markets').select('id, text, enrichment_attempts').eq(
+            'enrichment_status', 'pending'
+        ).execute()
+        # Claims from before enrichment_claimed_at existed count as stale
+        stuck = supabase.table('markets').select('id, text, enrichment_attempts').eq(
+            'enrichment_status', 'processing'
+        ).or_(f'enrichment_claimed_at.is.null,enrichment_claimed_at.lt."{cutoff}"').execute()
+
+        rows = list(pending.data or [])
+        for row in stuck.data or []:
+            exhausted = (row.get('enrichment_attempts') or 0) >= self.max_attempts
+            update = {'enrichment_status': 'failed' if exhausted else 'pending'}
+            if exhausted:
+                update['enrichment_error'] = 'Worker lost during the last attempt'
+            revived = supabase.table('markets').update(update).eq('id', row['id']).eq(
+                'enrichment_status', 'processing'
+            ).execute()
+            if revived.data and not exhausted:
+                rows.append(row)
+
+        for row in rows:
+            self._queue.put((row['id'], row['text'], row.get('enrichment_attempts') or 0))
+        if rows:
+            logger.info(f"Requeued {len(rows)} markets for AI enrichment")
+
+    def _claim(self, supabase, market_id: str, attempt: int) -> bool:
+        """Atomically move a market from pending to processing"""
+        response = supabase.table('markets').update({
+            'enrichment_status': 'processing',
+            'enrichment_attempts': attempt + 1,
+            'enrichment_claimed_at': datetime.now(timezone.utc).isoformat()
+        }).eq('id', market_id).eq('enrichment_status', 'pending').execute()
+        return bool(response.data)
+
+    def _run(self):
+        while True:
+            market_id, text, attempt = self._queue.get()
+            try:
+                self._process(market_id, text, attempt)
+            except Exception as e:
+                logger.error(f"Enrichment worker error for market {market_id}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def _process(self, market_id: str, text: str, attempt: int):
+        supabase = get_supabase_client()
+        if not self._claim(supabase, market_id, attempt):
+            return
+
+        ai_analysis, embedding = self.ai_service.analyze_submission(text)
+        classification = ai_analysis['classification']
+        duplicate_check = ai_analysis['duplicate_check']
+
+        # Without a configured client the fallbacks are final; otherwise a
+        # missing embedding or a fallback classification is worth a retry
+        ai_failed = self.ai_service.client is not None and (
+            embedding is None or classification.get('reasoning') == 'AI unavailable'
+        )
+
+        if ai_failed and attempt + 1 < self.max_attempts:
+            delay = self.backoff_seconds * (2 ** attempt)
+            supabase.table('markets').update({
+                'enrichment_status': 'pending',
+                'enrichment_error': 'AI call failed, retrying'
+            }).eq('id', market_id).execute()
+            self.retried += 1
+            timer = threading.Timer(delay, self._queue.put, args=((market_id, text, attempt + 1),))
+            timer.daemon = True
+            timer.start()
+            return
+
+        update = {
+            'ai_prediction': classification.get('prediction'),
+            'ai_confidence': classification.get('confidence'),
+            'duplicate_of': duplicate_check.get('similar_to'),
+            'duplicate_similarity': duplicate_check.get('similarity'),
+            'enrichment_status': 'failed' if ai_failed else 'done',
+            'enrichment_error': 'AI unavailable after retries' if ai_failed else None
+        }
+        if embedding is not None:
+            update['embedding'] = embedding
+
+        response = supabase.table('markets').update(update).eq('id', market_id).execute()
+
+        if ai_failed:
+            self.failed += 1
+        else:
+            self.processed += 1
+
+        # Only still-active markets belong in the duplicate index
+        if embedding is not None and response.data and response.data[0].get('status') == 'active':
+            get_market_index().add_market(market_id, embedding, text)
+
+    def stats(self) -> dict:
+        """Queue depth and outcome counters"""
+        return {
+            'queued': self._queue.qsize(),
+            'workers': len(self._threads),
+            'processed': self.processed,
+            'failed': self.failed,
+            'retried': self.retried
+        }
+
+_enrichment_queue = None
+_enrichment_queue_lock = threading.Lock()
+
+def get_enrichment_queue() -> EnrichmentQueue:
+    """Get or create the process-wide enrichment queue"""
+    global _enrichment_queue
+
+    if _enrichment_queue is None:
+        with _enrichment_queue_lock:
+            if _enrichment_queue is None:
+                _enrichment_queue = EnrichmentQueue()
+
+    return _enrichment_queue
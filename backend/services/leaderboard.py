@@ -0,0 +1,127 @@
+"""Leaderboard by total balance (see database/leaderboard.sql)"""
+
+import threading
+import time
+from typing import Dict, List, Optional
+from config import Config
+from utils.supabase_client import get_supabase_read_client
+
+LEADERBOARD_COLUMNS = 'id, pseudonym, total_balance, total_earned'
+
+class Leaderboard:
+    """Ranked reads over users.total_balance with a cached top-N snapshot
+
+    Ordering is (total_balance, total_earned, id), all descending, served by
+    idx_users_leaderboard. The first snapshot_size entries are kept in
+    process for ttl_seconds, so the common top-20 request costs no query;
+    deeper pages, ranks and neighbours go to the index.
+    """
+
+    def __init__(self, ttl_seconds: float = None, snapshot_size: int = None):
+        self.ttl_seconds = Config.LEADERBOARD_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.snapshot_size = snapshot_size or Config.LEADERBOARD_SNAPSHOT_SIZE
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._snapshot = None
+        self._expires_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _entry(rank: int, row: Dict) -> Dict:
+        # Pseudonyms are shortened on public boards, as /auth/users always did
+        return {
+            'rank': int(rank),
+            'user_id': row['id'],
+            'pseudonym': (row.get('pseudonym') or '')[:8],
+            'total_balance': round(float(row.get('total_balance') or 0.0), 2),
+            'total_earned': round(float(row.get('total_earned') or 0.0), 2)
+        }
+
+    @classmethod
+    def _page(cls, offset: int, limit: int) -> List[Dict]:
+        supabase = get_supabase_read_client()
+        response = supabase.table('users').select(LEADERBOARD_COLUMNS).order(
+            'total_balance', desc=True
+        ).order('total_earned', desc=True).order('id', desc=True).range(
+            offset, offset + limit - 1
+        ).execute()
+        return [cls._entry(offset + i + 1, row) for i, row in enumerate(response.data or [])]
+
+    def _cached_snapshot(self) -> Optional[List[Dict]]:
+        with self._lock:
+            if self._snapshot is not None and self._expires_at > time.monotonic():
+                self.hits += 1
+                return self._snapshot
+        return None
+
+    def snapshot(self) -> List[Dict]:
+        """Top snapshot_size entries (at most ttl_seconds old)"""
+        snapshot = self._cached_snapshot()
+        if snapshot is not None:
+            return snapshot
+
+        with self._refresh_lock:
+            snapshot = self._cached_snapshot()
+            if snapshot is not None:
+                return snapshot
+
+            snapshot = self._page(0, self.snapshot_size)
+            with self._lock:
+                self.misses += 1
+                self._snapshot = snapshot
+                self._expires_at = time.monotonic() + self.ttl_seconds
+            return snapshot
+
+    def top(self, limit: int = 20, offset: int = 0) -> List[Dict]:
+        """Leaderboard page starting at rank offset + 1"""
+        if offset + limit <= self.snapshot_size:
+            return [dict(entry) for entry in self.snapshot()[offset:offset + limit]]
+        return self._page(offset, limit)
+
+    @classmethod
+    def rank(cls, user_id: str) -> Optional[Dict]:
+        """Rank and leaderboard entry of one user, or None if the user is missing"""
+        supabase = get_supabase_read_client()
+        rows = supabase.rpc('leaderboard_rank', {'p_user_id': user_id}).execute().data
+        return cls._entry(rows[0]['rank'], rows[0]) if rows else None
+
+    @classmethod
+    def neighbours(cls, user_id: str, radius: int = 5) -> List[Dict]:
+        """The user plus up to radius entries above and below, in rank order"""
+        supabase = get_supabase_read_client()
+        rows = supabase.rpc('leaderboard_neighbours', {
+            'p_user_id': user_id,
+            'p_radius': radius
+        }).execute().data
+        return [cls._entry(row['rank'], row) for row in rows or []]
+
+    def invalidate(self):
+        """Force the next snapshot() to read the database"""
+        with self._lock:
+            self._expires_at = 0.0
+
+    def stats(self) -> dict:
+        """Snapshot hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'snapshot_size': len(self._snapshot or []),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+_leaderboard = None
+_leaderboard_lock = threading.Lock()
+
+def get_leaderboard() -> Leaderboard:
+    """Get or create the process-wide leaderboard"""
+    global _leaderboard
+
+    if _leaderboard is None:
+        with _leaderboard_lock:
+            if _leaderboard is None:
+                _leaderboard = Leaderboard()
+
+    return _leaderboard
@@ -0,0 +1,384 @@
+"""In-process market pool engine with a write-behind journal"""
+
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from config import Config
+from models.market import Market
+from utils.supabase_client import get_supabase_client
+
+logger = logging.getLogger(__name__)
+
+class _PoolState:
+    """Pool state of one market plus its lock
+
+    market includes trades still waiting for their execute_trade commit
+    (it prices the next trade); committed only has trades whose database
+    side committed, and is what gets journaled and flushed.
+    """
+
+    __slots__ = ('market', 'committed', 'seq', 'lock', 'idle', 'pending_trades', 'closed')
+
+    def __init__(self):
+        self.market = None
+        self.committed = None
+        self.seq = 0
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)
+        self.pending_trades = 0
+        self.closed = False
+
+class MarketEngine:
+    """Owns total_bet_true / total_bet_false / price of markets being traded
+
+    Trades are applied in memory under a per-market lock. Once the trade's
+    execute_trade rpc has committed, commit_trade() appends the committed
+    pool to a local journal (one JSON line with the absolute pool state and
+    a per-market sequence number); a trade the database rejected is only
+    undone in memory, so a crash never replays a trade that did not happen. A flusher thread persists the latest state
+    of every dirty market with one flush_market_pools rpc; the database only
+    accepts a state whose pool_seq is newer than the stored one, so replaying
+    the journal after a crash is idempotent.
+
+    Journal files:
+        <path>           records appended since the last flush started
+        <path>.flushing  records of the flush in progress (or a failed one)
+        <path>.lock      held (flock) by the engine that owns the journal
+
+    The engine assumes it is the only writer of pool totals for the markets
+    it trades, i.e. a single node runs with MARKET_ENGINE_ENABLED. start()
+    enforces this on the host: a second process using the same journal
+    cannot take the lock and refuses to start.
+    """
+
+    def __init__(self, journal_path: str = None, flush_interval: float = None, fsync: bool = None):
+        self.journal_path = journal_path or Config.MARKET_ENGINE_JOURNAL_PATH
+        self.flush_interval = Config.MARKET_ENGINE_FLUSH_MS / 1000.0 if flush_interval is None else flush_interval
+        self.fsync = Config.MARKET_ENGINE_FSYNC if fsync is None else fsync
+        self._states = {}
+        self._states_lock = threading.Lock()
+        self._journal_lock = threading.Lock()
+        self._journal = None
+        self._lock_file = None
+        self._pending = {}
+        self._inflight = {}
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._started = False
+        self._start_lock = threading.Lock()
+        self.trades = 0
+        self.reverts = 0
+        self.flushes = 0
+        self.flushed_markets = 0
+        self.flush_failures = 0
+
+    @property
+    def _flushing_path(self) -> str:
+        return self.journal_path + '.flushing'
+
+    def _acquire_journal_lock(self):
+        """Take the exclusive journal lock for this process's lifetime"""
+        lock_file = open(self.journal_path + '.lock', 'a+')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise RuntimeError(
+                f"Market engine journal {self.journal_path} is in use by another process; "
+                "run one process with MARKET_ENGINE_ENABLED"
+            )
+        self._lock_file = lock_file
+
+    def start(self):
+        """
+        Replay the journal and start the flusher thread (idempotent)
+
+        Raises:
+            RuntimeError: If another process owns the journal
+        """
+        with self._start_lock:
+            if self._started:
+                return
+            if self._lock_file is None:
+                self._acquire_journal_lock()
+            self.replay()
+            self._journal = open(self.journal_path, 'a', encoding='utf-8')
+            self._thread = threading.Thread(target=self._flush_loop, name='market-engine-flusher', daemon=True)
+            self._thread.start()
+            self._started = True
+
+        if self._pending:
+            self.flush()
+
+    def replay(self):
+        """Load unflushed pool states left by a previous process into _pending"""
+        latest = {}
+        for path in (self._flushing_path, self.journal_path):
+            if not os.path.exists(path):
+                continue
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Torn final write from a crash
+                        continue
+                    current = latest.get(record['id'])
+                    if current is None or record['pool_seq'] > current['pool_seq']:
+                        latest[record['id']] = record
+
+        if latest:
+            logger.info(f"Replaying {len(latest)} market pool states from the journal")
+        with self._journal_lock:
+            self._pending.update(latest)
+
+    def _get_state(self, market_id: str) -> _PoolState:
+        with self._states_lock:
+            state = self._states.get(market_id)
+            if state is None:
+                state = self._states[market_id] = _PoolState()
+            return state
+
+    def _load(self, state: _PoolState, market_id: str) -> bool:
+        """Read the market into state (caller holds state.lock)"""
+        supabase = get_supabase_client()
+        response = supabase.table('markets').select(
+            Market.select_columns('trading') + ', pool_seq'
+        ).eq('id', market_id).execute()
+        if not response.data:
+            return False
+
+        row = response.data[0]
+        seq = int(row.pop('pool_seq', 0) or 0)
+        market = Market.from_dict(row)
+
+        # A newer state may still be waiting in the journal
+        with self._journal_lock:
+            for records in (self._inflight, self._pending):
+                record = records.get(market_id)
+                if record and record['pool_seq'] > seq:
+                    seq = record['pool_seq']
+                    market.total_bet_true = record['total_bet_true']
+                    market.total_bet_false = record['total_bet_false']
+                    market.price = record['price']
+
+        state.market = market
+        state.committed = Market.from_dict(market.to_dict('trading'))
+        state.seq = seq
+        return True
+
+    def _append(self, market_id: str, state: _PoolState):
+        """Journal the committed pool state (caller holds state.lock)"""
+        record = {
+            'id': market_id,
+            'pool_seq': state.seq,
+            'total_bet_true': state.committed.total_bet_true,
+            'total_bet_false': state.committed.total_bet_false,
+            'price': state.committed.price
+        }
+        with self._journal_lock:
+            self._journal.write(json.dumps(record) + '\n')
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+            self._pending[market_id] = record
+
+    @staticmethod
+    def _apply(market: Market, trade_type: str, amount: float):
+        market.apply_trade(trade_type, amount)
+        # Same clamp as calculate_market_price / the markets.price check
+        market.price = max(0.01, min(0.99, market.price))
+
+    def apply_trade(self, market_id: str, trade_type: str, amount: float):
+        """
+        Apply a trade to the in-memory pool, pending its database commit
+
+        Every successful call must be followed by commit_trade() or
+        revert_trade() with the returned trade.
+
+        Args:
+            market_id: Market to trade
+            trade_type: 'true' or 'false'
+            amount: CC amount
+
+        Returns:
+            Tuple of (dict with market, price and new_price, error message or None)
+        """
+        if not self._started:
+            self.start()
+        while True:
+            state = self._get_state(market_id)
+            with state.lock:
+                if state.closed:
+                    continue
+                if state.market is None and not self._load(state, market_id):
+                    with self._states_lock:
+                        self._states.pop(market_id, None)
+                    return None, "Market not found"
+
+                market = state.market
+                if not market.is_active():
+                    return None, f"Market is not active. Current status: {market.status}"
+
+                price = market.price
+                self._apply(market, trade_type, amount)
+                state.pending_trades += 1
+                snapshot = Market.from_dict(market.to_dict('trading'))
+
+            return {
+                'market': snapshot,
+                'price': price,
+                'new_price': snapshot.price,
+                'market_id': market_id,
+                'trade_type': trade_type,
+                'amount': float(amount),
+                'state': state
+            }, None
+
+    def _settle_trade(self, trade: dict, committed: bool):
+        state = trade['state']
+        with state.lock:
+            if committed:
+                self._apply(state.committed, trade['trade_type'], trade['amount'])
+                state.seq += 1
+                self._append(trade['market_id'], state)
+            else:
+                self._apply(state.market, trade['trade_type'], -trade['amount'])
+            state.pending_trades -= 1
+            if state.pending_trades == 0:
+                state.idle.notify_all()
+
+    def commit_trade(self, trade: dict):
+        """Journal a trade whose execute_trade rpc committed"""
+        self._settle_trade(trade, committed=True)
+        self.trades += 1
+
+    def revert_trade(self, trade: dict):
+        """Undo a trade whose database side failed (nothing was journaled)"""
+        self._settle_trade(trade, committed=False)
+        self.reverts += 1
+
+    def get_market(self, market_id: str):
+        """Live pool state for a market this engine owns, or None"""
+        with self._states_lock:
+            state = self._states.get(market_id)
+        if state is None:
+            return None
+        with state.lock:
+            if state.market is None or state.closed:
+                return None
+            return Market.from_dict(state.market.to_dict('trading'))
+
+    def _rotate(self):
+        """Move the live journal into the .flushing file (caller holds _journal_lock)"""
+        self._journal.close()
+        if os.path.exists(self._flushing_path):
+            # A previous flush failed: keep its records and add the new ones
+            with open(self.journal_path, encoding='utf-8') as src, \
+                    open(self._flushing_path, 'a', encoding='utf-8') as dst:
+                dst.write(src.read())
+            os.remove(self.journal_path)
+        else:
+            os.replace(self.journal_path, self._flushing_path)
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+
+    def flush(self) -> int:
+        """
+        Persist every dirty market with one rpc call
+
+        Returns:
+            Number of market states written
+        """
+        with self._flush_lock:
+            with self._journal_lock:
+                if not self._pending:
+                    return 0
+                self._inflight = self._pending
+                self._pending = {}
+                if self._journal is not None:
+                    self._rotate()
+                records = list(self._inflight.values())
+
+            try:
+                get_supabase_client().rpc('flush_market_pools', {'p_pools': records}).execute()
+            except Exception as e:
+                logger.error(f"Market engine flush failed: {str(e)}")
+                self.flush_failures += 1
+                with self._journal_lock:
+                    for market_id, record in self._inflight.items():
+                        current = self._pending.get(market_id)
+                        if current is None or current['pool_seq'] < record['pool_seq']:
+                            self._pending[market_id] = record
+                    self._inflight = {}
+                return 0
+
+            with self._journal_lock:
+                self._inflight = {}
+                if os.path.exists(self._flushing_path):
+                    os.remove(self._flushing_path)
+
+            self.flushes += 1
+            self.flushed_markets += len(records)
+            return len(records)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Market engine flusher error: {str(e)}")
+
+    def release(self, market_id: str, timeout: float = 30.0):
+        """Persist and drop a market (before settlement or deletion reads the row)
+
+        Trades already applied are waited for (up to timeout seconds) so
+        their commits are journaled and flushed with the market.
+        """
+        with self._states_lock:
+            state = self._states.pop(market_id, None)
+        if state is not None:
+            with state.lock:
+                state.closed = True
+                if not state.idle.wait_for(lambda: state.pending_trades == 0, timeout):
+                    logger.warning(f"Releasing market {market_id} with {state.pending_trades} trades in flight")
+        self.flush()
+
+    def stats(self) -> dict:
+        """Trade and write-behind counters"""
+        with self._journal_lock:
+            pending = len(self._pending)
+        return {
+            'enabled': Config.MARKET_ENGINE_ENABLED,
+            'markets': len(self._states),
+            'trades': self.trades,
+            'reverts': self.reverts,
+            'pending_markets': pending,
+            'flushes': self.flushes,
+            'flushed_markets': self.flushed_markets,
+            'flush_failures': self.flush_failures
+        }
+
+_market_engine = None
+_market_engine_lock = threading.Lock()
+
+def get_market_engine() -> MarketEngine:
+    """Get or create the process-wide market engine"""
+    global _market_engine
+
+    if _market_engine is None:
+        with _market_engine_lock:
+            if _market_engine is None:
+                _market_engine = MarketEngine()
+
+    return _market_engine
+
+def release_market(market_id: str):
+    """Hand a market's pool back to the database if the engine is enabled"""
+    if Config.MARKET_ENGINE_ENABLED:
+        engine = get_market_engine()
+        engine.start()
+        engine.release(market_id)
@@ -1,30 +1,157 @@
 """Market service for business logic"""
 
 from typing import Dict
-from utils.supabase_client import get_supabase_client
+from config import Config
+from utils.supabase_client import get_supabase_client, get_supabase_read_client
+from utils.pagination import encode_cursor, decode_cursor
 from models.market import Market
+from services.vector_index import get_market_index
+from services.prediction_cache import get_prediction_cache
+from services.market_engine import get_market_engine, release_market
+from services.settlement_service import SettlementService
 from models.user import User
 
 class MarketService:
     """Service for market operations"""
     
     @staticmethod
-    def get_all_markets():
-        """Get all markets"""
+    def get_all_markets(fields='card'):
+        """Get all markets (projected to the given field set)"""
         try:
-            supabase = get_supabase_client()
-            response = supabase.table('markets').select('*').execute()
+            supabase = get_supabase_read_client()
+            response = supabase.table('markets').select(Market.select_columns(fields, 'card')).execute()
             markets = [Market.from_dict(market) for market in response.data]
             return markets, None
         except Exception as e:
             return None, str(e)
     
     @staticmethod
-    def get_market_by_id(market_id):
-        """Get market by ID"""
+    def list_markets(status=None, category=None, limit: int = 20, offset: int = 0,
+                     cursor: str = None, include_count: bool = False, fields='card') -> Dict:
+        """
+        List markets newest first with filtering, ordering and paging done by the database
+
+        Args:
+            status: Optional status filter
+            category: Optional category filter
+            limit: Page size
+            offset: Rows to skip (ignored when cursor is given)
+            cursor: Keyset cursor returned as next_cursor by a previous page
+            include_count: Also return the exact number of matching rows
+            fields: Column projection (see Market.resolve_fields)
+
+        Returns:
+            Dictionary with markets, next_cursor and total (None unless requested)
+
+        Raises:
+            ValueError: If the cursor, paging arguments or fields are invalid
+        """
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        if offset < 0:
+            raise ValueError("offset cannot be negative")
+
+        # created_at is always needed to build the next cursor
+        columns = Market.select_columns(fields, 'card')
+        if 'created_at' not in Market.resolve_fields(fields, 'card'):
+            columns += ', created_at'
+
+        supabase = get_supabase_read_client()
+
+        if include_count:
+            query = supabase.table('markets').select(columns, count='exact')
+        else:
+            query = supabase.table('markets').select(columns)
+
+        if status:
+            query = query.eq('status', status)
+        if category:
+            query = query.eq('category', category)
+
+        if cursor:
+            # Keyset condition: (created_at, id) < (cursor_created_at, cursor_id)
+            created_at, row_id = decode_cursor(cursor)
+            query = query.or_(
+                f'created_at.lt."{created_at}",'
+                f'and(created_at.eq."{created_at}",id.lt.{row_id})'
+            )
+
+        query = query.order('created_at', desc=True).order('id', desc=True)
+
+        # Fetch one extra row to learn whether another page exists
+        if cursor:
+            query = query.limit(limit + 1)
+        else:
+            query = query.range(offset, offset + limit)
+
+        response = query.execute()
+        rows = response.data or []
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        next_cursor = None
+        if has_more and rows:
+            next_cursor = encode_cursor(rows[-1].get('created_at'), rows[-1].get('id'))
+
+        return {
+            'markets': [Market.from_dict(row) for row in rows],
+            'next_cursor': next_cursor,
+            'total': response.count if include_count else None
+        }
+
+    @staticmethod
+    def get_similar_markets(market_id, k: int = 5, fields='card'):
+        """
+        Find the active markets most similar to a market by embedding
+
+        Args:
+            market_id: Market to compare against
+            k: Number of similar markets to return
+            fields: Column projection for the returned markets
+
+        Returns:
+            Tuple of (list of (Market, similarity) best first, error)
+        """
         try:
-            supabase = get_supabase_client()
-            response = supabase.table('markets').select('*').eq('id', market_id).execute()
+            index = get_market_index()
+            supabase = get_supabase_read_client()
+
+            # Active markets are already indexed; others need their stored embedding
+            vector = index.get_vector(market_id)
+            if vector is None:
+                response = supabase.table('markets').select(
+                    Market.select_columns('ml')
+                ).eq('id', market_id).execute()
+                if not response.data:
+                    return None, "Market not found"
+                vector = response.data[0].get('embedding')
+                if not vector:
+                    return [], None
+
+            matches = index.search(vector, k=k, exclude=market_id)
+            if not matches:
+                return [], None
+
+            response = supabase.table('markets').select(
+                Market.select_columns(fields, 'card')
+            ).in_('id', [m['market_id'] for m in matches]).execute()
+            rows = {row['id']: row for row in (response.data or [])}
+
+            return [
+                (Market.from_dict(rows[m['market_id']]), m['similarity'])
+                for m in matches
+                if m['market_id'] in rows
+            ], None
+        except Exception as e:
+            return None, str(e)
+
+    @staticmethod
+    def get_market_by_id(market_id, fields='detail'):
+        """Get market by ID (projected to the given field set)"""
+        try:
+            supabase = get_supabase_read_client()
+            response = supabase.table('markets').select(Market.select_columns(fields)).eq('id', market_id).execute()
             if response.data:
                 return Market.from_dict(response.data[0]), None
             return None, "Market not found"
@@ -208,7 +335,7 @@ class MarketService:
             
             # Get user from database
             supabase = get_supabase_client()
-            user_response = supabase.table('users').select('*').eq('id', user_id).execute()
+            user_response = supabase.table('users').select('id, available_balance').eq('id', user_id).execute()
             
             if not user_response.data:
                 return {
@@ -227,7 +354,9 @@ class MarketService:
                 }
             
             # Get market from database
-            market_response = supabase.table('markets').select('*').eq('id', market_id).execute()
+            market_response = supabase.table('markets').select(
+                Market.select_columns('trading')
+            ).eq('id', market_id).execute()
             
             if not market_response.data:
                 return {
@@ -263,124 +392,143 @@ class MarketService:
             }
     
     @staticmethod
-    def settle_market(market_id: str, resolution: str, supabase) -> Dict:
-        """Settle a market with final resolution
+    def execute_trade(user_id: str, market_id: str, trade_type: str, cc: float):
+        """
+        Execute a trade atomically in the database (see database/execute_trade.sql)
+        
+        Validation, the balance lock, the pool update, the position upsert and
+        the trade insert run in one transaction behind row locks, in a single
+        round-trip. With MARKET_ENGINE_ENABLED the pool update is applied by
+        the in-process market engine instead; it is journaled once the
+        database side commits, and reverted if it rejects the trade.
+        
+        Args:
+            user_id: User ID making the trade
+            market_id: Market ID for the trade
+            trade_type: 'true' (long) or 'false' (short)
+            cc: Collateral cost (amount to invest)
+        
+        Returns:
+            Tuple of (result dict with market, position, shares_received and
+            new_price, error message or None)
+        """
+        engine_trade = None
+        try:
+            params = {
+                'p_user_id': user_id,
+                'p_market_id': market_id,
+                'p_type': trade_type,
+                'p_cc_amount': float(cc)
+            }
+            if Config.MARKET_ENGINE_ENABLED:
+                engine_trade, error = get_market_engine().apply_trade(market_id, trade_type, float(cc))
+                if error:
+                    return None, error
+                params['p_price'] = engine_trade['price']
+            
+            supabase = get_supabase_client()
+            response = supabase.rpc('execute_trade', params).execute()
+            
+            result = response.data
+            if not result:
+                error = "Trade execution returned no result"
+            else:
+                error = result.get('error')
+            if error:
+                if engine_trade:
+                    trade, engine_trade = engine_trade, None
+                    get_market_engine().revert_trade(trade)
+                return None, error
+            
+            if engine_trade:
+                result['market'] = engine_trade['market'].to_dict('trading')
+                result['new_price'] = engine_trade['new_price']
+                # Journaled only now that the database side has committed
+                trade, engine_trade = engine_trade, None
+                get_market_engine().commit_trade(trade)
+            
+            get_prediction_cache().invalidate(market_id)
+            return result, None
+        except Exception as e:
+            if engine_trade:
+                get_market_engine().revert_trade(engine_trade)
+            return None, str(e)
+    
+    @staticmethod
+    def delete_market(market_id: str, user_id: str):
+        """
+        Delete a market and refund its open positions (see database/delete_market.sql)
+        
+        Refunds are grouped per user and applied, together with the position
+        and market status changes, in one transaction and one round-trip.
+        
+        Args:
+            market_id: Market to delete
+            user_id: User requesting the deletion (must be the submitter)
+        
+        Returns:
+            Tuple of (result dict with refunds and total_refunded, error
+            message or None)
+        """
+        try:
+            # Persist any write-behind pool state before the refunds read it
+            release_market(market_id)
+            
+            supabase = get_supabase_client()
+            result = supabase.rpc('delete_market_with_refunds', {
+                'p_market_id': market_id,
+                'p_user_id': user_id
+            }).execute().data
+            
+            if not result:
+                return None, "Market deletion returned no result"
+            if result.get('error'):
+                return None, result['error']
+            
+            refunds = result.get('refunds') or []
+            get_market_index().remove_market(market_id)
+            get_prediction_cache().invalidate(market_id)
+            return {
+                'refunds': refunds,
+                'total_refunded': sum(r['refund_amount'] for r in refunds)
+            }, None
+        except Exception as e:
+            return None, str(e)
+    
+    @staticmethod
+    def settle_market(market_id: str, resolution: str, dry_run: bool = False) -> Dict:
+        """Settle a market with final resolution using pool-proportional payouts
+        
+        Runs the shared SettlementService with the 'pool' payout policy: the
+        whole pool is split between winning positions by shares. The market
+        ends in resolved_true / resolved_false like oracle settlements.
         
         Args:
             market_id: Market to resolve
             resolution: 'true' or 'false'
-            supabase: Supabase client
+            dry_run: Return the computed payouts without writing anything
             
         Returns:
-            Settlement details with payouts
+            Settlement details with payouts, or {'error': message}
         """
-        from datetime import datetime
         import logging
         
         logger = logging.getLogger(__name__)
         
         try:
-            settlement = {
-                'market_id': market_id,
-                'resolution': resolution,
-                'submitter_payout': 0,
-                'winning_positions': [],
-                'total_payouts': 0
-            }
-            
-            # Get market
-            market_response = supabase.table('markets').select('*').eq('id', market_id).execute()
-            if not market_response.data:
-                return {'error': 'Market not found'}
-            
-            market = Market.from_dict(market_response.data[0])
-            
-            # Get all open positions for this market
-            positions_response = supabase.table('positions').select('*').eq(
-                'market_id', market_id
-            ).eq('status', 'open').execute()
-            
-            positions = positions_response.data if positions_response.data else []
-            
-            # Determine winning and losing positions
-            if resolution == 'true':
-                winning_positions = [p for p in positions if p['type'] == 'true']
-                losing_positions = [p for p in positions if p['type'] == 'false']
-            else:
-                winning_positions = [p for p in positions if p['type'] == 'false']
-                losing_positions = [p for p in positions if p['type'] == 'true']
-            
-            total_winning_shares = sum(p['shares'] for p in winning_positions)
-            total_pool = market.total_bet_true + market.total_bet_false
-            
-            # Distribute payouts to winners
-            for position in winning_positions:
-                if total_winning_shares > 0:
-                    proportion = position['shares'] / total_winning_shares
-                    payout = proportion * total_pool
-                    
-                    # Update user balance
-                    user_response = supabase.table('users').select(
-                        'available_balance'
-                    ).eq('id', position['user_id']).execute()
-                    
-                    if user_response.data:
-                        current_balance = user_response.data[0]['available_balance']
-                        supabase.table('users').update({
-                            'available_balance': current_balance + payout
-                        }).eq('id', position['user_id']).execute()
-                    
-                    # Mark position as won
-                    supabase.table('positions').update({
-                        'status': 'won',
-                        'updated_at': datetime.utcnow().isoformat()
-                    }).eq('id', position['id']).execute()
-                    
-                    settlement['winning_positions'].append({
-                        'user_id': position['user_id'],
-                        'shares': position['shares'],
-                        'payout': payout
-                    })
-                    settlement['total_payouts'] += payout
-            
-            # Mark losing positions as lost
-            for position in losing_positions:
-                supabase.table('positions').update({
-                    'status': 'lost',
-                    'updated_at': datetime.utcnow().isoformat()
-                }).eq('id', position['id']).execute()
-            
-            # Handle submitter stake return
-            if market.submitter_id:
-                if resolution == 'true':
-                    # Submitter wins 2x their stake
-                    submitter_payout = market.stake * 2
-                else:
-                    # Submitter loses their stake
-                    submitter_payout = 0
-                
-                if submitter_payout > 0:
-                    user_response = supabase.table('users').select(
-                        'available_balance'
-                    ).eq('id', market.submitter_id).execute()
-                    
-                    if user_response.data:
-                        current_balance = user_response.data[0]['available_balance']
-                        supabase.table('users').update({
-                            'available_balance': current_balance + submitter_payout,
-                            'locked_balance': max(0, current_balance - market.stake)
-                        }).eq('id', market.submitter_id).execute()
-                
-                settlement['submitter_payout'] = submitter_payout
-            
-            # Update market status
-            supabase.table('markets').update({
-                'status': 'resolved',
-                'resolved_at': datetime.utcnow().isoformat()
-            }).eq('id', market_id).execute()
-            
-            return settlement
-            
+            result = SettlementService(policy='pool').settle(market_id, resolution, dry_run=dry_run)
         except Exception as e:
             logger.error(f"Error settling market {market_id}: {str(e)}")
             return {'error': str(e)}
+        
+        return {
+            'market_id': market_id,
+            'resolution': resolution,
+            'dry_run': dry_run,
+            'submitter_payout': result['submitter_payout'],
+            'winning_users': [
+                {'user_id': user_id, 'payout': payout} for user_id, payout in result['payouts'].items()
+            ],
+            'total_payouts': result['total_paid'],
+            'positions_closed': result['positions_closed']
+        }
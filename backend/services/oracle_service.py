@@ -1,14 +1,18 @@
 """Oracle service for market oracle operations"""
 
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from typing import Dict, List
+from config import Config
 from services.ai_service import AIService
 from services.market_service import MarketService
+from services.prediction_cache import get_prediction_cache
+from services.settlement_service import SettlementService
+from services.settlement_queue import get_settlement_queue
 from utils.supabase_client import get_supabase_client
 from models.market import Market
 from models.user import User
-from models.position import Position
 import numpy as np
 
 logger = logging.getLogger(__name__)
@@ -27,6 +31,17 @@ class OracleService:
         if error:
             return None, error
         
+        return self._predict_for_market(market, user_query)
+    
+    def _predict_for_market(self, market: Market, user_query=None):
+        """AI prediction for a loaded market, served from the prediction cache
+        while the market state is unchanged"""
+        cache = get_prediction_cache()
+        key = cache.make_key(market.id, cache.market_version(market), user_query)
+        return cache.get_or_compute(key, lambda: self._generate_prediction(market, user_query))
+    
+    def _generate_prediction(self, market: Market, user_query=None):
+        """Run the AI prediction for an already loaded market"""
         # Get AI prediction
         market_data = market.to_dict()
         prediction, error = self.ai_service.generate_prediction(market_data, user_query)
@@ -37,7 +52,7 @@ class OracleService:
         confidence = self._calculate_confidence(market_data, prediction)
         
         return {
-            'market_id': market_id,
+            'market_id': market.id,
             'prediction': prediction,
             'confidence': confidence,
             'timestamp': market.updated_at if hasattr(market, 'updated_at') else None
@@ -59,13 +74,64 @@ class OracleService:
         
         return float(confidence)
     
-    def get_multiple_predictions(self, market_ids, user_query=None):
-        """Get predictions for multiple markets"""
+    def iter_multiple_predictions(self, market_ids, user_query=None, max_concurrency: int = None):
+        """
+        Yield predictions for multiple markets as they complete
+        
+        All markets are loaded with one in_() query; model calls then run
+        in parallel, at most max_concurrency at a time.
+        
+        Args:
+            market_ids: Market IDs to predict
+            user_query: Optional user question passed to the model
+            max_concurrency: Parallel model calls (defaults to ORACLE_BATCH_CONCURRENCY)
+        
+        Yields:
+            Tuples of (market_id, prediction or None, error or None)
+        """
+        market_ids = list(dict.fromkeys(market_ids))
+        if not market_ids:
+            return
+        
+        supabase = get_supabase_client()
+        response = supabase.table('markets').select(
+            Market.select_columns('detail')
+        ).in_('id', market_ids).execute()
+        markets = {row['id']: Market.from_dict(row) for row in (response.data or [])}
+        
+        for market_id in market_ids:
+            if market_id not in markets:
+                yield market_id, None, "Market not found"
+        
+        if not markets:
+            return
+        
+        max_concurrency = max_concurrency or Config.ORACLE_BATCH_CONCURRENCY
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(markets)),
+                                thread_name_prefix='oracle-predict') as executor:
+            futures = {
+                executor.submit(self._predict_for_market, market, user_query): market_id
+                for market_id, market in markets.items()
+            }
+            for future in as_completed(futures):
+                market_id = futures[future]
+                try:
+                    prediction, error = future.result()
+                except Exception as e:
+                    prediction, error = None, str(e)
+                yield market_id, prediction, error
+    
+    def get_multiple_predictions(self, market_ids, user_query=None, max_concurrency: int = None):
+        """Get predictions for multiple markets (concurrently, in input order)"""
+        results = {}
+        for market_id, prediction, error in self.iter_multiple_predictions(market_ids, user_query, max_concurrency):
+            results[market_id] = (prediction, error)
+        
         predictions = []
         errors = []
         
-        for market_id in market_ids:
-            prediction, error = self.get_oracle_prediction(market_id, user_query)
+        for market_id in dict.fromkeys(market_ids):
+            prediction, error = results.get(market_id, (None, "No result"))
             if error:
                 errors.append(f"Market {market_id}: {error}")
             else:
@@ -73,13 +139,19 @@ class OracleService:
         
         return predictions, errors if errors else None
     
-    def settle_market(self, market_id: str, outcome: str) -> Dict:
+    def settle_market(self, market_id: str, outcome: str, progress=None, dry_run: bool = False) -> Dict:
         """
         Settle a market and distribute payouts
         
+        Uses the set-based SettlementService: balance changes are applied as
+        per-user deltas in batched rpc calls, and a market left in 'settling'
+        by an interrupted run is resumed rather than settled twice.
+        
         Args:
             market_id: Market ID to settle
             outcome: 'true' or 'false'
+            progress: Optional callback(stage, done, total)
+            dry_run: Return the computed payouts without writing anything
         
         Returns:
             Dictionary with payouts, winners, losers, and total_paid
@@ -88,184 +160,13 @@ class OracleService:
             ValueError: If market is not active or outcome is invalid
             Exception: For database errors
         """
-        if outcome not in ['true', 'false']:
-            raise ValueError("Outcome must be 'true' or 'false'")
-        
-        supabase = get_supabase_client()
-        
         try:
-            # 1. Get market from Supabase
-            market_response = supabase.table('markets').select('*').eq('id', market_id).execute()
-            if not market_response.data:
-                raise ValueError(f"Market {market_id} not found")
-            
-            market = Market.from_dict(market_response.data[0])
-            
-            # 2. Validate active
-            if not market.is_active():
-                raise ValueError(f"Market {market_id} is not active (status: {market.status})")
-            
-            # 3. Get all active positions
-            positions_response = supabase.table('positions').select('*').eq('market_id', market_id).eq('status', 'open').execute()
-            positions = [Position.from_dict(p) for p in positions_response.data] if positions_response.data else []
-            
-            # 4. Calculate submitter payout: stake*2 if TRUE else 0
-            submitter_payout = 0.0
-            if market.submitter_id:
-                if outcome == 'true':
-                    submitter_payout = market.stake * 2
-                else:
-                    submitter_payout = 0.0
-            
-            # 5. Calculate payouts for each position
-            payouts = {}
-            winners = []
-            losers = []
-            
-            # Process submitter payout
-            if submitter_payout > 0 and market.submitter_id:
-                payouts[market.submitter_id] = payouts.get(market.submitter_id, 0.0) + submitter_payout
-                winners.append(market.submitter_id)
-            
-            # Process positions
-            for position in positions:
-                user_id = position.user_id
-                
-                if position.type == 'true':  # Long position
-                    payout = position.calculate_payout_if_true() if outcome == 'true' else 0.0
-                else:  # Short position (false)
-                    payout = position.calculate_payout_if_false() if outcome == 'false' else 0.0
-                
-                if payout > 0:
-                    payouts[user_id] = payouts.get(user_id, 0.0) + payout
-                    winners.append(user_id)
-                else:
-                    if user_id not in winners:
-                        losers.append(user_id)
-            
-            # 6. Update all user balances
-            user_updates = {}
-            for user_id, payout_amount in payouts.items():
-                # Get user
-                user_response = supabase.table('users').select('*').eq('id', user_id).execute()
-                if not user_response.data:
-                    logger.warning(f"User {user_id} not found for payout")
-                    continue
-                
-                user = User.from_dict(user_response.data[0])
-                
-                # Calculate locked CC for this market (sum of all positions)
-                user_positions = [p for p in positions if p.user_id == user_id]
-                total_locked = sum(p.collateral for p in user_positions)
-                
-                # Unlock locked CC for this market
-                user.unlock_balance(total_locked)
-                
-                # Add payout to available
-                user.available_balance += payout_amount
-                
-                # Update total_earned
-                user.total_earned += payout_amount
-                
-                user_updates[user_id] = {
-                    'available_balance': user.available_balance,
-                    'locked_balance': user.locked_balance,
-                    'total_earned': user.total_earned
-                }
-            
-            # Handle submitter if outcome is false (unlock their stake)
-            if outcome == 'false' and market.submitter_id and market.submitter_id not in payouts:
-                submitter_response = supabase.table('users').select('*').eq('id', market.submitter_id).execute()
-                if submitter_response.data:
-                    submitter = User.from_dict(submitter_response.data[0])
-                    # Unlock the submitter's stake (stake was locked when market was created)
-                    try:
-                        submitter.unlock_balance(market.stake)
-                        user_updates[market.submitter_id] = {
-                            'available_balance': submitter.available_balance,
-                            'locked_balance': submitter.locked_balance
-                        }
-                    except ValueError:
-                        # Stake might already be unlocked or amount mismatch
-                        logger.warning(f"Could not unlock stake for submitter {market.submitter_id}")
-            
-            # Update losers (unlock their locked balance, record loss)
-            for user_id in losers:
-                if user_id in payouts:
-                    continue  # Already processed
-                
-                user_response = supabase.table('users').select('*').eq('id', user_id).execute()
-                if not user_response.data:
-                    continue
-                
-                user = User.from_dict(user_response.data[0])
-                user_positions = [p for p in positions if p.user_id == user_id]
-                total_locked = sum(p.collateral for p in user_positions)
-                total_cost = sum(p.cost_basis for p in user_positions)
-                
-                # Unlock locked CC
-                try:
-                    user.unlock_balance(total_locked)
-                except ValueError:
-                    logger.warning(f"Could not unlock balance for user {user_id}")
-                
-                # Record loss
-                user.deduct_loss(total_cost)
-                
-                user_updates[user_id] = {
-                    'available_balance': user.available_balance,
-                    'locked_balance': user.locked_balance,
-                    'total_lost': user.total_lost
-                }
-            
-            # Apply all user updates
-            for user_id, update_data in user_updates.items():
-                supabase.table('users').update(update_data).eq('id', user_id).execute()
-            
-            # 7. Close all positions
-            for position in positions:
-                supabase.table('positions').update({
-                    'status': 'closed'
-                }).eq('id', position.id).execute()
-            
-            # 8. Update market
-            resolved_status = 'resolved_true' if outcome == 'true' else 'resolved_false'
-            supabase.table('markets').update({
-                'status': resolved_status,
-                'resolved_at': datetime.utcnow().isoformat()
-            }).eq('id', market_id).execute()
-            
-            # Calculate total paid
-            total_paid = sum(payouts.values())
-            
-            return {
-                'payouts': payouts,
-                'winners': list(set(winners)),
-                'losers': list(set(losers)),
-                'total_paid': total_paid
-            }
-            
+            return SettlementService().settle(market_id, outcome, progress=progress, dry_run=dry_run)
         except Exception as e:
             logger.error(f"Error settling market {market_id}: {str(e)}")
             raise
 
     # Oracle-related methods
-    def _compute_oracle_reputation(self, oracle_id: str) -> float:
-        """Compute oracle reputation as correct_reports / total_reports (default 0.6)"""
-        supabase = get_supabase_client()
-        # Only consider resolved reports (status correct/incorrect) for reputation
-        resp = supabase.table('oracle_reports').select('verdict', 'status').eq('oracle_id', oracle_id).in_('status', ['correct', 'incorrect']).execute()
-        if not resp.data:
-            return 0.6
-
-        total = len(resp.data)
-        correct = 0
-        for r in resp.data:
-            if r.get('status') == 'correct':
-                correct += 1
-
-        return float(correct) / float(total) if total > 0 else 0.6
-
     def submit_oracle_report(self, oracle_id: str, market_id: str, verdict: str, evidence, stake: float, ip_hash: str = None):
         """Submit an oracle report in privacy-preserving mode.
 
@@ -285,7 +186,7 @@ class OracleService:
         supabase = get_supabase_client()
 
         # Validate market
-        market_resp = supabase.table('markets').select('*').eq('id', market_id).execute()
+        market_resp = supabase.table('markets').select(Market.select_columns('trading')).eq('id', market_id).execute()
         if not market_resp.data:
             raise ValueError('Market not found')
 
@@ -349,39 +250,49 @@ class OracleService:
         consensus = self.check_consensus(market_id)
         triggered = False
         if consensus in ['true', 'false']:
-            # Trigger market settlement
+            # Settlement and oracle payouts run in the background settlement queue
             try:
-                self.settle_market(market_id, consensus)
-                # After settlement, apply oracle payouts and update reputations
-                self._apply_oracle_payouts(market_id, consensus)
+                get_settlement_queue().enqueue(market_id, consensus)
                 triggered = True
             except Exception as e:
-                logger.error(f"Error auto-settling market {market_id}: {e}")
+                logger.error(f"Error enqueueing settlement for market {market_id}: {e}")
 
         return report, triggered
 
     def check_consensus(self, market_id: str):
         """Check oracle consensus for a market.
 
+        Reads the running market_consensus tally maintained as reports are
+        inserted (see database/market_consensus.sql), so the decision is
+        constant-time regardless of how many reports the market has.
+
         Returns 'true', 'false', or None (inconclusive).
         """
+        return self.consensus_from_tally(self.get_consensus_tally(market_id))
+
+    @staticmethod
+    def get_consensus_tally(market_id: str):
+        """Running tally row (reports, weighted_true, weighted_false) or None"""
+        supabase = get_supabase_client()
+        resp = supabase.table('market_consensus').select(
+            'market_id, reports, weighted_true, weighted_false, reconciled_at, updated_at'
+        ).eq('market_id', market_id).execute()
+        return resp.data[0] if resp.data else None
+
+    @staticmethod
+    def reconcile_consensus(market_id: str):
+        """Recompute a market's tally from oracle_reports with current reputations"""
         supabase = get_supabase_client()
-        resp = supabase.table('oracle_reports').select('*').eq('market_id', market_id).execute()
-        reports = resp.data if resp.data else []
+        return supabase.rpc('reconcile_market_consensus', {'p_market_id': market_id}).execute().data
 
-        if len(reports) < 3:
+    @staticmethod
+    def consensus_from_tally(tally):
+        """Consensus decision: >= 3 reports and a 75% weighted majority"""
+        if not tally or tally.get('reports', 0) < 3:
             return None
 
-        weighted_true = 0.0
-        weighted_false = 0.0
-
-        for r in reports:
-            rep = self._compute_oracle_reputation(r.get('oracle_id'))
-            weight = float(r.get('stake', 0.0)) * rep
-            if r.get('verdict') == 'true':
-                weighted_true += weight
-            else:
-                weighted_false += weight
+        weighted_true = float(tally.get('weighted_true') or 0.0)
+        weighted_false = float(tally.get('weighted_false') or 0.0)
 
         total = weighted_true + weighted_false
         if total == 0:
@@ -395,79 +306,6 @@ class OracleService:
 
         return None
 
-    def _apply_oracle_payouts(self, market_id: str, consensus: str):
-        """Apply payouts to oracles based on consensus and update their reputations."""
-        supabase = get_supabase_client()
-        reports_resp = supabase.table('oracle_reports').select('*').eq('market_id', market_id).execute()
-        reports = reports_resp.data if reports_resp.data else []
-
-        for r in reports:
-            oracle_id = r.get('oracle_id')
-            stake = float(r.get('stake', 0.0))
-            verdict = r.get('verdict')
-
-            # Compute reputation to decide multiplier
-            rep = self._compute_oracle_reputation(oracle_id)
-            if rep > 0.8:
-                mult = 2.0
-            elif rep > 0.6:
-                mult = 1.5
-            else:
-                mult = 1.2
-
-            base_reward = 1.5
-            reward_multiplier = base_reward * mult
-
-            # Load oracle user
-            user_resp = supabase.table('users').select('*').eq('id', oracle_id).execute()
-            if not user_resp.data:
-                logger.warning(f"Oracle user {oracle_id} not found for payout")
-                continue
-
-            oracle = User.from_dict(user_resp.data[0])
-
-            if verdict == consensus:
-                # Pay out reward, unlock stake + reward
-                payout = stake * reward_multiplier
-                # unlock stake (remove from locked and add to available), then add payout
-                try:
-                    oracle.unlock_balance(stake)
-                except Exception:
-                    # If unlocking fails, adjust locked manually
-                    oracle.locked_balance = max(0.0, oracle.locked_balance - stake)
-                oracle.available_balance += payout
-                oracle.total_earned += payout
-                new_status = 'correct'
-            else:
-                # Oracle loses stake (locked decreases, available not increased)
-                # remove stake from locked and record loss
-                try:
-                    # Reduce locked without adding to available
-                    if oracle.locked_balance >= stake:
-                        oracle.locked_balance -= stake
-                    else:
-                        oracle.locked_balance = 0.0
-                except Exception:
-                    oracle.locked_balance = max(0.0, oracle.locked_balance - stake)
-
-                oracle.total_lost += stake
-                new_status = 'incorrect'
-
-            # Persist user update
-            supabase.table('users').update({
-                'available_balance': oracle.available_balance,
-                'locked_balance': oracle.locked_balance,
-                'total_earned': oracle.total_earned,
-                'total_lost': oracle.total_lost
-            }).eq('id', oracle_id).execute()
-
-            # Update report status
-            supabase.table('oracle_reports').update({
-                'status': new_status
-            }).eq('id', r.get('id')).execute()
-
-
-
     # SYBIL PROTECTION METHODS
     def _validate_no_duplicate_vote(self, supabase, oracle_id: str, market_id: str):
         """Prevent same oracle from voting twice on same market"""
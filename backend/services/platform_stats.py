@@ -0,0 +1,131 @@
+"""Cached platform aggregates backed by the platform_stats view"""
+
+import logging
+import threading
+import time
+from config import Config
+from utils.supabase_client import get_supabase_client, get_supabase_read_client
+
+logger = logging.getLogger(__name__)
+
+STAT_FIELDS = ('total_users', 'total_markets', 'active_markets', 'total_cc_locked', 'total_cc_in_pools')
+
+class PlatformStats:
+    """Reads the trigger-maintained aggregates with a short in-process cache
+
+    The counters are kept current by triggers on users and markets (see
+    database/platform_stats.sql), which append delta rows that the view
+    sums. A background thread (start()) compacts those deltas every
+    compact_seconds, so a refresh stays a small query no matter how many
+    users there are or how rarely /stats is read. Concurrent callers share
+    one refresh.
+    """
+
+    def __init__(self, ttl_seconds: float = None, compact_seconds: float = None):
+        self.ttl_seconds = Config.PLATFORM_STATS_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.compact_seconds = (
+            Config.PLATFORM_STATS_COMPACT_SECONDS if compact_seconds is None else compact_seconds
+        )
+        self._compactor = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._value = None
+        self._expires_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(row: dict) -> dict:
+        stats = {field: row.get(field) or 0 for field in STAT_FIELDS}
+        for field in ('total_users', 'total_markets', 'active_markets'):
+            stats[field] = int(stats[field])
+        for field in ('total_cc_locked', 'total_cc_in_pools'):
+            stats[field] = round(float(stats[field]), 2)
+        return stats
+
+    def _cached(self):
+        with self._lock:
+            if self._value is not None and self._expires_at > time.monotonic():
+                self.hits += 1
+                return dict(self._value)
+        return None
+
+    def get(self) -> dict:
+        """Current aggregates (at most ttl_seconds old)"""
+        cached = self._cached()
+        if cached is not None:
+            return cached
+
+        with self._refresh_lock:
+            # Another thread may have refreshed while we waited
+            cached = self._cached()
+            if cached is not None:
+                return cached
+
+            supabase = get_supabase_read_client()
+            response = supabase.table('platform_stats').select(', '.join(STAT_FIELDS)).execute()
+            value = self._normalize(response.data[0] if response.data else {})
+
+            with self._lock:
+                self.misses += 1
+                self._value = value
+                self._expires_at = time.monotonic() + self.ttl_seconds
+            return dict(value)
+
+    def invalidate(self):
+        """Force the next get() to read the database"""
+        with self._lock:
+            self._expires_at = 0.0
+
+    def start(self):
+        """Start the background compaction thread (idempotent; no-op if compact_seconds is 0)"""
+        with self._lock:
+            if self._compactor is not None or not self.compact_seconds:
+                return
+            self._compactor = threading.Thread(target=self._compact_loop, name='platform-stats-compactor', daemon=True)
+            self._compactor.start()
+
+    def _compact_loop(self):
+        while True:
+            time.sleep(self.compact_seconds)
+            try:
+                self.compact()
+            except Exception as e:
+                logger.warning(f"Platform stats compaction failed: {str(e)}")
+
+    @staticmethod
+    def compact() -> int:
+        """Fold the accumulated delta rows into one; returns how many were folded"""
+        supabase = get_supabase_client()
+        return supabase.rpc('compact_platform_stats', {}).execute().data or 0
+
+    def rebuild(self) -> dict:
+        """Recompute the counters from users and markets"""
+        supabase = get_supabase_client()
+        rows = supabase.rpc('rebuild_platform_stats', {}).execute().data
+        self.invalidate()
+        return self._normalize(rows[0] if rows else {})
+
+    def stats(self) -> dict:
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+_platform_stats = None
+_platform_stats_lock = threading.Lock()
+
+def get_platform_stats() -> PlatformStats:
+    """Get or create the process-wide platform stats cache"""
+    global _platform_stats
+
+    if _platform_stats is None:
+        with _platform_stats_lock:
+            if _platform_stats is None:
+                _platform_stats = PlatformStats()
+
+    return _platform_stats
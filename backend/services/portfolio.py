@@ -0,0 +1,180 @@
+"""Mark-to-market portfolio of a user's open positions"""
+
+import hashlib
+import json
+from typing import Dict, List, Tuple
+import numpy as np
+from config import Config
+from services.market_engine import get_market_engine
+from services.settlement_kernel import load_position_columns, pool_payouts, position_payouts
+from utils.supabase_client import get_supabase_read_client
+
+PORTFOLIO_POSITION_COLUMNS = 'id, user_id, market_id, type, shares, entry_price, cost_basis, collateral, updated_at'
+PORTFOLIO_MARKET_COLUMNS = 'id, text, category, price, status, total_bet_true, total_bet_false'
+
+def load_portfolio(user_id: str, policy: str = None) -> Tuple[List[Dict], Dict[str, Dict]]:
+    """
+    Open positions of a user and the markets they are in
+
+    Prices and pools come from the market engine when it owns the market,
+    so they are not behind its write-behind flush. Under the 'pool' payout
+    policy the markets also get their open true_shares / false_shares
+    (one more query).
+
+    Args:
+        user_id: User whose positions to load
+        policy: Payout policy (defaults to SETTLEMENT_PAYOUT_POLICY)
+
+    Returns:
+        Tuple of (position rows, dict of market_id -> market row)
+    """
+    policy = policy or Config.SETTLEMENT_PAYOUT_POLICY
+    supabase = get_supabase_read_client()
+    positions = supabase.table('positions').select(PORTFOLIO_POSITION_COLUMNS).eq(
+        'user_id', user_id
+    ).eq('status', 'open').order('id').execute().data or []
+
+    market_ids = list(dict.fromkeys(position['market_id'] for position in positions))
+    markets = {}
+    if market_ids:
+        response = supabase.table('markets').select(PORTFOLIO_MARKET_COLUMNS).in_('id', market_ids).execute()
+        markets = {row['id']: row for row in response.data or []}
+
+    if Config.MARKET_ENGINE_ENABLED:
+        engine = get_market_engine()
+        for market_id, row in markets.items():
+            live = engine.get_market(market_id)
+            if live is not None:
+                row['price'] = live.price
+                row['total_bet_true'] = live.total_bet_true
+                row['total_bet_false'] = live.total_bet_false
+
+    if policy == 'pool' and markets:
+        totals = supabase.rpc('market_share_totals', {'p_market_ids': list(markets)}).execute().data or []
+        for total in totals:
+            markets[total['market_id']].update(
+                true_shares=total['true_shares'], false_shares=total['false_shares']
+            )
+
+    return positions, markets
+
+def portfolio_etag(positions: List[Dict], markets: Dict[str, Dict]) -> str:
+    """Fingerprint of everything the portfolio is computed from"""
+    payload = json.dumps({
+        'positions': [
+            [p['id'], p['shares'], p['entry_price'], p['cost_basis'], p['collateral'], p.get('updated_at')]
+            for p in positions
+        ],
+        'markets': [[market_id] + [markets[market_id].get(field) for field in (
+            'price', 'status', 'total_bet_true', 'total_bet_false', 'true_shares', 'false_shares'
+        )] for market_id in sorted(markets)]
+    }, separators=(',', ':'), default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def compute_portfolio(positions: List[Dict], markets: Dict[str, Dict], policy: str = None) -> Dict:
+    """
+    Unrealized PnL, resolution payouts and exposure for all positions at once
+
+    Per position, at the market's current price p:
+        unrealized_pnl = (p - entry_price) * shares for longs,
+                         (entry_price - p) * shares for shorts
+        payout_if_true / payout_if_false under the payout policy settlement
+        applies (settlement_kernel.PAYOUT_POLICIES): per position as in
+        Position.calculate_payout_if_*, or a share of the current pool
+    Per market, exposure is the worst-case loss at resolution:
+        max(0, cost_basis - min(payout_if_true, payout_if_false))
+
+    Args:
+        positions: Position rows from load_portfolio
+        markets: Market rows from load_portfolio (loaded with the same policy)
+        policy: Payout policy (defaults to SETTLEMENT_PAYOUT_POLICY)
+
+    Returns:
+        Dict with 'payout_policy', 'positions', 'markets' (per-market
+        totals) and 'totals'
+    """
+    policy = policy or Config.SETTLEMENT_PAYOUT_POLICY
+    if not positions:
+        return {
+            'payout_policy': policy,
+            'positions': [],
+            'markets': [],
+            'totals': {'cost_basis': 0.0, 'unrealized_pnl': 0.0, 'exposure': 0.0}
+        }
+
+    columns = load_position_columns(positions)
+    market_index = {}
+    position_market = np.fromiter(
+        (market_index.setdefault(p['market_id'], len(market_index)) for p in positions),
+        dtype=np.int64, count=len(positions)
+    )
+    market_ids = list(market_index)
+    prices = np.array([float((markets.get(market_id) or {}).get('price') or 0.5) for market_id in market_ids])
+
+    current_price = prices[position_market]
+    direction = np.where(columns['is_true'], 1.0, -1.0)
+    unrealized = direction * (current_price - columns['entry_price']) * columns['shares']
+    if policy == 'pool':
+        def market_column(field):
+            values = np.array([float((markets.get(market_id) or {}).get(field) or 0.0) for market_id in market_ids])
+            return values[position_market]
+
+        pool = market_column('total_bet_true') + market_column('total_bet_false')
+        payout_true = pool_payouts(columns, 'true', pool=pool, winning_shares=market_column('true_shares'))
+        payout_false = pool_payouts(columns, 'false', pool=pool, winning_shares=market_column('false_shares'))
+    else:
+        payout_true = position_payouts(columns, 'true')
+        payout_false = position_payouts(columns, 'false')
+
+    def per_market(values):
+        return np.bincount(position_market, weights=values, minlength=len(market_ids))
+
+    market_cost = per_market(columns['cost_basis'])
+    market_pnl = per_market(unrealized)
+    market_true = per_market(payout_true)
+    market_false = per_market(payout_false)
+    market_exposure = np.maximum(0.0, market_cost - np.minimum(market_true, market_false))
+    market_positions = np.bincount(position_market, minlength=len(market_ids))
+
+    position_rows = [{
+        'id': p['id'],
+        'market_id': p['market_id'],
+        'type': p['type'],
+        'shares': float(p['shares'] or 0.0),
+        'entry_price': float(p['entry_price'] or 0.0),
+        'cost_basis': float(p['cost_basis'] or 0.0),
+        'current_price': price,
+        'unrealized_pnl': round(pnl, 2),
+        'payout_if_true': round(if_true, 2),
+        'payout_if_false': round(if_false, 2)
+    } for p, price, pnl, if_true, if_false in zip(
+        positions, current_price.tolist(), unrealized.tolist(), payout_true.tolist(), payout_false.tolist()
+    )]
+
+    market_rows = []
+    for i, market_id in enumerate(market_ids):
+        market = markets.get(market_id) or {}
+        market_rows.append({
+            'market_id': market_id,
+            'text': market.get('text'),
+            'category': market.get('category'),
+            'status': market.get('status'),
+            'price': float(prices[i]),
+            'positions': int(market_positions[i]),
+            'cost_basis': round(float(market_cost[i]), 2),
+            'unrealized_pnl': round(float(market_pnl[i]), 2),
+            'payout_if_true': round(float(market_true[i]), 2),
+            'payout_if_false': round(float(market_false[i]), 2),
+            'exposure': round(float(market_exposure[i]), 2)
+        })
+
+    return {
+        'payout_policy': policy,
+        'positions': position_rows,
+        'markets': market_rows,
+        'totals': {
+            'cost_basis': round(float(market_cost.sum()), 2),
+            'unrealized_pnl': round(float(market_pnl.sum()), 2),
+            'exposure': round(float(market_exposure.sum()), 2)
+        }
+    }
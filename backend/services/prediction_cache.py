@@ -0,0 +1,151 @@
+"""TTL + version-keyed cache for oracle AI predictions"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from config import Config
+from services.embedding_cache import normalize_text
+
+class PredictionCache:
+    """Caches predictions per (market_id, market state version, normalized query)
+
+    The version is derived from the market fields the prediction depends on,
+    so a bet or settlement on any worker produces a new key. Local writes
+    also call invalidate() to free stale entries early; a market_id -> keys
+    index keeps that proportional to the market's own entries. Concurrent
+    misses for the same key share a single model call.
+    """
+
+    # Market fields that change the prediction input
+    VERSION_FIELDS = ('status', 'price', 'total_bet_true', 'total_bet_false', 'updated_at')
+
+    def __init__(self, ttl_seconds: float = None, max_entries: int = None):
+        self.ttl_seconds = Config.PREDICTION_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.max_entries = max_entries or Config.PREDICTION_CACHE_SIZE
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._by_market = {}
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.coalesced = 0
+
+    @classmethod
+    def market_version(cls, market) -> str:
+        """Short digest of the market state that feeds the prediction"""
+        state = '|'.join(str(getattr(market, field, None)) for field in cls.VERSION_FIELDS)
+        return hashlib.sha1(state.encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def make_key(market_id, version: str, user_query=None) -> tuple:
+        return (str(market_id), version, normalize_text(user_query) if user_query else '')
+
+    def _remove(self, key):
+        """Drop an entry and its index reference (caller holds _lock)"""
+        del self._entries[key]
+        keys = self._by_market.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_market[key[0]]
+
+    def _get_live(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def get_or_compute(self, key: tuple, compute):
+        """
+        Return the cached value for key, or run compute() once and cache it
+
+        Args:
+            key: Key from make_key
+            compute: Callable returning (value, error); errors are not cached
+
+        Returns:
+            Tuple of (value, error)
+        """
+        with self._lock:
+            value = self._get_live(key)
+            if value is not None:
+                self.hits += 1
+                return value, None
+
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                owner = False
+            else:
+                self.misses += 1
+                future = Future()
+                self._inflight[key] = future
+                owner = True
+
+        if not owner:
+            return future.result()
+
+        try:
+            value, error = compute()
+        except Exception as e:
+            value, error = None, str(e)
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            if error is None and value is not None:
+                self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+                self._entries.move_to_end(key)
+                self._by_market.setdefault(key[0], set()).add(key)
+                while len(self._entries) > self.max_entries:
+                    self._remove(next(iter(self._entries)))
+
+        future.set_result((value, error))
+        return value, error
+
+    def invalidate(self, market_id):
+        """Drop every cached prediction for a market"""
+        market_id = str(market_id)
+        with self._lock:
+            stale = self._by_market.pop(market_id, ())
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def stats(self) -> dict:
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'size': len(self._entries),
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'hit_rate': round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0
+            }
+
+_prediction_cache = None
+_prediction_cache_lock = threading.Lock()
+
+def get_prediction_cache() -> PredictionCache:
+    """Get or create the process-wide prediction cache"""
+    global _prediction_cache
+
+    if _prediction_cache is None:
+        with _prediction_cache_lock:
+            if _prediction_cache is None:
+                _prediction_cache = PredictionCache()
+
+    return _prediction_cache
@@ -0,0 +1,18 @@
+"""Oracle reputation counters (database/oracle_reputation.sql)"""
+
+from utils.supabase_client import get_supabase_client
+
+class ReputationStore:
+    """Maintenance for the per-oracle correct/total counters
+
+    The counters are kept by a trigger on oracle_reports and read in SQL
+    (consensus weights and oracle payouts), so the app never reads them
+    itself; it only needs to rebuild them after a restore or drift.
+    """
+
+    @staticmethod
+    def rebuild() -> int:
+        """Recompute every counter from oracle_reports; returns the number of oracles"""
+        supabase = get_supabase_client()
+        oracles = supabase.rpc('rebuild_oracle_reputation', {}).execute().data
+        return oracles or 0
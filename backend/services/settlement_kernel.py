@@ -0,0 +1,113 @@
+"""Columnar settlement kernel: per-user payouts from position arrays"""
+
+from typing import Dict, List
+import numpy as np
+
+def load_position_columns(positions: List[Dict]) -> Dict[str, np.ndarray]:
+    """
+    Convert position rows into column arrays
+
+    Users are factorized in first-seen order with a dict, so the conversion
+    stays linear in the number of positions.
+
+    Args:
+        positions: Rows with user_id, type, shares, entry_price, collateral, cost_basis
+
+    Returns:
+        Dict with 'user_ids' (one entry per distinct user) and per-position
+        arrays 'user_index', 'is_true', 'shares', 'entry_price', 'collateral',
+        'cost_basis'
+    """
+    count = len(positions)
+    index = {}
+    user_index = np.fromiter(
+        (index.setdefault(p['user_id'], len(index)) for p in positions), dtype=np.int64, count=count
+    )
+
+    def column(name):
+        return np.fromiter((p[name] or 0.0 for p in positions), dtype=np.float64, count=count)
+
+    user_ids = np.empty(len(index), dtype=object)
+    user_ids[:] = list(index)
+    return {
+        'user_ids': user_ids,
+        'user_index': user_index,
+        'is_true': np.fromiter((p['type'] == 'true' for p in positions), dtype=bool, count=count),
+        'shares': column('shares'),
+        'entry_price': column('entry_price'),
+        'collateral': column('collateral'),
+        'cost_basis': column('cost_basis'),
+    }
+
+def position_payouts(columns: Dict[str, np.ndarray], outcome: str, pool: float = 0.0) -> np.ndarray:
+    """
+    Per-position payout at resolution (Position.calculate_payout_if_true/false)
+
+    Winning longs receive shares / entry_price, winning shorts
+    shares / (1 - entry_price); losing positions receive 0. The pool is not
+    used by this policy.
+    """
+    shares = columns['shares']
+    entry_price = columns['entry_price']
+    payouts = np.zeros_like(shares)
+
+    if outcome == 'true':
+        winners = columns['is_true'] & (entry_price > 0)
+        np.divide(shares, entry_price, out=payouts, where=winners)
+    else:
+        winners = ~columns['is_true'] & (entry_price < 1.0)
+        np.divide(shares, 1.0 - entry_price, out=payouts, where=winners)
+    return payouts
+
+def pool_payouts(columns: Dict[str, np.ndarray], outcome: str, pool=0.0,
+                 winning_shares=None) -> np.ndarray:
+    """
+    Pool-proportional payout at resolution
+
+    The whole pool (total_bet_true + total_bet_false) is split between the
+    winning positions in proportion to their shares; losing positions
+    receive 0. When columns hold only part of a market (or several
+    markets), pass pool and winning_shares per position with the
+    market-wide values; by default columns are the whole market.
+    """
+    winners = columns['is_true'] if outcome == 'true' else ~columns['is_true']
+    shares = np.where(winners, columns['shares'], 0.0)
+    if winning_shares is None:
+        winning_shares = shares.sum()
+    winning_shares = np.asarray(winning_shares, dtype=np.float64)
+    return np.divide(shares * pool, winning_shares, out=np.zeros_like(shares),
+                     where=winners & (winning_shares > 0))
+
+PAYOUT_POLICIES = {
+    'position': position_payouts,
+    'pool': pool_payouts,
+}
+
+def settle_positions(columns: Dict[str, np.ndarray], outcome: str, policy: str = 'position',
+                     pool: float = 0.0) -> Dict[str, np.ndarray]:
+    """
+    Grouped per-user settlement totals
+
+    Args:
+        columns: Output of load_position_columns
+        outcome: 'true' or 'false'
+        policy: Name of a payout policy in PAYOUT_POLICIES
+        pool: Market pool size, used by the 'pool' policy
+
+    Returns:
+        Dict of arrays aligned with columns['user_ids']: 'payout' (sum of
+        winning payouts), 'unlock' (collateral to release), 'cost' (cost
+        basis of all positions)
+    """
+    if outcome not in ('true', 'false'):
+        raise ValueError("Outcome must be 'true' or 'false'")
+    if policy not in PAYOUT_POLICIES:
+        raise ValueError(f"Unknown payout policy: {policy}")
+
+    users = len(columns['user_ids'])
+    user_index = columns['user_index']
+    return {
+        'payout': np.bincount(user_index, weights=PAYOUT_POLICIES[policy](columns, outcome, pool), minlength=users),
+        'unlock': np.bincount(user_index, weights=columns['collateral'], minlength=users),
+        'cost': np.bincount(user_index, weights=columns['cost_basis'], minlength=users),
+    }
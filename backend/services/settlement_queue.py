@@ -0,0 +1,266 @@
+"""Background settlement of markets that reached oracle consensus"""
+
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from config import Config
+from utils.supabase_client import get_supabase_client
+
+logger = logging.getLogger(__name__)
+
+class SettlementQueue:
+    """Worker pool that settles markets from the durable settlement_jobs table
+
+    enqueue() closes the market to trading and inserts one job per market
+    (a second enqueue for the same market is a no-op), then hands it to a
+    worker. A worker claims the job by flipping queued -> running and
+    settles the market, oracle payouts included, recording progress on the
+    job row. Settlement is resumable,
+    so a failed attempt is retried with exponential backoff and jobs left
+    queued/running by a crashed process are picked up again by recover().
+    A job that exhausts its attempts is marked failed; enqueue() for the
+    same market and recover() both give it a fresh attempt budget.
+    """
+
+    def __init__(self, oracle_service=None, workers: int = None, max_attempts: int = None,
+                 backoff_seconds: float = None):
+        self._oracle_service = oracle_service
+        self.workers = workers or Config.SETTLEMENT_WORKERS
+        self.max_attempts = max_attempts or Config.SETTLEMENT_MAX_ATTEMPTS
+        self.backoff_seconds = Config.SETTLEMENT_BACKOFF_SECONDS if backoff_seconds is None else backoff_seconds
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._started = False
+        self.settled = 0
+        self.failed = 0
+        self.retried = 0
+
+    @property
+    def oracle_service(self):
+        if self._oracle_service is None:
+            from services.oracle_service import OracleService
+            self._oracle_service = OracleService()
+        return self._oracle_service
+
+    def start(self):
+        """Start worker threads (idempotent) and requeue unfinished jobs"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'settlement-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+        try:
+            self.recover()
+        except Exception as e:
+            logger.warning(f"Settlement recovery failed: {str(e)}")
+
+    def enqueue(self, market_id: str, outcome: str) -> bool:
+        """
+        Close the market to trading and create its settlement job
+
+        The enqueue_settlement rpc moves the market from active to settling,
+        records the outcome and creates the job in one transaction (see
+        database/settlement_jobs.sql), so nobody can trade or report on a
+        market whose consensus is already public.
+
+        Returns:
+            True if a job was queued, False if the market already has one
+        """
+        self.start()
+        supabase = get_supabase_client()
+        created = supabase.rpc('enqueue_settlement', {
+            'p_market_id': market_id,
+            'p_outcome': outcome
+        }).execute().data
+        if not created:
+            return False
+        self._queue.put((market_id, 0))
+        return True
+
+    def retry(self, market_id: str) -> bool:
+        """
+        Requeue a failed job with a fresh attempt budget
+
+        Returns:
+            True if the job was failed and is queued again
+        """
+        self.start()
+        if not self._revive(get_supabase_client(), [market_id]):
+            return False
+        self._queue.put((market_id, 0))
+        return True
+
+    @staticmethod
+    def _revive(supabase, market_ids) -> list:
+        """Move failed jobs back to queued with a fresh attempt budget
+
+        A job that ran out of attempts leaves its market in 'settling' (no
+        trading, nothing paid), so it must stay retryable. Settlement
+        resumes, so a retry never pays anyone twice.
+        """
+        if not market_ids:
+            return []
+        response = supabase.table('settlement_jobs').update({
+            'status': 'queued',
+            'attempts': 0,
+            'error': None,
+            'finished_at': None
+        }).in_('market_id', list(market_ids)).eq('status', 'failed').execute()
+        return [row['market_id'] for row in response.data or []]
+
+    def recover(self):
+        """Requeue jobs still queued, stuck running after a crash, or failed
+        while their market is still waiting to be settled"""
+        supabase = get_supabase_client()
+        cutoff = (datetime.now(timezone.utc) - timedelta(minutes=Config.SETTLEMENT_STALE_MINUTES)).isoformat()
+
+        failed = supabase.table('settlement_jobs').select('market_id').eq('status', 'failed').execute()
+        failed_ids = [row['market_id'] for row in failed.data or []]
+        if failed_ids:
+            unsettled = supabase.table('markets').select('id').in_('id', failed_ids).in_(
+                'status', ['active', 'settling']
+            ).execute()
+            revived = self._revive(supabase, [row['id'] for row in unsettled.data or []])
+            if revived:
+                logger.info(f"Retrying {len(revived)} failed settlement jobs")
+
+        queued = supabase.table('settlement_jobs').select('market_id, attempts').eq('status', 'queued').execute()
+        stuck = supabase.table('settlement_jobs').select('market_id, attempts').eq(
+            'status', 'running'
+        ).lt('updated_at', cutoff).execute()
+
+        for row in stuck.data or []:
+            supabase.table('settlement_jobs').update({
+                'status': 'queued'
+            }).eq('market_id', row['market_id']).eq('status', 'running').execute()
+
+        rows = (queued.data or []) + (stuck.data or [])
+        for row in rows:
+            self._queue.put((row['market_id'], row['attempts']))
+        if rows:
+            logger.info(f"Requeued {len(rows)} settlement jobs")
+
+    @staticmethod
+    def get_job(market_id: str):
+        """Current settlement job row for a market, or None"""
+        supabase = get_supabase_client()
+        response = supabase.table('settlement_jobs').select('*').eq('market_id', market_id).execute()
+        return response.data[0] if response.data else None
+
+    def _claim(self, supabase, market_id: str, attempt: int):
+        """Atomically move a job from queued to running"""
+        response = supabase.table('settlement_jobs').update({
+            'status': 'running',
+            'attempts': attempt + 1,
+            'error': None
+        }).eq('market_id', market_id).eq('status', 'queued').execute()
+        return response.data[0] if response.data else None
+
+    @staticmethod
+    def _already_resolved(supabase, market_id: str, outcome: str) -> bool:
+        """True if a previous attempt settled the market but died before recording it"""
+        response = supabase.table('markets').select('status').eq('id', market_id).execute()
+        return bool(response.data) and response.data[0]['status'] == f'resolved_{outcome}'
+
+    def _run(self):
+        while True:
+            market_id, attempt = self._queue.get()
+            try:
+                self._process(market_id, attempt)
+            except Exception as e:
+                logger.error(f"Settlement worker error for market {market_id}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def _process(self, market_id: str, attempt: int):
+        supabase = get_supabase_client()
+        job = self._claim(supabase, market_id, attempt)
+        if job is None:
+            return
+
+        outcome = job['outcome']
+        last_write = [0.0]
+
+        def progress(stage, done, total):
+            # Throttle progress writes; they also keep the job from looking stale
+            now = time.monotonic()
+            if now - last_write[0] < 1.0 and done < total:
+                return
+            last_write[0] = now
+            supabase.table('settlement_jobs').update({
+                'progress': {'stage': stage, 'done': done, 'total': total}
+            }).eq('market_id', market_id).execute()
+
+        try:
+            if not job.get('settled_at') and not self._already_resolved(supabase, market_id, outcome):
+                result = self.oracle_service.settle_market(market_id, outcome, progress=progress)
+                supabase.table('settlement_jobs').update({
+                    'settled_at': datetime.now(timezone.utc).isoformat(),
+                    'result': {
+                        'total_paid': result['total_paid'],
+                        'winners': len(result['winners']),
+                        'losers': len(result['losers']),
+                        'positions_closed': result.get('positions_closed', 0),
+                        'oracle_reports': result.get('oracle_reports', 0),
+                        'oracle_paid': result.get('oracle_paid', 0)
+                    }
+                }).eq('market_id', market_id).execute()
+        except Exception as e:
+            error = str(e)
+            if attempt + 1 < self.max_attempts:
+                delay = self.backoff_seconds * (2 ** attempt)
+                supabase.table('settlement_jobs').update({
+                    'status': 'queued',
+                    'error': error
+                }).eq('market_id', market_id).execute()
+                self.retried += 1
+                logger.warning(f"Settlement of market {market_id} failed, retrying in {delay}s: {error}")
+                timer = threading.Timer(delay, self._queue.put, args=((market_id, attempt + 1),))
+                timer.daemon = True
+                timer.start()
+            else:
+                supabase.table('settlement_jobs').update({
+                    'status': 'failed',
+                    'error': error,
+                    'finished_at': datetime.now(timezone.utc).isoformat()
+                }).eq('market_id', market_id).execute()
+                self.failed += 1
+                logger.error(f"Settlement of market {market_id} failed after {attempt + 1} attempts: {error}")
+            return
+
+        supabase.table('settlement_jobs').update({
+            'status': 'done',
+            'finished_at': datetime.now(timezone.utc).isoformat()
+        }).eq('market_id', market_id).execute()
+        self.settled += 1
+
+    def stats(self) -> dict:
+        """Queue depth and outcome counters"""
+        return {
+            'queued': self._queue.qsize(),
+            'workers': len(self._threads),
+            'settled': self.settled,
+            'failed': self.failed,
+            'retried': self.retried
+        }
+
+_settlement_queue = None
+_settlement_queue_lock = threading.Lock()
+
+def get_settlement_queue() -> SettlementQueue:
+    """Get or create the process-wide settlement queue"""
+    global _settlement_queue
+
+    if _settlement_queue is None:
+        with _settlement_queue_lock:
+            if _settlement_queue is None:
+                _settlement_queue = SettlementQueue()
+
+    return _settlement_queue
@@ -0,0 +1,240 @@
+"""Set-based market settlement (see database/bulk_settlement.sql)"""
+
+import logging
+from typing import Callable, Dict, List
+from config import Config
+from models.market import Market
+from services.market_engine import get_market_engine, release_market
+from services.prediction_cache import get_prediction_cache
+from services.settlement_kernel import PAYOUT_POLICIES, load_position_columns, settle_positions
+from services.vector_index import get_market_index
+from utils.supabase_client import get_supabase_client
+
+logger = logging.getLogger(__name__)
+
+POSITION_COLUMNS = 'id, user_id, type, shares, entry_price, cost_basis, collateral'
+
+class SettlementService:
+    """Settles a market with a constant number of round-trips per batch
+
+    The market is first claimed (active -> settling), which stops new trades
+    and records the outcome. Open positions are read in keyset pages, reduced
+    to one balance delta per user by the configured payout policy (see
+    settlement_kernel.PAYOUT_POLICIES), and applied in batches by
+    apply_settlement_batch; finish_settlement then closes the positions, sets
+    the final status and pays the oracles in one transaction. Every step is
+    idempotent, so calling settle() again on a market left in 'settling'
+    resumes where the last run stopped. With dry_run=True the same payouts
+    are computed without claiming the market or writing anything.
+    """
+
+    def __init__(self, batch_size: int = None, page_size: int = None, policy: str = None):
+        self.batch_size = batch_size or Config.SETTLEMENT_BATCH_SIZE
+        self.page_size = page_size or Config.SETTLEMENT_PAGE_SIZE
+        self.policy = policy or Config.SETTLEMENT_PAYOUT_POLICY
+        if self.policy not in PAYOUT_POLICIES:
+            raise ValueError(f"Unknown payout policy: {self.policy}")
+
+    def _claim(self, supabase, market_id: str, outcome: str) -> Market:
+        """Move the market to 'settling', or pick up one already claimed (by
+        enqueue_settlement or an interrupted run) with the same outcome"""
+        columns = Market.select_columns('trading') + ', resolution'
+        claimed = supabase.table('markets').update({
+            'status': 'settling',
+            'resolution': outcome
+        }).eq('id', market_id).eq('status', 'active').execute()
+        if claimed.data:
+            return Market.from_dict(claimed.data[0])
+
+        response = supabase.table('markets').select(columns).eq('id', market_id).execute()
+        if not response.data:
+            raise ValueError(f"Market {market_id} not found")
+
+        market = Market.from_dict(response.data[0])
+        if market.status != 'settling':
+            raise ValueError(f"Market {market_id} is not active (status: {market.status})")
+        if market.resolution != outcome:
+            raise ValueError(
+                f"Market {market_id} is already settling with outcome {market.resolution}"
+            )
+        logger.info(f"Settling market {market_id}, already claimed with outcome {outcome}")
+        return market
+
+    @staticmethod
+    def _preview_market(supabase, market_id: str, outcome: str) -> Market:
+        """Read the market for a dry run, with live pool totals if the engine owns it"""
+        columns = Market.select_columns('trading') + ', resolution'
+        response = supabase.table('markets').select(columns).eq('id', market_id).execute()
+        if not response.data:
+            raise ValueError(f"Market {market_id} not found")
+
+        market = Market.from_dict(response.data[0])
+        if market.status == 'settling' and market.resolution != outcome:
+            raise ValueError(
+                f"Market {market_id} is already settling with outcome {market.resolution}"
+            )
+        if market.status not in ('active', 'settling'):
+            raise ValueError(f"Market {market_id} is not active (status: {market.status})")
+
+        if Config.MARKET_ENGINE_ENABLED:
+            live = get_market_engine().get_market(market_id)
+            if live is not None:
+                market.total_bet_true = live.total_bet_true
+                market.total_bet_false = live.total_bet_false
+        return market
+
+    def _load_positions(self, supabase, market_id: str) -> List[Dict]:
+        """All open positions of the market, paged by id"""
+        positions = []
+        last_id = None
+        while True:
+            query = supabase.table('positions').select(POSITION_COLUMNS).eq(
+                'market_id', market_id
+            ).eq('status', 'open')
+            if last_id is not None:
+                query = query.gt('id', last_id)
+            page = query.order('id').limit(self.page_size).execute().data or []
+            positions.extend(page)
+            if len(page) < self.page_size:
+                return positions
+            last_id = page[-1]['id']
+
+    @staticmethod
+    def compute_user_deltas(market: Market, positions: List[Dict], outcome: str,
+                            policy: str = 'position') -> Dict:
+        """
+        Reduce positions to one balance delta per user
+
+        Winners get their payouts (as computed by the payout policy) credited
+        and counted as earned; users with no winning position have the cost
+        of their positions counted as lost. Everyone's collateral in this
+        market is unlocked. The submitter gets 2x stake when the outcome is
+        true, or the stake unlocked otherwise.
+
+        Returns:
+            Dict of user_id -> {'unlock', 'credit', 'earned', 'lost'}
+        """
+        columns = load_position_columns(positions)
+        pool = market.total_bet_true + market.total_bet_false
+        totals = settle_positions(columns, outcome, policy=policy, pool=pool)
+
+        deltas = {}
+        for user_id, payout, unlock, cost in zip(
+            columns['user_ids'], totals['payout'].tolist(), totals['unlock'].tolist(), totals['cost'].tolist()
+        ):
+            deltas[user_id] = {
+                'unlock': unlock,
+                'credit': payout,
+                'earned': payout,
+                'lost': 0.0 if payout > 0 else cost
+            }
+
+        if market.submitter_id and outcome == 'true' and market.stake * 2 > 0:
+            delta = deltas.setdefault(market.submitter_id, {
+                'unlock': 0.0, 'credit': 0.0, 'earned': 0.0, 'lost': 0.0
+            })
+            delta['credit'] += market.stake * 2
+            delta['earned'] += market.stake * 2
+            delta['lost'] = 0.0
+
+        winners = {user_id for user_id, delta in deltas.items() if delta['credit'] > 0}
+        if market.submitter_id and outcome == 'false' and market.submitter_id not in winners:
+            delta = deltas.setdefault(market.submitter_id, {
+                'unlock': 0.0, 'credit': 0.0, 'earned': 0.0, 'lost': 0.0
+            })
+            delta['unlock'] += market.stake
+
+        return deltas
+
+    def settle(self, market_id: str, outcome: str, progress: Callable = None,
+               dry_run: bool = False) -> Dict:
+        """
+        Settle a market (or resume an interrupted settlement)
+
+        Args:
+            market_id: Market ID to settle
+            outcome: 'true' or 'false'
+            progress: Optional callback(stage, done, total) for progress reporting
+            dry_run: Compute and return the payouts without writing anything
+
+        Returns:
+            Dictionary with payouts, winners, losers, total_paid,
+            submitter_payout, positions_closed, oracle_reports and oracle_paid
+            (oracle fields are omitted for a dry run)
+
+        Raises:
+            ValueError: If the market is missing, not active or settling
+                with a different outcome
+        """
+        if outcome not in ['true', 'false']:
+            raise ValueError("Outcome must be 'true' or 'false'")
+
+        def report(stage, done, total):
+            logger.info(f"Settlement {market_id}: {stage} {done}/{total}")
+            if progress:
+                progress(stage, done, total)
+
+        supabase = get_supabase_client()
+
+        if dry_run:
+            market = self._preview_market(supabase, market_id, outcome)
+            positions = self._load_positions(supabase, market_id)
+            deltas = self.compute_user_deltas(market, positions, outcome, self.policy)
+            result = self._summarize(market, positions, deltas, outcome)
+            result['positions_closed'] = len(positions)
+            return result
+
+        # Persist any write-behind pool state before reading totals
+        release_market(market_id)
+
+        market = self._claim(supabase, market_id, outcome)
+        positions = self._load_positions(supabase, market_id)
+        report('loaded', len(positions), len(positions))
+
+        deltas = self.compute_user_deltas(market, positions, outcome, self.policy)
+
+        # Sorted so batch numbers are stable across resumed runs
+        rows = [{'id': user_id, **delta} for user_id, delta in sorted(deltas.items())]
+        batches = [rows[i:i + self.batch_size] for i in range(0, len(rows), self.batch_size)]
+        for batch_no, batch in enumerate(batches):
+            supabase.rpc('apply_settlement_batch', {
+                'p_market_id': market_id,
+                'p_batch_no': batch_no,
+                'p_deltas': batch
+            }).execute()
+            report('users', min((batch_no + 1) * self.batch_size, len(rows)), len(rows))
+
+        # Closes positions, sets the final status and pays oracles in one transaction
+        resolved_status = 'resolved_true' if outcome == 'true' else 'resolved_false'
+        finished = supabase.rpc('finish_settlement', {
+            'p_market_id': market_id,
+            'p_status': resolved_status
+        }).execute().data or {}
+        closed = max(finished.get('positions_closed', 0), 0)
+        report('closed', closed, len(positions))
+
+        get_market_index().remove_market(market_id)
+        get_prediction_cache().invalidate(market_id)
+
+        result = self._summarize(market, positions, deltas, outcome)
+        result.update({
+            'positions_closed': closed,
+            'oracle_reports': finished.get('oracle_reports', 0),
+            'oracle_paid': float(finished.get('oracle_paid') or 0)
+        })
+        return result
+
+    def _summarize(self, market: Market, positions: List[Dict], deltas: Dict, outcome: str) -> Dict:
+        """Payout summary shared by real and dry-run settlements"""
+        payouts = {user_id: delta['credit'] for user_id, delta in deltas.items() if delta['credit'] > 0}
+        holders = {position['user_id'] for position in positions}
+        return {
+            'market_id': market.id,
+            'outcome': outcome,
+            'policy': self.policy,
+            'payouts': payouts,
+            'winners': list(payouts),
+            'losers': [user_id for user_id in holders if user_id not in payouts],
+            'total_paid': sum(payouts.values()),
+            'submitter_payout': market.stake * 2 if market.submitter_id and outcome == 'true' else 0.0
+        }
@@ -0,0 +1,800 @@
+"""In-process vector index for market embedding similarity"""
+
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+import numpy as np
+from config import Config
+from utils.supabase_client import get_supabase_client
+
+logger = logging.getLogger(__name__)
+
+def parse_embedding(value) -> np.ndarray:
+    """
+    Parse a stored embedding into a float32 vector
+
+    Args:
+        value: Embedding as a list or as the JSON string stored in markets.embedding
+
+    Returns:
+        1-D float32 array, or None if the value is empty or malformed
+    """
+    if value is None:
+        return None
+
+    try:
+        if isinstance(value, str):
+            value = json.loads(value)
+        vector = np.asarray(value, dtype=np.float32)
+    except (ValueError, TypeError):
+        return None
+
+    if vector.ndim != 1 or vector.size == 0:
+        return None
+    return vector
+
+def normalize(vector: np.ndarray) -> np.ndarray:
+    """Return the L2-normalized vector (zero vectors stay zero)"""
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        return vector
+    return vector / norm
+
+def _atomic_save_npy(path: str, array: np.ndarray):
+    """Write an .npy file via a temp file + rename so readers never see partial data"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, np.ascontiguousarray(array))
+    os.replace(tmp_path, path)
+
+@contextmanager
+def _snapshot_lock(prefix: str, exclusive: bool):
+    """
+    flock on <prefix>.lock: writers take it exclusively without waiting
+    (yielding False if another process is already writing), readers share it
+
+    Yields:
+        True if the lock is held
+    """
+    with open(f"{prefix}.lock", 'a+') as f:
+        try:
+            if exclusive:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                fcntl.flock(f, fcntl.LOCK_SH)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def _remove_stale_generations(prefix: str, generation: str):
+    """Delete array files of snapshot generations other than the current one"""
+    current = f"{prefix}.{generation}."
+    for path in glob.glob(f"{glob.escape(prefix)}.*.npy"):
+        if not path.startswith(current):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores, best first"""
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.shape[0]:
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(scores.shape[0])
+    return top[np.argsort(-scores[top])]
+
+class ExactVectorIndex:
+    """Exact cosine-similarity index over pre-normalized embeddings
+
+    Vectors live in one contiguous float32 matrix so a query is a single
+    matrix-vector product. Rows are appended with amortized doubling and
+    removed by swapping the last row into the hole, so add/remove are O(d).
+    """
+
+    name = 'exact'
+
+    def __init__(self, initial_capacity: int = 1024):
+        self._lock = threading.RLock()
+        self._initial_capacity = initial_capacity
+        self._matrix = None
+        self._writable = True
+        self._ids = []
+        self._texts = []
+        self._rows = {}
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, market_id):
+        return market_id in self._rows
+
+    @property
+    def dim(self):
+        return self._matrix.shape[1] if self._matrix is not None else None
+
+    def _ensure_capacity(self, dim: int):
+        """Allocate or grow the backing matrix to fit one more row"""
+        size = len(self._ids)
+        if self._matrix is None:
+            self._matrix = np.zeros((self._initial_capacity, dim), dtype=np.float32)
+        elif not self._writable or size >= self._matrix.shape[0]:
+            # Also copies a memory-mapped snapshot into RAM on first write
+            capacity = max(self._matrix.shape[0], self._initial_capacity)
+            if size >= capacity:
+                capacity *= 2
+            grown = np.zeros((capacity, dim), dtype=np.float32)
+            grown[:size] = self._matrix[:size]
+            self._matrix = grown
+        self._writable = True
+
+    def get_vector(self, market_id) -> np.ndarray:
+        """Return a copy of the normalized vector for a market, or None"""
+        with self._lock:
+            row = self._rows.get(market_id)
+            if row is None:
+                return None
+            return np.array(self._matrix[row])
+
+    def add(self, market_id, embedding, text=None) -> bool:
+        """
+        Insert or replace a market's embedding
+
+        Args:
+            market_id: Market ID
+            embedding: Embedding as list, JSON string or array
+            text: Market text returned alongside search hits
+
+        Returns:
+            True if the embedding was indexed
+        """
+        vector = parse_embedding(embedding)
+        if vector is None:
+            return False
+        vector = normalize(vector)
+
+        with self._lock:
+            if self._matrix is not None and vector.shape[0] != self.dim:
+                logger.warning(f"Skipping market {market_id}: embedding dim {vector.shape[0]} != {self.dim}")
+                return False
+
+            self._ensure_capacity(vector.shape[0])
+            row = self._rows.get(market_id)
+            if row is None:
+                row = len(self._ids)
+                self._ids.append(market_id)
+                self._texts.append(text)
+                self._rows[market_id] = row
+                self._matrix[row] = vector
+                self._on_add(row)
+            else:
+                self._texts[row] = text if text is not None else self._texts[row]
+                self._matrix[row] = vector
+                self._on_update(row)
+            return True
+
+    def remove(self, market_id) -> bool:
+        """Remove a market from the index; returns False if it was not indexed"""
+        with self._lock:
+            row = self._rows.get(market_id)
+            if row is None:
+                return False
+
+            if not self._writable:
+                self._ensure_capacity(self.dim)
+
+            self._on_remove(row)
+            del self._rows[market_id]
+
+            last = len(self._ids) - 1
+            if row != last:
+                # Move the last row into the freed slot
+                self._matrix[row] = self._matrix[last]
+                self._ids[row] = self._ids[last]
+                self._texts[row] = self._texts[last]
+                self._rows[self._ids[row]] = row
+                self._on_move(last, row)
+
+            self._ids.pop()
+            self._texts.pop()
+            return True
+
+    def clear(self):
+        """Drop all indexed vectors"""
+        with self._lock:
+            self._matrix = None
+            self._writable = True
+            self._ids = []
+            self._texts = []
+            self._rows = {}
+
+    # Hooks for subclasses that keep per-row structures
+    def _on_add(self, row):
+        pass
+
+    def _on_update(self, row):
+        pass
+
+    def _on_remove(self, row):
+        pass
+
+    def _on_move(self, src, dst):
+        pass
+
+    def _candidates(self, query: np.ndarray, nprobe: int = None):
+        """Rows to score for a query; None means all rows"""
+        return None
+
+    def search(self, embedding, k: int = 1, exclude=None, nprobe: int = None) -> list:
+        """
+        Find the k most similar markets
+
+        Args:
+            embedding: Query embedding
+            k: Number of results
+            exclude: Optional market ID to leave out of the results
+            nprobe: Recall/latency knob for approximate backends (ignored here)
+
+        Returns:
+            List of dicts with market_id, similarity and text, best first
+        """
+        query = parse_embedding(embedding)
+        if query is None:
+            return []
+        query = normalize(query)
+
+        with self._lock:
+            size = len(self._ids)
+            if size == 0 or query.shape[0] != self.dim:
+                return []
+
+            candidates = self._candidates(query, nprobe)
+            if candidates is None:
+                rows = np.arange(size)
+                scores = self._matrix[:size] @ query
+            else:
+                rows = candidates
+                scores = self._matrix[rows] @ query
+
+            if exclude is not None and exclude in self._rows:
+                scores[rows == self._rows[exclude]] = -np.inf
+
+            top = _top_k(scores, k)
+            return [
+                {
+                    'market_id': self._ids[rows[i]],
+                    'similarity': float(scores[i]),
+                    'text': self._texts[rows[i]]
+                }
+                for i in top
+                if np.isfinite(scores[i])
+            ]
+
+    def save(self, prefix: str, extra_meta: dict = None):
+        """
+        Write an on-disk snapshot (<prefix>.meta.json + <prefix>.<generation>.*.npy)
+
+        Every save writes its arrays under a fresh generation token and then
+        renames the metadata, which names that generation, into place; a
+        reader therefore never pairs arrays from different saves. Only one
+        process writes a prefix at a time: if another holds the lock, this
+        save is skipped.
+
+        Args:
+            prefix: Path prefix for the snapshot files
+            extra_meta: Additional JSON-serializable metadata to store
+        """
+        generation = uuid.uuid4().hex
+        with _snapshot_lock(prefix, exclusive=True) as locked:
+            if not locked:
+                logger.info(f"Vector snapshot {prefix} is being written by another process, skipping")
+                return
+
+            with self._lock:
+                size = len(self._ids)
+                if self._matrix is None:
+                    return
+                _atomic_save_npy(f"{prefix}.{generation}.vectors.npy", self._matrix[:size])
+                self._save_extra(f"{prefix}.{generation}")
+                meta = {
+                    'backend': self.name,
+                    'generation': generation,
+                    'size': size,
+                    'dim': self.dim,
+                    'ids': self._ids,
+                    'texts': self._texts
+                }
+                meta.update(extra_meta or {})
+
+            # Metadata goes last: a snapshot is only valid once it exists
+            tmp_path = f"{prefix}.meta.json.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            os.replace(tmp_path, f"{prefix}.meta.json")
+
+            # Memory-mapped readers keep their (unlinked) files until they close
+            _remove_stale_generations(prefix, generation)
+
+    def load(self, prefix: str) -> dict:
+        """
+        Load a snapshot written by save(); vectors are memory-mapped read-only
+        and copied into RAM only on the first write
+
+        Returns:
+            The snapshot metadata, or None if no valid snapshot exists
+        """
+        meta_path = f"{prefix}.meta.json"
+        if not os.path.exists(meta_path):
+            return None
+
+        # Shared lock: a writer cannot delete this generation while we open it
+        with _snapshot_lock(prefix, exclusive=False):
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+
+            if meta.get('backend') != self.name:
+                logger.info(f"Ignoring {meta.get('backend')} snapshot for {self.name} index")
+                return None
+            if not meta.get('generation'):
+                logger.info(f"Ignoring vector snapshot {prefix} without a generation")
+                return None
+
+            files = f"{prefix}.{meta['generation']}"
+            matrix = np.load(f"{files}.vectors.npy", mmap_mode='r')
+            if matrix.shape != (meta['size'], meta['dim']) or len(meta['ids']) != meta['size']:
+                logger.warning(f"Vector snapshot {prefix} is inconsistent, ignoring it")
+                return None
+
+            with self._lock:
+                self._matrix = matrix
+                self._writable = False
+                self._ids = list(meta['ids'])
+                self._texts = list(meta['texts'])
+                self._rows = {market_id: row for row, market_id in enumerate(self._ids)}
+                if not self._load_extra(files, meta):
+                    self.clear()
+                    return None
+
+        return meta
+
+    def _save_extra(self, prefix: str):
+        pass
+
+    def _load_extra(self, prefix: str, meta: dict) -> bool:
+        return True
+
+class IVFVectorIndex(ExactVectorIndex):
+    """Inverted-file approximate index (spherical k-means coarse quantizer)
+
+    Vectors are assigned to the nearest of nlist centroids; a query only
+    scores the rows in its nprobe closest lists. Raising nprobe trades
+    latency for recall (nprobe == nlist is exact). Until enough vectors
+    exist to train the quantizer, search falls back to the exact scan.
+    """
+
+    name = 'ivf'
+
+    def __init__(self, nlist: int = 0, nprobe: int = 8, train_iterations: int = 10,
+                 initial_capacity: int = 1024):
+        super().__init__(initial_capacity=initial_capacity)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_iterations = train_iterations
+        self._centroids = None
+        self._assign = np.zeros(initial_capacity, dtype=np.int32)
+        self._slot = np.zeros(initial_capacity, dtype=np.int64)
+        self._lists = []
+        self._trained_size = 0
+
+    @property
+    def trained(self):
+        return self._centroids is not None
+
+    def _auto_nlist(self, size: int) -> int:
+        if self.nlist:
+            return self.nlist
+        return max(1, int(np.sqrt(size)))
+
+    def _grow_row_arrays(self, size: int):
+        if size > self._assign.shape[0]:
+            capacity = max(size, self._assign.shape[0] * 2)
+            self._assign = np.resize(self._assign, capacity)
+            self._slot = np.resize(self._slot, capacity)
+
+    def _assign_rows(self, start: int, stop: int, chunk: int = 65536) -> np.ndarray:
+        """Nearest centroid for rows [start, stop), computed in chunks"""
+        out = np.empty(stop - start, dtype=np.int32)
+        for lo in range(start, stop, chunk):
+            hi = min(lo + chunk, stop)
+            out[lo - start:hi - start] = np.argmax(self._matrix[lo:hi] @ self._centroids.T, axis=1)
+        return out
+
+    def _rebuild_lists(self):
+        size = len(self._ids)
+        self._lists = [[] for _ in range(self._centroids.shape[0])]
+        for row in range(size):
+            lst = self._lists[self._assign[row]]
+            self._slot[row] = len(lst)
+            lst.append(row)
+
+    def train(self, sample_size: int = 100000, seed: int = 0):
+        """
+        (Re)train the coarse quantizer on a sample of indexed vectors and
+        reassign every row
+
+        Args:
+            sample_size: Maximum vectors used for k-means
+            seed: RNG seed for reproducible centroids
+        """
+        with self._lock:
+            size = len(self._ids)
+            nlist = self._auto_nlist(size)
+            if size < nlist:
+                return
+
+            rng = np.random.default_rng(seed)
+            sample_rows = rng.choice(size, size=min(sample_size, size), replace=False)
+            sample = np.asarray(self._matrix[np.sort(sample_rows)])
+
+            centroids = sample[rng.choice(sample.shape[0], size=nlist, replace=False)].copy()
+            for _ in range(self.train_iterations):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, labels, sample)
+                counts = np.bincount(labels, minlength=nlist)
+                # Re-seed empty clusters from random sample points
+                empty = counts == 0
+                if empty.any():
+                    sums[empty] = sample[rng.choice(sample.shape[0], size=int(empty.sum()))]
+                norms = np.linalg.norm(sums, axis=1, keepdims=True)
+                norms[norms == 0] = 1.0
+                centroids = (sums / norms).astype(np.float32)
+
+            self._centroids = centroids
+            self._grow_row_arrays(max(size, self._initial_capacity))
+            self._assign[:size] = self._assign_rows(0, size)
+            self._rebuild_lists()
+            self._trained_size = size
+            logger.info(f"IVF index trained: {size} vectors, {nlist} lists")
+
+    def _maybe_train(self):
+        """Train once the index is large enough, retrain after 4x growth"""
+        size = len(self._ids)
+        min_size = self._auto_nlist(size) * 39
+        if not self.trained and size >= min_size:
+            self.train()
+        elif self.trained and size >= 4 * self._trained_size:
+            self.train()
+
+    def _list_append(self, row):
+        lst = self._lists[self._assign[row]]
+        self._slot[row] = len(lst)
+        lst.append(row)
+
+    def _list_remove(self, row):
+        lst = self._lists[self._assign[row]]
+        slot = self._slot[row]
+        tail = lst[-1]
+        lst[slot] = tail
+        self._slot[tail] = slot
+        lst.pop()
+
+    def _on_add(self, row):
+        if not self.trained:
+            self._maybe_train()
+            return
+        self._grow_row_arrays(row + 1)
+        self._assign[row] = int(np.argmax(self._centroids @ self._matrix[row]))
+        self._list_append(row)
+        self._maybe_train()
+
+    def _on_update(self, row):
+        if not self.trained:
+            return
+        self._list_remove(row)
+        self._assign[row] = int(np.argmax(self._centroids @ self._matrix[row]))
+        self._list_append(row)
+
+    def _on_remove(self, row):
+        if self.trained:
+            self._list_remove(row)
+
+    def _on_move(self, src, dst):
+        if not self.trained:
+            return
+        self._assign[dst] = self._assign[src]
+        self._slot[dst] = self._slot[src]
+        self._lists[self._assign[dst]][self._slot[dst]] = dst
+
+    def clear(self):
+        with self._lock:
+            super().clear()
+            self._centroids = None
+            self._lists = []
+            self._trained_size = 0
+
+    def _candidates(self, query: np.ndarray, nprobe: int = None):
+        if not self.trained:
+            return None
+
+        nprobe = min(nprobe or self.nprobe, self._centroids.shape[0])
+        if nprobe >= self._centroids.shape[0]:
+            return None
+
+        probe = _top_k(self._centroids @ query, nprobe)
+        lists = [self._lists[i] for i in probe if self._lists[i]]
+        if not lists:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.asarray(lst, dtype=np.int64) for lst in lists])
+
+    def _save_extra(self, prefix: str):
+        if self.trained:
+            size = len(self._ids)
+            _atomic_save_npy(f"{prefix}.centroids.npy", self._centroids)
+            _atomic_save_npy(f"{prefix}.assign.npy", self._assign[:size])
+
+    def _load_extra(self, prefix: str, meta: dict) -> bool:
+        size = meta['size']
+        self._centroids = None
+        self._lists = []
+        self._assign = np.zeros(max(size, self._initial_capacity), dtype=np.int32)
+        self._slot = np.zeros(max(size, self._initial_capacity), dtype=np.int64)
+
+        centroids_path = f"{prefix}.centroids.npy"
+        if not os.path.exists(centroids_path):
+            self._maybe_train()
+            return True
+
+        centroids = np.load(centroids_path)
+        assign = np.load(f"{prefix}.assign.npy")
+        if centroids.shape[1] != meta['dim'] or assign.shape[0] != size:
+            logger.warning(f"IVF snapshot {prefix} is inconsistent, ignoring it")
+            return False
+
+        self._centroids = centroids.astype(np.float32)
+        self._assign[:size] = assign
+        self._rebuild_lists()
+        self._trained_size = size
+        return True
+
+def create_index_backend(kind: str = None) -> ExactVectorIndex:
+    """Build the configured index backend ('exact' or 'ivf')"""
+    kind = (kind or Config.VECTOR_INDEX_BACKEND).lower()
+    if kind == 'ivf':
+        return IVFVectorIndex(nlist=Config.VECTOR_INDEX_NLIST, nprobe=Config.VECTOR_INDEX_NPROBE)
+    if kind == 'exact':
+        return ExactVectorIndex()
+    raise ValueError(f"Unknown vector index backend: {kind}")
+
+class MarketVectorIndex:
+    """Process-wide index of active market embeddings kept in sync with Supabase
+
+    The first search restores the on-disk snapshot (if configured) or
+    bulk-loads all active markets with an embedding. Local writes
+    (submit/resolve/delete) update the index directly; changes made by other
+    worker processes are picked up by a periodic incremental sync on
+    updated_at.
+    """
+
+    def __init__(self, backend=None, sync_interval: float = None, page_size: int = 1000,
+                 snapshot_path: str = None):
+        self.backend = backend or create_index_backend()
+        self.sync_interval = Config.VECTOR_INDEX_SYNC_SECONDS if sync_interval is None else sync_interval
+        self.page_size = page_size
+        self.snapshot_path = Config.VECTOR_INDEX_SNAPSHOT_PATH if snapshot_path is None else snapshot_path
+        self.snapshot_interval = Config.VECTOR_INDEX_SNAPSHOT_SECONDS
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._warm_lock = threading.Lock()
+        self._warm_thread = None
+        self._watermark = None
+        self._watermark_id = None
+        self._last_sync = 0.0
+        self._last_snapshot = time.monotonic()
+
+    def __len__(self):
+        return len(self.backend)
+
+    def _advance_watermark(self, rows):
+        # The watermark is the largest (updated_at, id) seen, so markets that
+        # share a timestamp across a page boundary are not skipped
+        for row in rows:
+            updated_at = row.get('updated_at')
+            if not updated_at:
+                continue
+            key = (updated_at, str(row['id']))
+            if self._watermark is None or key > (self._watermark, self._watermark_id or ''):
+                self._watermark, self._watermark_id = key
+
+    def _restore_snapshot(self) -> bool:
+        if not self.snapshot_path:
+            return False
+        try:
+            meta = self.backend.load(self.snapshot_path)
+        except Exception as e:
+            logger.warning(f"Failed to load vector snapshot: {str(e)}")
+            return False
+        if not meta:
+            return False
+
+        self._watermark = meta.get('watermark')
+        self._watermark_id = meta.get('watermark_id')
+        logger.info(f"Vector index restored {len(self.backend)} markets from snapshot")
+        return True
+
+    def load(self):
+        """Restore the snapshot and catch up, or bulk-load every active market"""
+        if self._restore_snapshot():
+            self._loaded = True
+            self.sync()
+            return
+
+        supabase = get_supabase_client()
+        self.backend.clear()
+        self._watermark = None
+        self._watermark_id = None
+
+        start = 0
+        while True:
+            response = supabase.table('markets').select(
+                'id, text, embedding, updated_at'
+            ).eq('status', 'active').not_.is_('embedding', 'null').order('id').range(
+                start, start + self.page_size - 1
+            ).execute()
+            rows = response.data or []
+            for row in rows:
+                self.backend.add(row['id'], row.get('embedding'), row.get('text'))
+            self._advance_watermark(rows)
+            if len(rows) < self.page_size:
+                break
+            start += self.page_size
+
+        self._loaded = True
+        self._last_sync = time.monotonic()
+        logger.info(f"Vector index loaded with {len(self.backend)} markets")
+        self.save_snapshot()
+
+    def _changed_page(self, supabase) -> list:
+        """Next page of markets changed after the watermark, oldest first"""
+        query = supabase.table('markets').select('id, status, updated_at')
+        if self._watermark is not None:
+            if self._watermark_id is None:
+                query = query.gt('updated_at', self._watermark)
+            else:
+                query = query.or_(
+                    f'updated_at.gt."{self._watermark}",'
+                    f'and(updated_at.eq."{self._watermark}",id.gt.{self._watermark_id})'
+                )
+        response = query.order('updated_at').order('id').range(0, self.page_size - 1).execute()
+        return response.data or []
+
+    def sync(self):
+        """
+        Apply markets added or closed since the last load/sync
+
+        Changed markets are read a page at a time in (updated_at, id) order
+        and the watermark advances after each page, so a burst larger than
+        PostgREST's row cap is caught up over several pages instead of being
+        skipped. Only ids come back first; embeddings are fetched just for
+        active markets that are not indexed yet.
+        """
+        supabase = get_supabase_client()
+
+        while True:
+            rows = self._changed_page(supabase)
+
+            new_ids = []
+            for row in rows:
+                if row.get('status') != 'active':
+                    self.backend.remove(row['id'])
+                elif row['id'] not in self.backend:
+                    new_ids.append(row['id'])
+
+            if new_ids:
+                added = supabase.table('markets').select(
+                    'id, text, embedding'
+                ).in_('id', new_ids).eq('status', 'active').not_.is_('embedding', 'null').execute()
+                for row in added.data or []:
+                    self.backend.add(row['id'], row.get('embedding'), row.get('text'))
+
+            self._advance_watermark(rows)
+            if len(rows) < self.page_size:
+                break
+
+        self._last_sync = time.monotonic()
+
+        if self.snapshot_interval and time.monotonic() - self._last_snapshot >= self.snapshot_interval:
+            self.save_snapshot()
+
+    def save_snapshot(self):
+        """Persist the index so the next process start can memory-map it"""
+        if not self.snapshot_path:
+            return
+        self._last_snapshot = time.monotonic()
+        try:
+            self.backend.save(self.snapshot_path, {
+                'watermark': self._watermark,
+                'watermark_id': self._watermark_id
+            })
+        except Exception as e:
+            logger.warning(f"Failed to save vector snapshot: {str(e)}")
+
+    @property
+    def ready(self) -> bool:
+        """True once the index has been loaded (searches won't block on a bulk load)"""
+        return self._loaded
+
+    def warm(self):
+        """Load the index on a background thread (idempotent)"""
+        with self._warm_lock:
+            if self._loaded or self._warm_thread is not None:
+                return
+            self._warm_thread = threading.Thread(target=self._warm, name='vector-index-warm', daemon=True)
+            self._warm_thread.start()
+
+    def _warm(self):
+        try:
+            self.ensure_fresh()
+        except Exception as e:
+            logger.warning(f"Vector index warm-up failed: {str(e)}")
+        finally:
+            with self._warm_lock:
+                self._warm_thread = None
+
+    def ensure_fresh(self):
+        """Load on first use and re-sync once sync_interval has elapsed"""
+        with self._lock:
+            if not self._loaded:
+                self.load()
+            elif self.sync_interval and time.monotonic() - self._last_sync >= self.sync_interval:
+                try:
+                    self.sync()
+                except Exception as e:
+                    logger.warning(f"Vector index sync failed: {str(e)}")
+
+    def search(self, embedding, k: int = 1, exclude=None) -> list:
+        """Search active markets, loading/syncing the index first if needed"""
+        self.ensure_fresh()
+        return self.backend.search(embedding, k=k, exclude=exclude)
+
+    def get_vector(self, market_id):
+        """Indexed vector for a market (None if not active/indexed)"""
+        self.ensure_fresh()
+        return self.backend.get_vector(market_id)
+
+    def add_market(self, market_id, embedding, text=None):
+        """Index a newly created active market"""
+        if embedding is None:
+            return False
+        return self.backend.add(market_id, embedding, text)
+
+    def remove_market(self, market_id):
+        """Drop a resolved or deleted market"""
+        return self.backend.remove(market_id)
+
+_market_index = None
+_market_index_lock = threading.Lock()
+
+def get_market_index() -> MarketVectorIndex:
+    """Get or create the process-wide market vector index"""
+    global _market_index
+
+    if _market_index is None:
+        with _market_index_lock:
+            if _market_index is None:
+                _market_index = MarketVectorIndex()
+
+    return _market_index
@@ -0,0 +1,59 @@
+"""Pagination helpers for keyset (cursor) based listing"""
+
+import base64
+import json
+import re
+
+# Cursor values are interpolated into PostgREST filters, so only accept
+# ISO-8601 timestamps and UUID/alphanumeric ids
+_TIMESTAMP_RE = re.compile(r'^\d{4}-\d{2}-\d{2}[T ][0-9:.]+(Z|[+-]\d{2}:?\d{2})?$')
+_ID_RE = re.compile(r'^[A-Za-z0-9-]{1,64}$')
+
+def encode_cursor(created_at: str, row_id: str) -> str:
+    """Encode the sort key of the last row on a page into an opaque cursor
+
+    Args:
+        created_at: created_at value of the last row
+        row_id: id of the last row (tie-breaker for equal timestamps)
+
+    Returns:
+        URL-safe cursor string
+    """
+    payload = json.dumps({'c': created_at, 'i': row_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> tuple:
+    """Decode a cursor produced by encode_cursor
+
+    Args:
+        cursor: Opaque cursor string from a previous page
+
+    Returns:
+        Tuple of (created_at, id)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        created_at = payload['c']
+        row_id = payload['i']
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+    if not isinstance(created_at, str) or not isinstance(row_id, str):
+        raise ValueError("Invalid cursor")
+    if not _TIMESTAMP_RE.match(created_at) or not _ID_RE.match(row_id):
+        raise ValueError("Invalid cursor")
+
+    return created_at, row_id
+
+def parse_limit(value, default: int = 20, maximum: int = 100) -> int:
+    """Parse a page size query parameter and clamp it to [1, maximum]"""
+    if value is None or value == '':
+        return default
+    limit = int(value)
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    return min(limit, maximum)
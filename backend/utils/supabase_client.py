@@ -1,31 +1,149 @@
 """Supabase client utility"""
 
-import os
+import threading
+import httpx
 from supabase import create_client, Client
+from supabase.lib.client_options import SyncClientOptions
 from dotenv import load_dotenv
 from config import Config
 
 # Load environment variables
 load_dotenv()
 
+class TransportMetrics:
+    """Request and connection counters for one HTTP pool
+
+    Filled from httpcore trace events, so connections_opened counts real TCP
+    connects; reuse_rate is the share of requests that rode an existing
+    keep-alive connection.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.http2_requests = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+        self.errors = 0
+
+    def _trace(self, event_name: str, info: dict):
+        if event_name == 'connection.connect_tcp.started':
+            field = 'connections_opened'
+        elif event_name == 'connection.start_tls.started':
+            field = 'tls_handshakes'
+        elif event_name == 'http2.send_request_headers.started':
+            field = 'http2_requests'
+        elif event_name.endswith('.failed'):
+            field = 'errors'
+        else:
+            return
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def on_request(self, request: httpx.Request):
+        with self._lock:
+            self.requests += 1
+        request.extensions['trace'] = self._trace
+
+    def stats(self) -> dict:
+        with self._lock:
+            reused = max(self.requests - self.connections_opened, 0)
+            return {
+                'requests': self.requests,
+                'http2_requests': self.http2_requests,
+                'connections_opened': self.connections_opened,
+                'tls_handshakes': self.tls_handshakes,
+                'errors': self.errors,
+                'reuse_rate': round(reused / self.requests, 4) if self.requests else 0.0
+            }
+
+def _pool_size(configured: int, default: int) -> int:
+    return configured if configured > 0 else max(default, 1)
+
+def _build_http_client(pool_size: int, read_timeout: float, metrics: TransportMetrics) -> httpx.Client:
+    """Keep-alive (HTTP/2 when enabled) connection pool for one client"""
+    return httpx.Client(
+        http2=Config.SUPABASE_HTTP2,
+        limits=httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=Config.SUPABASE_KEEPALIVE_SECONDS
+        ),
+        timeout=httpx.Timeout(
+            connect=Config.SUPABASE_CONNECT_TIMEOUT_SECONDS,
+            read=read_timeout,
+            write=read_timeout,
+            pool=Config.SUPABASE_POOL_TIMEOUT_SECONDS
+        ),
+        follow_redirects=True,
+        event_hooks={'request': [metrics.on_request]}
+    )
+
+def _create(pool_size: int, read_timeout: float, metrics: TransportMetrics) -> Client:
+    if not Config.SUPABASE_URL or not Config.SUPABASE_KEY:
+        raise ValueError("Supabase URL and KEY must be set in environment variables")
+
+    options = SyncClientOptions(httpx_client=_build_http_client(pool_size, read_timeout, metrics))
+    return create_client(Config.SUPABASE_URL, Config.SUPABASE_KEY, options=options)
+
 _supabase_client: Client = None
+_supabase_read_client: Client = None
+_client_lock = threading.Lock()
+_write_metrics = TransportMetrics()
+_read_metrics = TransportMetrics()
 
 def get_supabase_client() -> Client:
-    """Get or create Supabase client singleton"""
+    """Get or create the Supabase client singleton (write pool)
+
+    Used for writes, rpc calls and mixed read/write code paths. Shared by
+    all threads; the pool is sized to the request threads plus background
+    workers so they do not queue on connections.
+    """
     global _supabase_client
     
     if _supabase_client is None:
-        if not Config.SUPABASE_URL or not Config.SUPABASE_KEY:
-            raise ValueError("Supabase URL and KEY must be set in environment variables")
-        
-        _supabase_client = create_client(Config.SUPABASE_URL, Config.SUPABASE_KEY)
+        with _client_lock:
+            if _supabase_client is None:
+                pool_size = _pool_size(
+                    Config.SUPABASE_WRITE_POOL_SIZE,
+                    Config.WEB_THREADS + Config.SETTLEMENT_WORKERS + Config.ENRICHMENT_WORKERS
+                )
+                _supabase_client = _create(pool_size, Config.SUPABASE_WRITE_TIMEOUT_SECONDS, _write_metrics)
     
     return _supabase_client
 
+def get_supabase_read_client() -> Client:
+    """Get or create the Supabase client for read-only queries (read pool)
+
+    A separate pool with a shorter timeout, so slow writes and settlement
+    rpcs do not hold up the connections that serve page reads.
+    """
+    global _supabase_read_client
+    
+    if _supabase_read_client is None:
+        with _client_lock:
+            if _supabase_read_client is None:
+                pool_size = _pool_size(Config.SUPABASE_READ_POOL_SIZE, Config.WEB_THREADS)
+                _supabase_read_client = _create(pool_size, Config.SUPABASE_READ_TIMEOUT_SECONDS, _read_metrics)
+    
+    return _supabase_read_client
+
+def transport_stats() -> dict:
+    """Connection reuse metrics for both pools"""
+    return {
+        'read': _read_metrics.stats(),
+        'write': _write_metrics.stats()
+    }
+
 def reset_supabase_client():
-    """Reset Supabase client (useful for testing)"""
-    global _supabase_client
-    _supabase_client = None
+    """Reset Supabase clients and close their pools (useful for testing)"""
+    global _supabase_client, _supabase_read_client
+    with _client_lock:
+        for client in (_supabase_client, _supabase_read_client):
+            if client is not None and client.options.httpx_client is not None:
+                client.options.httpx_client.close()
+        _supabase_client = None
+        _supabase_read_client = None
 
 def execute_query(table, action, data=None, filters=None):
     """